@@ -1,16 +1,32 @@
+import argparse
 import csv
+import glob
+import hashlib
+import itertools
 import re
 import os
 import bz2
 import pickle
+import shutil
 import sys
 from collections import namedtuple, defaultdict
 from datetime import datetime
 from pprint import pprint
 
+from specdata.checkpoint import Checkpoint
+from specdata.dedup import ContentIndex, uniquePages
+from specdata.instrument import span, traced
+from specdata.quarantine import QUARANTINE_FIELDS, ParseError, classifyError, reportQuarantine
+from specdata.shard import inShard, mergeCSV, mergeShards, parseShard, shardPath, testIDFromPath
+
 TestRecord = namedtuple('TestRecord', 'testID tester machine cpu mhz hwAvail os compiler autoParallel benchType base peak')
 BenchRecord = namedtuple('BenchRecord', 'testID benchName base peak')
 
+def lookupSuite(suites, benchType):
+    if benchType not in suites:
+        raise ParseError('unknown-suite', 'unrecognized summary line %r' % benchType)
+    return suites[benchType]
+
 def scanUntilLine(lineIter, pattern):
     for line in lineIter:
         m = re.search(pattern, line)
@@ -19,18 +35,22 @@ def scanUntilLine(lineIter, pattern):
             if len(g) == 1:
                 return g[0].strip()            
             return [x.strip() for x in g]
+    raise ParseError('truncated', 'no line matching %r' % pattern)
 
 MHzExp = re.compile('[(/]?(\\d+(?:\\.\\d+)?)a? ?([mg]hz)\\)?')
 
 def ExtractMHzFromName(name):
     name = name.lower()
     m = MHzExp.search(name)
+    if m is None:
+        raise ParseError('no-mhz', 'no MHz in CPU name %r' % name)
     value, units = m.groups()
     value = float(value)
     if units == 'ghz':
         value *= 1000
     return value
 
+@traced('parse95', items=lambda r: len(r[0]))
 def parse95(path):
     testID = os.path.splitext(os.path.basename(path))[0]    
     lineIter = iter(open(path, errors='ignore'))
@@ -40,6 +60,7 @@ def parse95(path):
         if 'SPEC has determined that this result was not in' in line:
             return [], []
     benches = []
+    benchType = None
     for line in lineIter:
         m = re.match('   (SPEC.{32}) ', line)
         if m:
@@ -49,12 +70,14 @@ def parse95(path):
         base = line[35:45].strip()
         peak = line[65:75].strip()
         benches.append(BenchRecord(testID, benchName, base, peak))
-    if '_rate' in benchType:
-        return [], []
-    benchType = {
+    if benchType is None:
+        raise ParseError('no-summary', 'summary line not found')
+    benchType = lookupSuite({
         'SPECint_base95 (Geom. Mean)' : 'CINT95',
-        'SPECfp_base95 (Geom. Mean)' : 'CFP95'
-    }[benchType]
+        'SPECfp_base95 (Geom. Mean)' : 'CFP95',
+        'SPECint_rate_base95 (Geom. Mean)' : 'RINT95',
+        'SPECfp_rate_base95 (Geom. Mean)' : 'RFP95'
+    }, benchType)
     base = line[35:45].strip()
     peak = lineIter.readline()[65:75].strip()
     properties = {}
@@ -96,6 +119,7 @@ def parse95(path):
     return [testRecord], benches
 
 
+@traced('parse2000', items=lambda r: len(r[0]))
 def parse2000(path):
     testID = os.path.splitext(os.path.basename(path))[0]    
     lineIter = iter(open(path, errors='ignore'))
@@ -108,6 +132,7 @@ def parse2000(path):
         if 'SPEC has determined that this result was not in' in line:
             return [], []
     benches = []
+    benchType = None
     for line in lineIter:
         m = re.match('   (SPEC.{24})    ', line)
         if m:
@@ -117,12 +142,14 @@ def parse2000(path):
         base = line[35:45].strip()
         peak = line[65:75].strip()
         benches.append(BenchRecord(testID, benchName, base, peak))
-    if '_rate_' in benchType:
-        return [], []
-    benchType = {
+    if benchType is None:
+        raise ParseError('no-summary', 'summary line not found')
+    benchType = lookupSuite({
         'SPECint_base2000' : 'CINT2000',
-        'SPECfp_base2000' : 'CFP2000'
-    }[benchType]
+        'SPECfp_base2000' : 'CFP2000',
+        'SPECint_rate_base2000' : 'RINT2000',
+        'SPECfp_rate_base2000' : 'RFP2000'
+    }, benchType)
     base = line[35:45].strip()
     peak = lineIter.readline()[65:75].strip()
     properties = {}
@@ -151,6 +178,7 @@ def parse2000(path):
     return [testRecord], benches
 
 
+@traced('parse2006', items=lambda r: len(r[0]))
 def parse2006(path):
     testID = os.path.splitext(os.path.basename(path))[0]    
     lineIter = iter(open(path, errors='ignore'))
@@ -169,6 +197,7 @@ def parse2006(path):
         if 'SPEC has determined that this result is not in' in line:
             return [], []
     benches = []
+    benchType = None
     for line in lineIter:
         m = re.match(' (SPEC.{27})  ', line)
         if m:
@@ -178,14 +207,14 @@ def parse2006(path):
         base = line[33:43].strip()
         peak = line[65:75].strip()
         benches.append(BenchRecord(testID, benchName, base, peak))
-    if '_rate_' in benchType:
-        return [], []
-    benchType = {
+    if benchType is None:
+        raise ParseError('no-summary', 'summary line not found')
+    benchType = lookupSuite({
         'SPECint(R)_base2006' : 'CINT2006',
         'SPECfp(R)_base2006' : 'CFP2006',
-        'SPECint(R)_rate_base2006' : 'CINT2006',
-        'SPECfp(R)_rate_base2006' : 'CFP2006'
-    }[benchType]
+        'SPECint(R)_rate_base2006' : 'RINT2006',
+        'SPECfp(R)_rate_base2006' : 'RFP2006'
+    }, benchType)
     base = line[33:43].strip()
     peak = lineIter.readline()[65:75].strip()
     properties = {}
@@ -213,6 +242,7 @@ def parse2006(path):
     testRecord = TestRecord(testID, tester, model, cpu, mhz, hwAvail, opSys, compiler, autoParallel, benchType, base, peak)
     return [testRecord], benches
 
+@traced('parse2017', items=lambda r: len(r[0]))
 def parse2017(path):
     testID = os.path.splitext(os.path.basename(path))[0]    
     lineIter = iter(open(path, errors='ignore'))
@@ -247,14 +277,21 @@ def parse2017(path):
         fpeak = float(peak)
         benches.append(BenchRecord(testID, benchName, base, peak))
     if benchType is None:
-        print(path)
-    if '_rate_' in benchType:
-        return [], []
-    benchType = {
+        raise ParseError('no-summary', 'summary line not found')
+    benchType = lookupSuite({
         'SPECspeed(R)2017_int_base' : 'CINT2017',
         'SPECspeed2017_int_base' : 'CINT2017',
-        'SPECspeed2017_int_peak' : 'CINT2017'
-        }[benchType]
+        'SPECspeed2017_int_peak' : 'CINT2017',
+        'SPECspeed(R)2017_fp_base' : 'CFP2017',
+        'SPECspeed2017_fp_base' : 'CFP2017',
+        'SPECspeed2017_fp_peak' : 'CFP2017',
+        'SPECrate(R)2017_int_base' : 'RINT2017',
+        'SPECrate2017_int_base' : 'RINT2017',
+        'SPECrate2017_int_peak' : 'RINT2017',
+        'SPECrate(R)2017_fp_base' : 'RFP2017',
+        'SPECrate2017_fp_base' : 'RFP2017',
+        'SPECrate2017_fp_peak' : 'RFP2017'
+        }, benchType)
     base = line[35:45].strip()
     peak = lineIter.readline()[67:78].strip()
     properties = {}
@@ -284,41 +321,192 @@ def parse2017(path):
     return [testRecord], benches
 
 
-def iterRecords():
-    allTests = []
-    
-    for fn in os.listdir(os.path.join('scraped', 'cint95')):
-        if fn.lower().endswith('.asc'):
-            allTests.append((parse95, os.path.join('scraped', 'cint95', fn)))
-    for fn in os.listdir(os.path.join('scraped', 'cint2000')):
-        allTests.append((parse2000, os.path.join('scraped', 'cint2000', fn)))
-    for fn in os.listdir(os.path.join('scraped', 'cint2006')):
-        allTests.append((parse2006, os.path.join('scraped', 'cint2006', fn)))
-    for fn in os.listdir(os.path.join('scraped', 'cint2017')):
-        allTests.append((parse2017, os.path.join('scraped', 'cint2017', fn)))
-    
+# Folders under scraped/, the parser for each, and which files to parse
+# (None means every file). Integer and floating point results, speed
+# and rate (cint, cfp, rint, rfp); folders that weren't fetched are
+# skipped. Only the format fetch-pages.py downloads is parsed, so a
+# copy of a result in another format, or a download still in
+# progress, isn't parsed as well.
+RESULT_CLASSES = ['cint', 'cfp', 'rint', 'rfp']
+SCRAPED_FOLDERS = []
+for resultClass in RESULT_CLASSES:
+    SCRAPED_FOLDERS += [
+        (resultClass + '95', parse95, '.asc'),
+        (resultClass + '2000', parse2000, '.asc'),
+        (resultClass + '2006', parse2006, '.txt'),
+        (resultClass + '2017', parse2017, '.txt'),
+    ]
+
+def iterRecords(shard=None, chunkSize=500, restart=False):
+    checkpoint = Checkpoint(shardPath('analyze-checkpoint.pickle', shard))
+    runDir = shardPath('analyze-runs', shard)
+    if restart:
+        checkpoint.remove()
+    with span('iterRecords') as s:
+        runs = parseChunks(shard, checkpoint, runDir, chunkSize)
+        s.add(writeOutputs(runs, shard))
+    reportQuarantine(shardPath('quarantine.txt', shard))
+    checkpoint.remove()
+    shutil.rmtree(runDir, ignore_errors=True)
+
+def listTests(shard=None):
+    # Pages with the same content as an earlier one are left out. That
+    # is decided over all pages before taking the shard's, so every
+    # shard keeps the same copy.
+    allPages = []
+    for folder, func, ext in SCRAPED_FOLDERS:
+        if not os.path.isdir(os.path.join('scraped', folder)):
+            continue
+        for fn in sorted(os.listdir(os.path.join('scraped', folder))):
+            if ext is not None and not fn.lower().endswith(ext):
+                continue
+            allPages.append((func, os.path.join('scraped', folder, fn)))
+    with span('dedupPages', len(allPages)):
+        # Digests of pages that aren't in the index yet are added to it,
+        # so they're only computed once.
+        index = ContentIndex(repair=False)
+        unique, duplicates = uniquePages([path for func, path in allPages], index)
+        index.save()
+    if duplicates:
+        print('Skipping %d pages with the same content as another page' % len(duplicates))
+    unique = set(unique)
+    return [(func, path) for func, path in allPages if path in unique and inShard(testIDFromPath(path), shard)]
+
+def parseOne(func, path):
+    # Returns (tests, benches, quarantine entry). A page that fails to
+    # parse is set aside instead of aborting the whole run.
+    try:
+        t, b = func(path)
+        return t, b, None
+    except Exception as e:
+        return [], [], (path, classifyError(e), '%s: %s' % (type(e).__name__, e))
+
+def fileStamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+#---------------------------------------------------------
+#  Parsing in chunks
+#
+#  Pages are parsed a chunk at a time, and each chunk is written out as
+#  run files sorted by testID, so memory use doesn't grow with the
+#  number of pages. The runs are then merged into the outputs with the
+#  same k-way merge that combines shards, which gives exactly what
+#  sorting everything at once would.
+#---------------------------------------------------------
+
+# (output, columns, column the rows are sorted by)
+RUN_FILES = [
+    ('summaries', TestRecord._fields, 'testID'),
+    ('benchmarks', BenchRecord._fields, 'testID'),
+    ('quarantine', QUARANTINE_FIELDS, 'path'),
+]
+
+def iterChunks(allTests, chunkSize):
+    # Chunks never span folders, so new pages in one folder leave the
+    # chunks of the others as they were.
+    for folder, tests in itertools.groupby(allTests, key=lambda pair: os.path.dirname(pair[1])):
+        tests = list(tests)
+        for i in range(0, len(tests), chunkSize):
+            yield '%s-%d' % (os.path.basename(folder), i // chunkSize), tests[i:i + chunkSize]
+
+def chunkDigest(code, chunk):
+    h = hashlib.sha1(repr(code).encode())
+    for func, path in chunk:
+        h.update(('%s %r\n' % (path, fileStamp(path))).encode())
+    return h.hexdigest()
+
+def parseChunk(chunk):
     tests = []
     benches = []
-    for i, pair in enumerate(allTests):
-        if i % 100 == 0:
-            print('Analyzing %d/%d ...' % (i, len(allTests)))
-        func, arg = pair
-        t, b = func(arg)
+    quarantine = []
+    for func, arg in chunk:
+        t, b, q = parseOne(func, arg)
         tests += t
         benches += b
-        
-    print('Writing summaries.txt ...')
-    with open('summaries.txt', 'w') as f:
-        w = csv.writer(f)
-        w.writerow(TestRecord._fields)
-        for t in tests:
-            w.writerow(t)
-            
-    print('Writing benchmarks.txt ...')
-    with open('benchmarks.txt', 'w') as f:
+        if q:
+            quarantine.append(q)
+
+    # Sort by testID so that the output doesn't depend on directory
+    # order, and so that runs and shards can be merged back
+    # deterministically. The sort is stable; benchmarks keep their
+    # order within a test.
+    tests.sort(key=lambda t: t.testID)
+    benches.sort(key=lambda b: b.testID)
+    quarantine.sort()
+    return tests, benches, quarantine
+
+def writeRun(path, fields, rows):
+    with open(path, 'w') as f:
         w = csv.writer(f)
-        w.writerow(BenchRecord._fields)
-        for b in benches:
-            w.writerow(b)
-            
-iterRecords()
+        w.writerow(fields)
+        for row in rows:
+            w.writerow(row)
+
+def parseChunks(shard, checkpoint, runDir, chunkSize):
+    # Returns the run files of each chunk. Chunks finished by an
+    # interrupted run are reused, unless one of their pages or this
+    # script changed since.
+    allTests = listTests(shard)
+    done = checkpoint.load()
+    if done:
+        print('Resuming from %s (%d chunks) ...' % (checkpoint.path, len(done)))
+    os.makedirs(runDir, exist_ok=True)
+    code = fileStamp(__file__)
+    runs = []
+    finished = 0
+    try:
+        for key, chunk in iterChunks(allTests, chunkSize):
+            print('Analyzing %d/%d ...' % (finished, len(allTests)))
+            paths = [os.path.join(runDir, '%s.%s.txt' % (name, key)) for name, fields, column in RUN_FILES]
+            digest = chunkDigest(code, chunk)
+            if done.get(key) != digest or not all(os.path.exists(p) for p in paths):
+                for path, (name, fields, column), rows in zip(paths, RUN_FILES, parseChunk(chunk)):
+                    writeRun(path, fields, rows)
+                checkpoint.append([(key, digest)])
+            runs.append(paths)
+            finished += len(chunk)
+    except KeyboardInterrupt:
+        print('Interrupted after %d/%d pages; run again to resume from %s.'
+              % (finished, len(allTests), checkpoint.path))
+        sys.exit(130)
+    if not runs:
+        paths = [os.path.join(runDir, '%s.empty.txt' % name) for name, fields, column in RUN_FILES]
+        for path, (name, fields, column) in zip(paths, RUN_FILES):
+            writeRun(path, fields, [])
+        runs.append(paths)
+    return runs
+
+def writeOutputs(runs, shard=None):
+    # Returns the number of tests.
+    counts = []
+    for i, (name, fields, column) in enumerate(RUN_FILES):
+        path = shardPath(name + '.txt', shard)
+        print('Writing %s ...' % path)
+        with span('write' + name.capitalize()) as s:
+            counts.append(mergeCSV([run[i] for run in runs], path, column))
+            s.add(counts[-1])
+    return counts[0]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parse the pages in scraped/ into summaries.txt and benchmarks.txt.')
+    parser.add_argument('--shard', help='only parse shard i of N (e.g. 2/4) and write summaries.2of4.txt etc.')
+    parser.add_argument('--merge', action='store_true', help='combine a complete set of shard outputs instead of parsing')
+    parser.add_argument('--checkpoint-every', type=int, default=500, metavar='N',
+                        help='parse N pages at a time, saving progress after each chunk (default 500)')
+    parser.add_argument('--restart', action='store_true', help='ignore progress saved by an interrupted run')
+    args = parser.parse_args()
+    shard = None
+    if args.shard:
+        try:
+            shard = parseShard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.merge:
+        for path in ['summaries.txt', 'benchmarks.txt']:
+            print('Merged %d rows into %s' % (mergeShards(path), path))
+        if glob.glob('quarantine.*of*.txt'):
+            print('Merged %d rows into quarantine.txt' % mergeShards('quarantine.txt', 'path'))
+    else:
+        iterRecords(shard, max(1, args.checkpoint_every), args.restart)
@@ -0,0 +1,4 @@
+from specdata.bootstrap import main
+
+if __name__ == '__main__':
+    main()
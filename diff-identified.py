@@ -0,0 +1,4 @@
+from specdata.idsnapshot import main
+
+if __name__ == '__main__':
+    main()
@@ -1,75 +1,255 @@
+import argparse
 import urllib.request, urllib.error, urllib.parse
+import codecs
+import html.parser
 import multiprocessing
-import lxml.html
 import os
 import time
+import zlib
+from collections import namedtuple
 
+from specdata.dedup import PARTIAL_SUFFIX, ContentIndex, contentHasher
+from specdata.shard import inShard, parseShard, testIDFromPath
+from specdata.telemetry import FetchTelemetry, PageStats, errorKind
 
-def cachedFetch(url, localPath, verbose=True):
+# Override to crawl a mirror, e.g. the local stand-in from make-corpus.py --serve.
+SPEC_SITE = os.environ.get('SPEC_SITE', 'http://www.spec.org').rstrip('/')
+
+
+class TruncatedDownload(Exception):
+    pass
+
+def download(url, partPath, onRetry):
+    # Streams the page into partPath a chunk at a time, asking for
+    # gzip to save bandwidth, and checks that all of it arrived: the
+    # byte count against Content-Length, and gzip's own length and CRC
+    # trailer. Retries until it succeeds, calling onRetry with the kind
+    # of each error. Returns the digest of the page, the bytes received
+    # and the seconds the successful request took.
+    sleepTime=1
+    request = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+    while True:
+      try:
+        start = time.time()
+        with urllib.request.urlopen(request) as response, open(partPath, 'wb') as f:
+            if response.headers.get('Content-Encoding', '').lower() == 'gzip':
+                decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                decoder = None
+            hasher = contentHasher()
+            received = 0
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                received += len(chunk)
+                if decoder:
+                    chunk = decoder.decompress(chunk)
+                hasher.update(chunk)
+                f.write(chunk)
+            expected = response.headers.get('Content-Length')
+            if expected is not None and int(expected) != received:
+                raise TruncatedDownload('received %d of %s bytes' % (received, expected))
+            if decoder:
+                chunk = decoder.flush()
+                hasher.update(chunk)
+                f.write(chunk)
+                if not decoder.eof:
+                    raise TruncatedDownload('gzip stream ended early')
+        return hasher.hexdigest(), received, time.time() - start
+      except Exception as e:
+        onRetry(errorKind(e))
+        time.sleep(sleepTime)
+        sleepTime*=2
+
+def partPathFor(localPath):
+    # Where a page is downloaded to before it's moved into place, so a
+    # page cut short never sits at localPath.
+    return '%s.%d%s' % (localPath, os.getpid(), PARTIAL_SUFFIX)
+
+def cachedFetch(url, localPath, log=print):
     if os.path.exists(localPath):
         return 'Cached ' + url
     try:
         os.makedirs(os.path.split(localPath)[0])
     except OSError:
         pass
-    if verbose:
-        print('Fetching %s ...' % url)
-    finished=False
-    sleepTime=1
-    while not(finished):
-      try:
-        response = urllib.request.urlopen(url)
-        data = response.read()
-        finished=True
-      except:
-        time.sleep(sleepTime)
-        sleepTime*=2
-        print('Fetching Hit a snag fetching the page, retrying... %s' % url)
-    with open(localPath, 'wb') as f:
-        f.write(data)
+    log('Fetching %s ...' % url)
+    partPath = partPathFor(localPath)
+    download(url, partPath, lambda kind: log('Hit a snag fetching the page (%s), retrying... %s' % (kind, url)))
+    os.replace(partPath, localPath)
     return 'Fetched ' + url
 
-def cachedRead(url, localPath):
-    cachedFetch(url, localPath)
+def cachedRead(url, localPath, log=print):
+    cachedFetch(url, localPath, log)
     return open(localPath, 'rb')
     
 def mpFetch(args):
-    return cachedFetch(*args, verbose=False)
-
-def iterateAllPageURLs():
-    with cachedRead('http://www.spec.org/cpu95/results/cint95.html', os.path.join('scraped', 'cint95.html')) as f:
-        print('Scanning cint95.html ...')
-        doc = lxml.html.parse(f)
-    for elem, attr, link, pos in doc.getroot().iterlinks():
-        if link.lower().endswith('.asc') or link.lower().endswith('.html'):
-            yield 'http://www.spec.org' + link, os.path.join('scraped', 'cint95', link.split('/')[-1])
-
-    with cachedRead('http://www.spec.org/cpu2000/results/cint2000.html', os.path.join('scraped', 'cint2000.html')) as f:
-        print('Scanning cint2000.html ...')
-        doc = lxml.html.parse(f)
-    for elem, attr, link, pos in doc.getroot().iterlinks():
-        if link.lower().endswith('.asc'):
-            yield 'http://www.spec.org/cpu2000/results/' + link, os.path.join('scraped', 'cint2000', link.split('/')[-1])
-
-    with cachedRead('http://www.spec.org/cpu2006/results/cint2006.html', os.path.join('scraped', 'cint2006.html')) as f:
-        print('Scanning cint2006.html ...')
-        doc = lxml.html.parse(f)
-    for elem, attr, link, pos in doc.getroot().iterlinks():
-        if link.lower().endswith('.txt'):
-            yield 'http://www.spec.org/cpu2006/results/' + link, os.path.join('scraped', 'cint2006', link.split('/')[-1])
-
-    with cachedRead('http://www.spec.org/cpu2017/results/cint2017.html', os.path.join('scraped', 'cint2017.html')) as f:
-        print('Scanning cint2017.html ...')
-        doc = lxml.html.parse(f)
-    for elem, attr, link, pos in doc.getroot().iterlinks():
-        if link.lower().endswith('.txt'):
-            yield 'http://www.spec.org/cpu2017/results/' + link, os.path.join('scraped', 'cint2017', link.split('/')[-1])
+    # Runs in a worker process. The page is downloaded next to its
+    # final path and hashed; the parent then moves it into place, or
+    # links it to a stored page with the same content, with
+    # ContentIndex.store(). Returns (path, part path, digest, PageStats),
+    # with None for the last three if the page was already there.
+    url, localPath = args
+    if os.path.exists(localPath):
+        return localPath, None, None, None
+    os.makedirs(os.path.dirname(localPath), exist_ok=True)
+    errors = []
+    partPath = partPathFor(localPath)
+    digest, received, seconds = download(url, partPath, errors.append)
+    stats = PageStats(urllib.parse.urlsplit(url).netloc, received, seconds, errors)
+    return localPath, partPath, digest, stats
+
+#---------------------------------------------------------
+#  Streaming link extraction
+#
+#  The suite index pages are several MB each. Rather than building a
+#  DOM, they are fed to an incremental parser in chunks, and each href
+#  is handed on as soon as it's seen. lxml's C parser is used when it's
+#  installed; otherwise the one in the standard library.
+#---------------------------------------------------------
+
+try:
+    import lxml.etree
+except ImportError:
+    lxml = None
+
+CHUNK_SIZE = 1 << 16
+
+class HrefCollector(html.parser.HTMLParser):
+    # Also serves as the parser target for lxml, which calls start()
+    # for each tag without building a tree.
+    def __init__(self):
+        html.parser.HTMLParser.__init__(self)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            for name, value in attrs:
+                if name == 'href' and value:
+                    self.hrefs.append(value)
+
+    def start(self, tag, attrib):
+        self.handle_starttag(tag, attrib.items())
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        pass
+
+    def close(self):
+        if lxml is None:
+            html.parser.HTMLParser.close(self)
+
+    def drain(self):
+        hrefs, self.hrefs = self.hrefs, []
+        return hrefs
+
+def iterHrefs(f):
+    collector = HrefCollector()
+    if lxml is not None:
+        parser = lxml.etree.HTMLParser(target=collector)
+        feed = parser.feed
+    else:
+        parser = collector
+        decoder = codecs.getincrementaldecoder('latin-1')()
+        feed = lambda chunk: parser.feed(decoder.decode(chunk))
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+        feed(chunk)
+        for href in collector.drain():
+            yield href
+    parser.close()
+    for href in collector.drain():
+        yield href
+
+# Which links on each suite's index page are result pages, and how to
+# turn them into absolute URLs. CPU95 links are relative to the site;
+# the others are relative to the index page. Every result class of a
+# generation (cint, cfp, rint, rfp) has its own index page.
+IndexRule = namedtuple('IndexRule', 'name indexPath linkBase extensions')
+
+RESULT_CLASSES = ['cint', 'cfp', 'rint', 'rfp']
+
+GENERATION_RULES = [
+    ('95', '', ['.asc', '.html']),
+    ('2000', '/cpu2000/results/', ['.asc']),
+    ('2006', '/cpu2006/results/', ['.txt']),
+    ('2017', '/cpu2017/results/', ['.txt']),
+]
+
+INDEX_RULES = [IndexRule(c + g, '/cpu%s/results/%s%s.html' % (g, c, g), linkBase, extensions)
+               for c in RESULT_CLASSES for g, linkBase, extensions in GENERATION_RULES]
+
+# Links to these aren't result pages.
+EXCLUDED_LINKS = ['content', 'permute']
+
+def iterateAllPageURLs(classes=('cint',), log=print):
+    seen = set()
+    for rule in [r for r in INDEX_RULES if r.name.rstrip('0123456789') in classes]:
+        indexName = rule.name + '.html'
+        with cachedRead(SPEC_SITE + rule.indexPath, os.path.join('scraped', indexName), log) as f:
+            log('Scanning %s ...' % indexName)
+            for link in iterHrefs(f):
+                if not link.lower().endswith(tuple(rule.extensions)):
+                    continue
+                url = SPEC_SITE + rule.linkBase + link
+                if url in seen or any(x in url for x in EXCLUDED_LINKS):
+                    continue
+                seen.add(url)
+                yield url, os.path.join('scraped', rule.name, link.split('/')[-1])
 
 
 if __name__ == '__main__':
-    allPageURLs = list(filter(lambda x: "content" not in x[0] and "permute" not in x[0], list(iterateAllPageURLs())))
-    pool = multiprocessing.Pool(64)
-    i = 0
-    for result in pool.imap_unordered(mpFetch, allPageURLs):
-        i += 1
-        print('%d/%d ... %s' % (i, len(allPageURLs), result))
+    parser = argparse.ArgumentParser(description='Download SPEC CPU result pages into scraped/.')
+    parser.add_argument('--shard', help='only fetch shard i of N (e.g. 2/4); analyze-pages.py --shard uses the same split')
+    parser.add_argument('--classes', default='cint',
+                        help='comma-separated result classes to fetch, out of: ' + ', '.join(RESULT_CLASSES))
+    parser.add_argument('--metrics', default='fetch-metrics.json', metavar='PATH',
+                        help='where to keep a JSON snapshot of throughput, latency and error metrics ("" for none)')
+    parser.add_argument('--progress-interval', type=float, metavar='SECONDS',
+                        help='how often to show progress (default 1 on a terminal, 10 otherwise)')
+    args = parser.parse_args()
+    try:
+        shard = parseShard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    classes = [c for c in args.classes.split(',') if c]
+    unknown = set(classes) - set(RESULT_CLASSES)
+    if unknown:
+        parser.error('unknown classes: %s' % ', '.join(sorted(unknown)))
+
+    # Pages fetched before there was a content index are hashed first,
+    # so new duplicates of them are caught too. Parts left by an
+    # interrupted run are dropped.
+    index = ContentIndex()
+    existing = []
+    folders = ['scraped'] + [os.path.join('scraped', rule.name) for rule in INDEX_RULES
+                             if rule.name.rstrip('0123456789') in classes]
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for fn in sorted(os.listdir(folder)):
+            path = os.path.join(folder, fn)
+            if fn.endswith(PARTIAL_SUFFIX):
+                os.remove(path)
+            elif folder != 'scraped':
+                existing.append(path)
+    added = index.record(existing)
+    if added:
+        print('Indexed the content of %d pages' % added)
+
+    # Downloads start while the index pages are still being scanned, so
+    # the total is only known once scanning is done. The generator runs
+    # in the pool's task thread.
+    with FetchTelemetry(args.metrics or None, args.progress_interval) as telemetry:
+        def pageURLs():
+            for url, path in iterateAllPageURLs(classes, telemetry.note):
+                if inShard(testIDFromPath(path), shard):
+                    telemetry.pageFound()
+                    yield url, path
+            telemetry.scanFinished()
+        pool = multiprocessing.Pool(64)
+        for path, partPath, digest, stats in pool.imap_unordered(mpFetch, pageURLs()):
+            duplicate = partPath is not None and index.store(path, partPath, digest) is not None
+            telemetry.pageDone(stats, duplicate)
+    duplicates = telemetry.counts['duplicates']
+    if duplicates:
+        print('%d pages had the same content as a stored page and were linked to it' % duplicates)
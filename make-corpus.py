@@ -0,0 +1,37 @@
+import argparse
+import os
+import time
+
+from specdata import corpus
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic SPEC CPU result corpus.')
+    parser.add_argument('--results', type=int, default=1000, help='number of result pages to generate')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default='.', help='folder that receives scraped/ and/or site/')
+    parser.add_argument('--layout', choices=['scraped', 'site', 'both'], default='scraped',
+                        help='scraped/ as analyze-pages.py reads it, or site/ as fetch-pages.py crawls it')
+    parser.add_argument('--classes', default='cint',
+                        help='comma-separated result classes to generate, out of: ' + ', '.join(corpus.RESULT_CLASSES))
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help='after generating, serve site/ on this port until interrupted')
+    args = parser.parse_args()
+    classes = [c for c in args.classes.split(',') if c]
+    unknown = set(classes) - set(corpus.RESULT_CLASSES)
+    if unknown:
+        parser.error('unknown classes: %s' % ', '.join(sorted(unknown)))
+
+    site = args.layout in ['site', 'both'] or args.serve is not None
+    scraped = args.layout in ['scraped', 'both']
+    start = time.time()
+    n = corpus.generateCorpus(args.out, args.results, args.seed, site=site, scraped=scraped, classes=classes)
+    print('Wrote %d results in %.1f s' % (n, time.time() - start))
+
+    if args.serve is not None:
+        server = corpus.serveCorpus(os.path.join(args.out, 'site'), args.serve)
+        print('Serving on %s; run fetch-pages.py with SPEC_SITE=%s' % ((corpus.siteURL(server),) * 2))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -1,153 +1,250 @@
+import argparse
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import numpy as np
 import itertools
-from sklearn.linear_model import LinearRegression
+
+from specdata.cube import loadCube
+from specdata.frontier import Frontier
+from specdata.lod import CELL_PIXELS, KEEP, decimateSeries, extent
 
 # Set font to Computer Modern
 plt.rcParams.update({"font.family": "serif", "mathtext.fontset": "cm"})
 
-# Load the CSV file
-file_path = 'int_data.csv'
-df = pd.read_csv(file_path)
-
-# Parse the Date column to datetime format
-df['Date'] = pd.to_datetime(df['Date'])
-
-# Sort by Date just to ensure correct plotting
-df = df.sort_values('Date')
-
-# Filter CPUs with 20 or more data points
-cpu_counts = df['CPU Name'].value_counts()
-valid_cpus = cpu_counts[cpu_counts >= 20].index
-df = df[df['CPU Name'].isin(valid_cpus)]
-
-# Create Year-Month column for grouping
-df['YearMonth'] = df['Date'].dt.to_period('M')
+# The plots read the aggregate cube written by "make-graphs.py
+# --outputs cube" rather than every row of int_data.csv. Each row of
+# df is one brand, model, month and suite, with the number of results
+# in Count and the sums of their converted Score, Score/MHz and MHz,
+# and their highest converted score in Max Score.
+def load_cube(file_path='int_cube.json'):
+    rows = [list(key) + [cell[0], cell[5], cell[6], cell[7], cell[4]] for key, cell in loadCube(file_path).converted()]
+    df = pd.DataFrame(rows, columns=['CPU Name', 'model', 'YearMonth', 'bench', 'Count', 'Score', 'Score/MHz', 'MHz', 'Max Score'])
+    df['YearMonth'] = pd.PeriodIndex(df['YearMonth'], freq='M')
+    return df
+
+def busiest_cpus(df):
+    # Filter CPUs with 20 or more data points
+    cpu_counts = df.groupby('CPU Name')['Count'].sum()
+    valid_cpus = cpu_counts[cpu_counts >= 20].index
+    df = df[df['CPU Name'].isin(valid_cpus)]
+    return df
+
+# Mean of each column per month, from the sums in the cube.
+def monthly_means(group, columns):
+    sums = group.groupby('YearMonth')[columns + ['Count']].sum()
+    group_mean = sums[columns].div(sums['Count'], axis=0).reset_index()
+    group_mean['Date'] = group_mean['YearMonth'].dt.to_timestamp()
+    return group_mean
+
+# Level of detail (see specdata/lod.py): the points of all series are
+# thinned out together to what the image has room for before anything
+# is drawn, so plotting time doesn't grow with the data. keep is None
+# to draw every point.
+LOD = {'keep': 'top', 'cell': CELL_PIXELS}
+
+# Scatters each (label, dates, values) in series, in order, with the
+# tab20 colors. screen maps values to a scale that's linear on screen
+# (np.log2 for a log2 axis). Labels are made by the caller, from all
+# the data.
+def scatter_series(series, screen=None):
+    colors = itertools.cycle(plt.cm.tab20.colors)
+    xs = [mdates.date2num(dates) for label, dates, values in series]
+    ys = [np.asarray(values, dtype=float) for label, dates, values in series]
+    if LOD['keep'] is None:
+        kept = [np.arange(len(x)) for x in xs]
+    else:
+        fig = plt.gcf()
+        pixels = fig.get_size_inches() * fig.dpi
+        with np.errstate(divide='ignore', invalid='ignore'):
+            screen_ys = [screen(y) for y in ys] if screen else ys
+        thinned = decimateSeries(list(zip(xs, screen_ys)), extent(xs), extent(screen_ys), pixels, LOD['cell'], LOD['keep'])
+        kept = [k for k, counts in thinned]
+    for (label, dates, values), x, y, k in zip(series, xs, ys, kept):
+        plt.scatter(dates.iloc[k], y[k], label=label, color=next(colors))
+
+# With --frontier, plot1 also draws the best score so far as a step
+# line, the same Frontier.line() that "make-graphs.py --outputs
+# graph,frontier" draws (see specdata/frontier.py). The best of a cell
+# is the best of its results, so adding the cells gives the same line
+# as adding every result. It is taken over every CPU in the cube,
+# including the ones left out of the scatter for having fewer than 20
+# results, so cube holds all rows.
+FRONTIER = {'cube': None}
+
+def plot_frontier(cube):
+    frontier = Frontier('month')
+    for brand, month, score in zip(cube['CPU Name'], cube['YearMonth'], cube['Max Score']):
+        frontier.add(brand, month.to_timestamp(), score)
+    line = frontier.line()
+    if line:
+        # Held at the last record up to the newest month, as in RenderGraph.
+        dates = [d for d, score in line] + [cube['YearMonth'].max().to_timestamp()]
+        scores = [score for d, score in line] + [line[-1][1]]
+        plt.step(dates, scores, where='post', color='black', lw=1.5, label='Best score so far')
 
 # First Plot: Score over Time with log2 scale on Y-axis
-plt.figure(figsize=(12, 6))
-colors = itertools.cycle(plt.cm.tab20.colors)
-all_dates = []
-all_scores = []
-for cpu_name, group in df.groupby('CPU Name'):
-    group_mean = group.groupby('YearMonth').agg({'Score': 'mean', 'MHz': 'mean'}).reset_index()
-    group_mean['Date'] = group_mean['YearMonth'].dt.to_timestamp()
-    plt.scatter(group_mean['Date'], group_mean['Score'], label=f"{cpu_name} ({len(group)})", color=next(colors))
-    all_dates.append(group_mean['Date'])
-    all_scores.append(group_mean['Score'])
-
-# Prepare data for regression
-all_dates = pd.concat(all_dates)
-all_scores = pd.concat(all_scores)
-all_timestamps = all_dates.map(pd.Timestamp.timestamp).values.reshape(-1, 1)
-log_scores = np.log2(all_scores.values).reshape(-1, 1)
-
-# Split data around 2005
-cutoff = pd.Timestamp('2005-01-01').timestamp()
-before_2005 = all_timestamps.flatten() < cutoff
-
-# Fit and plot linear regression in log-space for data before 2005
-model_before = LinearRegression()
-model_before.fit(all_timestamps[before_2005].reshape(-1, 1), log_scores[before_2005])
-r2_before = model_before.score(all_timestamps[before_2005].reshape(-1, 1), log_scores[before_2005])
-x_range = np.linspace(all_timestamps[before_2005].min(), cutoff, 100).reshape(-1, 1)
-y_pred_before = model_before.predict(x_range)
-plt.plot(pd.to_datetime(x_range.flatten(), unit='s'), 2 ** y_pred_before.flatten(), color='black', linestyle='--', label=f'Log-Linear Trend before 2005 (R2={r2_before:.2f})')
-
-plt.yscale('log', base=2)
-plt.xlabel('Date')
-plt.ylabel('Normalized SPECIntSpeed Score (log2 scale)')
-plt.title('Normalized SPECIntSpeed Score over Time')
-plt.legend(title='Results by CPU (# data points)')
-plt.grid(True, which="both", ls="--", lw=0.5)
-plt.gca().xaxis.set_major_locator(mdates.YearLocator())
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
-plt.gcf().autofmt_xdate()
-plt.tight_layout()
-plt.savefig('plot1_score_over_time.png')
-plt.close()
+def plot1(df):
+    from sklearn.linear_model import LinearRegression
+
+    plt.figure(figsize=(12, 6))
+    series = []
+    all_dates = []
+    all_scores = []
+    for cpu_name, group in df.groupby('CPU Name'):
+        group_mean = monthly_means(group, ['Score', 'MHz'])
+        series.append((f"{cpu_name} ({group['Count'].sum()})", group_mean['Date'], group_mean['Score']))
+        all_dates.append(group_mean['Date'])
+        all_scores.append(group_mean['Score'])
+    scatter_series(series, screen=np.log2)
+    if FRONTIER['cube'] is not None:
+        plot_frontier(FRONTIER['cube'])
+
+    # Prepare data for regression
+    all_dates = pd.concat(all_dates)
+    all_scores = pd.concat(all_scores)
+    all_timestamps = all_dates.map(pd.Timestamp.timestamp).values.reshape(-1, 1)
+    log_scores = np.log2(all_scores.values).reshape(-1, 1)
+
+    # Split data around 2005
+    cutoff = pd.Timestamp('2005-01-01').timestamp()
+    before_2005 = all_timestamps.flatten() < cutoff
+
+    # Fit and plot linear regression in log-space for data before 2005
+    model_before = LinearRegression()
+    model_before.fit(all_timestamps[before_2005].reshape(-1, 1), log_scores[before_2005])
+    r2_before = model_before.score(all_timestamps[before_2005].reshape(-1, 1), log_scores[before_2005])
+    x_range = np.linspace(all_timestamps[before_2005].min(), cutoff, 100).reshape(-1, 1)
+    y_pred_before = model_before.predict(x_range)
+    plt.plot(pd.to_datetime(x_range.flatten(), unit='s'), 2 ** y_pred_before.flatten(), color='black', linestyle='--', label=f'Log-Linear Trend before 2005 (R2={r2_before:.2f})')
+
+    plt.yscale('log', base=2)
+    plt.xlabel('Date')
+    plt.ylabel('Normalized SPECIntSpeed Score (log2 scale)')
+    plt.title('Normalized SPECIntSpeed Score over Time')
+    plt.legend(title='Results by CPU (# data points)')
+    plt.grid(True, which="both", ls="--", lw=0.5)
+    plt.gca().xaxis.set_major_locator(mdates.YearLocator())
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
+    plt.gcf().autofmt_xdate()
+    plt.tight_layout()
+    plt.savefig('plot1_score_over_time.png')
+    plt.close()
+
 
 # Second Plot: Date vs log(Score/MHz) by CPU Name
-plt.figure(figsize=(12, 6))
-colors = itertools.cycle(plt.cm.tab20.colors)
-for cpu_name, group in df.groupby('CPU Name'):
-    group_mean = group.groupby('YearMonth').agg({'Score/MHz': 'mean'}).reset_index()
-    group_mean['Date'] = group_mean['YearMonth'].dt.to_timestamp()
-    log_score_per_mhz = np.log(group_mean['Score/MHz'])
-    plt.scatter(group_mean['Date'], log_score_per_mhz, label=f"{cpu_name} ({len(group)})", color=next(colors))
-
-plt.xlabel('Date')
-plt.ylabel('Normalized SPECIntSpeed Score/MHz (log scale)')
-plt.title('Normalized SPECIntSpeed Score/MHz over Time (by CPU Name)')
-plt.legend(title='Results by CPU (# data points)')
-plt.grid(True, which="both", ls="--", lw=0.5)
-plt.gca().xaxis.set_major_locator(mdates.YearLocator())
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
-plt.gcf().autofmt_xdate()
-plt.tight_layout()
-plt.savefig('plot2_score_per_mhz_cpu.png')
-plt.close()
+def plot2(df):
+    plt.figure(figsize=(12, 6))
+    series = []
+    for cpu_name, group in df.groupby('CPU Name'):
+        group_mean = monthly_means(group, ['Score/MHz'])
+        log_score_per_mhz = np.log(group_mean['Score/MHz'])
+        series.append((f"{cpu_name} ({group['Count'].sum()})", group_mean['Date'], log_score_per_mhz))
+    scatter_series(series)
+
+    plt.xlabel('Date')
+    plt.ylabel('Normalized SPECIntSpeed Score/MHz (log scale)')
+    plt.title('Normalized SPECIntSpeed Score/MHz over Time (by CPU Name)')
+    plt.legend(title='Results by CPU (# data points)')
+    plt.grid(True, which="both", ls="--", lw=0.5)
+    plt.gca().xaxis.set_major_locator(mdates.YearLocator())
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
+    plt.gcf().autofmt_xdate()
+    plt.tight_layout()
+    plt.savefig('plot2_score_per_mhz_cpu.png')
+    plt.close()
+
 
 # Third Plot: Date vs log(Score/MHz) by Bench
-plt.figure(figsize=(12, 6))
-colors = itertools.cycle(plt.cm.tab20.colors)
-for bench_name, group in df.groupby('bench'):
-    group_mean = group.groupby('YearMonth').agg({'Score/MHz': 'mean'}).reset_index()
-    group_mean['Date'] = group_mean['YearMonth'].dt.to_timestamp()
-    log_score_per_mhz = np.log(group_mean['Score/MHz'])
-    plt.scatter(group_mean['Date'], log_score_per_mhz, label=f"{bench_name} ({len(group)})", color=next(colors))
-
-plt.xlabel('Date')
-plt.ylabel('Normalized SPECIntSpeed Score/MHz (log scale)')
-plt.title('Normalized SPECIntSpeed Score/MHz over Time (by Bench)')
-plt.legend(title='Results by Benchmark (# data points)')
-plt.grid(True, which="both", ls="--", lw=0.5)
-plt.gca().xaxis.set_major_locator(mdates.YearLocator())
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
-plt.gcf().autofmt_xdate()
-plt.tight_layout()
-plt.savefig('plot3_score_per_mhz_bench.png')
-plt.close()
+def plot3(df):
+    plt.figure(figsize=(12, 6))
+    series = []
+    for bench_name, group in df.groupby('bench'):
+        group_mean = monthly_means(group, ['Score/MHz'])
+        log_score_per_mhz = np.log(group_mean['Score/MHz'])
+        series.append((f"{bench_name} ({group['Count'].sum()})", group_mean['Date'], log_score_per_mhz))
+    scatter_series(series)
+
+    plt.xlabel('Date')
+    plt.ylabel('Normalized SPECIntSpeed Score/MHz (log scale)')
+    plt.title('Normalized SPECIntSpeed Score/MHz over Time (by Bench)')
+    plt.legend(title='Results by Benchmark (# data points)')
+    plt.grid(True, which="both", ls="--", lw=0.5)
+    plt.gca().xaxis.set_major_locator(mdates.YearLocator())
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
+    plt.gcf().autofmt_xdate()
+    plt.tight_layout()
+    plt.savefig('plot3_score_per_mhz_bench.png')
+    plt.close()
+
 
 # Fourth Plot: Date vs MHz by CPU Name
-plt.figure(figsize=(12, 6))
-colors = itertools.cycle(plt.cm.tab20.colors)
-for cpu_name, group in df.groupby('CPU Name'):
-    group_mean = group.groupby('YearMonth').agg({'MHz': 'mean'}).reset_index()
-    group_mean['Date'] = group_mean['YearMonth'].dt.to_timestamp()
-    plt.scatter(group_mean['Date'], group_mean['MHz'], label=f"{cpu_name} ({len(group)})", color=next(colors))
-
-plt.xlabel('Date')
-plt.ylabel('Clock Speed (MHz)')
-plt.title('Clock Speed over Time (by CPU Name)')
-plt.legend(title='Results by CPU (# data points)')
-plt.grid(True, which="both", ls="--", lw=0.5)
-plt.gca().xaxis.set_major_locator(mdates.YearLocator())
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
-plt.gcf().autofmt_xdate()
-plt.tight_layout()
-plt.savefig('plot4_mhz_over_time.png')
-plt.close()
+def plot4(df):
+    plt.figure(figsize=(12, 6))
+    series = []
+    for cpu_name, group in df.groupby('CPU Name'):
+        group_mean = monthly_means(group, ['MHz'])
+        series.append((f"{cpu_name} ({group['Count'].sum()})", group_mean['Date'], group_mean['MHz']))
+    scatter_series(series)
+
+    plt.xlabel('Date')
+    plt.ylabel('Clock Speed (MHz)')
+    plt.title('Clock Speed over Time (by CPU Name)')
+    plt.legend(title='Results by CPU (# data points)')
+    plt.grid(True, which="both", ls="--", lw=0.5)
+    plt.gca().xaxis.set_major_locator(mdates.YearLocator())
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
+    plt.gcf().autofmt_xdate()
+    plt.tight_layout()
+    plt.savefig('plot4_mhz_over_time.png')
+    plt.close()
+
 
 # Fifth Plot: Date vs log10(MHz) by CPU Name
-plt.figure(figsize=(12, 6))
-colors = itertools.cycle(plt.cm.tab20.colors)
-for cpu_name, group in df.groupby('CPU Name'):
-    group_mean = group.groupby('YearMonth').agg({'MHz': 'mean'}).reset_index()
-    group_mean['Date'] = group_mean['YearMonth'].dt.to_timestamp()
-    log10_mhz = np.log10(group_mean['MHz'])
-    plt.scatter(group_mean['Date'], log10_mhz, label=f"{cpu_name} ({len(group)})", color=next(colors))
-
-plt.xlabel('Date')
-plt.ylabel('Log10 Clock Speed (MHz)')
-plt.title('Log10 Clock Speed over Time (by CPU Name)')
-plt.legend(title='Results by CPU (# data points)')
-plt.grid(True, which="both", ls="--", lw=0.5)
-plt.gca().xaxis.set_major_locator(mdates.YearLocator())
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
-plt.gcf().autofmt_xdate()
-plt.tight_layout()
-plt.savefig('plot5_log10_mhz_over_time.png')
-plt.close()
+def plot5(df):
+    plt.figure(figsize=(12, 6))
+    series = []
+    for cpu_name, group in df.groupby('CPU Name'):
+        group_mean = monthly_means(group, ['MHz'])
+        log10_mhz = np.log10(group_mean['MHz'])
+        series.append((f"{cpu_name} ({group['Count'].sum()})", group_mean['Date'], log10_mhz))
+    scatter_series(series)
+
+    plt.xlabel('Date')
+    plt.ylabel('Log10 Clock Speed (MHz)')
+    plt.title('Log10 Clock Speed over Time (by CPU Name)')
+    plt.legend(title='Results by CPU (# data points)')
+    plt.grid(True, which="both", ls="--", lw=0.5)
+    plt.gca().xaxis.set_major_locator(mdates.YearLocator())
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
+    plt.gcf().autofmt_xdate()
+    plt.tight_layout()
+    plt.savefig('plot5_log10_mhz_over_time.png')
+    plt.close()
+
+
+# Individual plots can be rendered with e.g. "python plot.py 2 4";
+# with no arguments all of them are.
+PLOTS = [plot1, plot2, plot3, plot4, plot5]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Draw the plot*.png figures from int_cube.json.')
+    parser.add_argument('plots', nargs='*', type=int, metavar='N', help='plots to draw, 1 to %d (default: all)' % len(PLOTS))
+    parser.add_argument('--lod', default=LOD['keep'], choices=KEEP + ['off'], help='points kept per cell of the image (default top); off draws every point')
+    parser.add_argument('--lod-cell', type=int, default=LOD['cell'], help='cell size in pixels (default %d)' % CELL_PIXELS)
+    parser.add_argument('--frontier', action='store_true', help='draw the best score so far on plot 1')
+    args = parser.parse_args()
+    if any(not 1 <= n <= len(PLOTS) for n in args.plots):
+        parser.error('plots are numbered 1 to %d' % len(PLOTS))
+    if args.lod_cell < 1:
+        parser.error('--lod-cell must be at least 1 pixel')
+    LOD['keep'] = None if args.lod == 'off' else args.lod
+    LOD['cell'] = args.lod_cell
+    cube = load_cube()
+    if args.frontier:
+        FRONTIER['cube'] = cube
+    df = busiest_cpus(cube)
+    for n in args.plots or range(1, len(PLOTS) + 1):
+        PLOTS[n - 1](df)
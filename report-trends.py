@@ -0,0 +1,41 @@
+import argparse
+import math
+
+from specdata.cube import PERIODS, loadCube, mergeCells
+
+
+#---------------------------------------------------------
+#  Trend tables from the aggregate cube
+#
+#  Reads <mode>_cube.json, written by "make-graphs.py --outputs cube",
+#  and prints converted scores per year, quarter or month, grouped by
+#  brand, model or suite. Only the cube is read, so this takes
+#  milliseconds however many results went into it.
+#---------------------------------------------------------
+
+GROUPINGS = {'brand': lambda key: key[0],
+             'model': lambda key: '%s|%s' % (key[0], key[1]),
+             'suite': lambda key: key[3]}
+
+def trendRows(cube, period, by):
+    groupOf = GROUPINGS[by]
+    table = {}
+    for key, cell in cube.rollup(period).converted():
+        row = (key[2], groupOf(key))
+        known = table.get(row)
+        table[row] = mergeCells(known, cell) if known else cell
+    return sorted(table.items())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print score trends from an aggregate cube.')
+    parser.add_argument('--cube', default='int_cube.json')
+    parser.add_argument('--period', choices=PERIODS, default='year')
+    parser.add_argument('--by', choices=sorted(GROUPINGS), default='brand')
+    args = parser.parse_args()
+
+    cube = loadCube(args.cube)
+    print('%-8s %-40s %6s %10s %12s %10s %10s' % (args.period, args.by, 'count', 'geomean', 'geomean/MHz', 'min', 'max'))
+    for (period, group), cell in trendRows(cube, args.period, args.by):
+        count, sumLog, sumLogMhz, lo, hi = cell[:5]
+        print('%-8s %-40s %6d %10.4f %12.4g %10.4f %10.4f' % (
+            period, group, count, math.exp(sumLog / count), math.exp(sumLogMhz / count), lo, hi))
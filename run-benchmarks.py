@@ -0,0 +1,36 @@
+import argparse
+import shutil
+import sys
+
+from specdata import bench
+
+STAGES = ['generate', 'fetch', 'parse', 'graphs', 'render']
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time each script of the pipeline against a synthetic SPEC corpus.')
+    parser.add_argument('--results', type=int, default=1000, help='number of synthetic result pages')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated subset of: ' + ', '.join(STAGES))
+    parser.add_argument('--workdir', help='keep the corpus and outputs in this folder instead of a temporary one')
+    parser.add_argument('--trace-memory', action='store_true', help='record tracemalloc peaks per span (slow)')
+    parser.add_argument('--json', help='write measurements to this file')
+    parser.add_argument('--baseline', help='compare against a previous --json file')
+    parser.add_argument('--tolerance', type=float, default=20, help='allowed slowdown in percent before failing')
+    args = parser.parse_args()
+
+    workDir = bench.makeWorkDir(args.workdir)
+    try:
+        results = bench.runBenchmarks(workDir, args.results, args.seed, args.stages.split(','),
+                                       args.trace_memory)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workDir, ignore_errors=True)
+    print(bench.formatTable(results))
+    if args.json:
+        bench.writeJSON(args.json, results, args.results, args.seed)
+    if args.baseline:
+        regressions = bench.compareToBaseline(results, args.baseline, args.tolerance)
+        for r in regressions:
+            print('REGRESSION ' + r)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,22 @@
+import argparse
+import sys
+
+from specdata import pipeline
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the fetch/analyze/graph/plot workflow, redoing only stages whose inputs changed.')
+    parser.add_argument('stages', nargs='*', help='stages to bring up to date (default: all but fetch): ' +
+                        ', '.join(s.name for s in pipeline.STAGES))
+    parser.add_argument('-j', '--jobs', type=int, help='stages to run in parallel (default: number of cores)')
+    parser.add_argument('--force', default='', help='comma-separated stages to rerun even if up to date')
+    parser.add_argument('--no-cache', action='store_true', help="don't keep or restore outputs of earlier runs")
+    parser.add_argument('--dir', default='.', help='folder holding scraped/ and the outputs')
+    args = parser.parse_args()
+
+    p = pipeline.Pipeline(args.dir, args.jobs, useCache=not args.no_cache)
+    try:
+        outcomes = p.run(args.stages, [f for f in args.force.split(',') if f])
+    except ValueError as e:
+        parser.error(str(e))
+    if [o for o in outcomes if o.status in ['failed', 'skipped']]:
+        sys.exit(1)
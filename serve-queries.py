@@ -0,0 +1,4 @@
+from specdata.query import main
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+# Reusable pieces of the SPEC scraping & analysis scripts.
+# The top-level *.py scripts remain the entry points; see README.
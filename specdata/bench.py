@@ -0,0 +1,161 @@
+import collections
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from specdata import corpus
+
+
+#---------------------------------------------------------
+#  End-to-end benchmark of the scraping & analysis scripts
+#
+#  Each stage runs the real script in its own process against a
+#  synthetic corpus, so that wall time, CPU time and peak RSS can be
+#  measured per stage with os.wait4().
+#---------------------------------------------------------
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+StageResult = collections.namedtuple('StageResult', 'stage status items wall cpu maxRSS detail')
+
+def runScript(script, cwd, logName, env=None):
+    logPath = os.path.join(cwd, logName)
+    with open(logPath, 'w') as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, script)],
+                                cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        pid, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    detail = ''
+    if proc.returncode != 0:
+        with open(logPath) as log:
+            lines = [l.strip() for l in log if l.strip()]
+        detail = lines[-1] if lines else 'exit code %d' % proc.returncode
+    # ru_maxrss is in kilobytes on Linux.
+    return proc.returncode, wall, usage.ru_utime + usage.ru_stime, usage.ru_maxrss * 1024, detail
+
+def countFiles(folder):
+    total = 0
+    for root, dirs, files in os.walk(folder):
+        total += len(files)
+    return total
+
+def countLines(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return max(sum(1 for line in f) - 1, 0)
+
+def spanResults(stage, tracePath):
+    # Break a stage down using the spans recorded by specdata.instrument.
+    if not os.path.exists(tracePath):
+        return []
+    with open(tracePath) as f:
+        summary = json.load(f).get('spanSummary', [])
+    return [StageResult('%s/%s' % (stage, s['name']), 'ok', s['items'], s['wall'], s['cpu'], s['peak'], '')
+            for s in summary]
+
+def runStage(stage, script, cwd, items, env=None, traceMemory=False):
+    env = dict(env or os.environ)
+    tracePath = os.path.join(cwd, stage + '.trace.json')
+    env['SPEC_TRACE'] = tracePath
+    if traceMemory:
+        env['SPEC_TRACE_MEMORY'] = '1'
+    code, wall, cpu, rss, detail = runScript(script, cwd, stage + '.log', env)
+    result = StageResult(stage, 'ok' if code == 0 else 'failed', items(), wall, cpu, rss, detail)
+    return [result] + spanResults(stage, tracePath)
+
+def skipped(stage, reason):
+    return StageResult(stage, 'skipped', 0, 0.0, 0.0, 0, reason)
+
+def runBenchmarks(workDir, count, seed=1, stages=('generate', 'fetch', 'parse', 'graphs', 'render'), traceMemory=False):
+    results = []
+    runDir = os.path.join(workDir, 'run')
+    os.makedirs(runDir, exist_ok=True)
+
+    # The corpus is generated in-process; this stage times the generator itself.
+    start = time.perf_counter()
+    cpuStart = time.process_time()
+    corpus.generateCorpus(workDir, count, seed, site='fetch' in stages, scraped=True)
+    if 'generate' in stages:
+        results.append(StageResult('generate', 'ok', count, time.perf_counter() - start,
+                                   time.process_time() - cpuStart, 0, ''))
+
+    if 'fetch' in stages:
+        fetchDir = os.path.join(workDir, 'fetch')
+        os.makedirs(fetchDir, exist_ok=True)
+        server = corpus.serveCorpus(os.path.join(workDir, 'site'))
+        env = dict(os.environ, SPEC_SITE=corpus.siteURL(server))
+        try:
+            results += runStage('fetch', 'fetch-pages.py', fetchDir,
+                                lambda: countFiles(os.path.join(fetchDir, 'scraped')), env)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    # Parse from the generated scraped/ tree rather than the fetched copy,
+    # so that a failed fetch doesn't hide parse regressions.
+    shutil.move(os.path.join(workDir, 'scraped'), os.path.join(runDir, 'scraped'))
+    previous = 'ok'
+    for stage, script, output in [('parse', 'analyze-pages.py', 'summaries.txt'),
+                                  ('graphs', 'make-graphs.py', 'int_data.csv'),
+                                  ('render', 'plot.py', 'int_data.csv')]:
+        if stage not in stages:
+            continue
+        if previous != 'ok':
+            results.append(skipped(stage, 'previous stage %s' % previous))
+            continue
+        path = os.path.join(runDir, output)
+        stageResults = runStage(stage, script, runDir, lambda: countLines(path), traceMemory=traceMemory)
+        results += stageResults
+        previous = stageResults[0].status
+    return results
+
+
+#---------------------------------------------------------
+#  Reporting
+#---------------------------------------------------------
+
+def formatTable(results):
+    lines = ['%-32s %-8s %10s %10s %10s %12s %10s' % (
+        'stage', 'status', 'items', 'wall s', 'cpu s', 'items/s', 'peak MB')]
+    for r in results:
+        rate = r.items / r.wall if r.wall > 0 else 0
+        lines.append('%-32s %-8s %10d %10.3f %10.3f %12.1f %10.1f' % (
+            r.stage, r.status, r.items, r.wall, r.cpu, rate, r.maxRSS / 2.0**20))
+        if r.detail:
+            lines.append('%33s%s' % ('', r.detail))
+    return '\n'.join(lines)
+
+def writeJSON(path, results, count, seed):
+    with open(path, 'w') as f:
+        json.dump({'results': count, 'seed': seed,
+                   'stages': [r._asdict() for r in results]}, f, indent=2)
+
+def compareToBaseline(results, baselinePath, tolerance):
+    # Returns a list of human-readable regressions. Stages that didn't
+    # run successfully in both runs are ignored.
+    with open(baselinePath) as f:
+        baseline = dict((s['stage'], s) for s in json.load(f)['stages'])
+    regressions = []
+    for r in results:
+        b = baseline.get(r.stage)
+        if b is None or b['status'] != 'ok' or r.status != 'ok':
+            continue
+        for field, label in [('wall', 'wall time'), ('maxRSS', 'peak RSS')]:
+            old, new = b[field], getattr(r, field)
+            if old > 0 and new > old * (1 + tolerance / 100.0):
+                regressions.append('%s: %s %.3g -> %.3g (+%.0f%%)' % (
+                    r.stage, label, old, new, (new / old - 1) * 100))
+    return regressions
+
+def makeWorkDir(path):
+    if path:
+        os.makedirs(path, exist_ok=True)
+        return path
+    return tempfile.mkdtemp(prefix='specbench-')
@@ -0,0 +1,175 @@
+import argparse
+import collections
+import json
+import math
+import multiprocessing
+import os
+
+import numpy as np
+
+from specdata import emit
+from specdata.convert import MODE_PREFIXES, cpuRatioPairs, groupByCPU, suiteNames
+from specdata.graphs import convert, identify, load
+from specdata.instrument import span, startWorker
+
+
+#---------------------------------------------------------
+#  Bootstrap confidence intervals for the conversion ratios
+#
+#  The ratio between two consecutive suites is the geometric mean of
+#  the ratios of the CPUs with results in both. Drawing those CPUs
+#  again with replacement and solving again shows how much the ratios,
+#  and every converted score with them, depend on which CPUs happened
+#  to be measured in both suites.
+#
+#  A CPU is drawn as a whole, with all the suite pairs it has, so the
+#  chained conversion factors keep their correlation. A resample is the
+#  number of times each CPU was drawn; with the CPUs' log ratios in a
+#  matrix, a batch of resamples is solved by two matrix products.
+#  Batches are spread over a process pool and each has its own seed,
+#  so the intervals don't depend on the number of processes.
+#---------------------------------------------------------
+
+BATCH_SIZE = 500
+
+# point is the estimate solveRatios() gives; low and high bound the
+# interval; stdErr is the standard deviation of the log, i.e. the
+# relative error.
+Interval = collections.namedtuple('Interval', 'point low high stdErr')
+
+BootstrapRatios = collections.namedtuple('BootstrapRatios',
+    'benchTypes resamples level seed sharedCPUs degenerate ratios freqRatios conversion freqConversion')
+
+def pairMatrices(resultsByCPU, benchTypes):
+    # Returns (logs, freqLogs, mask) with a row per CPU that has results
+    # in two consecutive suites and a column per suite: column i holds
+    # the CPU's log ratio between suites i-1 and i. Column 0 is empty.
+    rows = [pairs for pairs in (cpuRatioPairs(cpu, results, benchTypes)
+                                for cpu, results in resultsByCPU.items()) if pairs]
+    shape = (len(rows), len(benchTypes))
+    logs, freqLogs, mask = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    with np.errstate(divide='ignore'):
+        for row, pairs in enumerate(rows):
+            for i, ratio, freqRatio in pairs:
+                logs[row, i] = np.log(ratio)
+                freqLogs[row, i] = np.log(freqRatio)
+                mask[row, i] = 1
+    return logs, freqLogs, mask
+
+def resampleBatch(args):
+    # Returns the log ratios and log frequency ratios of count
+    # resamples, a row per resample. A suite pair none of whose CPUs
+    # were drawn is NaN; one that never had any CPUs has a ratio of 1,
+    # as in solveRatios().
+    logs, freqLogs, mask, seed, count = args
+    rng = np.random.default_rng(seed)
+    n = len(mask)
+    weights = rng.multinomial(n, np.full(n, 1.0 / n), size=count).astype(float)
+    drawn = weights @ mask
+    with np.errstate(invalid='ignore', divide='ignore'):
+        logRatios = (weights @ logs) / drawn
+        freqLogRatios = (weights @ freqLogs) / drawn
+    empty = mask.sum(axis=0) == 0
+    logRatios[:, empty] = 0
+    freqLogRatios[:, empty] = 0
+    return logRatios, freqLogRatios
+
+def chainLogs(logRatios):
+    # chainRatios() for every row, in logs: conversion[i] is the
+    # product of ratios[i + 1:].
+    suffix = np.cumsum(logRatios[:, ::-1], axis=1)[:, ::-1]
+    return np.concatenate([suffix[:, 1:], np.zeros((len(logRatios), 1))], axis=1)
+
+def pointIntervals(points):
+    # With nothing to resample: the point estimates, with no spread.
+    return [Interval(p, p, p, 0.0) for p in points]
+
+def intervals(points, logSamples, level):
+    if not len(logSamples):
+        return pointIntervals(points)
+    tail = 50 * (1 - level)
+    low, high = np.nanpercentile(logSamples, [tail, 100 - tail], axis=0)
+    stdErr = np.nanstd(logSamples, axis=0)
+    return [Interval(p, math.exp(l), math.exp(h), float(e)) for p, l, h, e in zip(points, low, high, stdErr)]
+
+def bootstrapRatios(resultsByCPU, benchTypes, ratios, resamples=10000, level=0.95, seed=0, jobs=None):
+    # ratios are the point estimates, as solveRatios() returns them.
+    logs, freqLogs, mask = pairMatrices(resultsByCPU, benchTypes)
+    if not len(mask):
+        # No CPU has results in two suites, so the ratios are all 1 and
+        # there's nothing to draw.
+        return BootstrapRatios(benchTypes, resamples, level, seed, [0] * len(benchTypes), 0,
+                               pointIntervals(ratios.ratios), pointIntervals(ratios.freqRatios),
+                               pointIntervals(ratios.conversion), pointIntervals(ratios.freqConversion))
+    starts = range(0, resamples, BATCH_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    batches = [(logs, freqLogs, mask, s, min(BATCH_SIZE, resamples - start)) for s, start in zip(seeds, starts)]
+    with span('bootstrap', resamples):
+        if jobs == 1 or len(batches) <= 1:
+            parts = [resampleBatch(b) for b in batches]
+        else:
+            with multiprocessing.Pool(jobs, startWorker) as pool:
+                parts = pool.map(resampleBatch, batches)
+                pool.close()
+                pool.join()
+    logRatios = np.concatenate([p[0] for p in parts])
+    freqLogRatios = np.concatenate([p[1] for p in parts])
+    # Resamples that miss every CPU of some suite pair can't be solved.
+    solved = ~np.isnan(logRatios).any(axis=1)
+    return BootstrapRatios(benchTypes, resamples, level, seed,
+                           [int(n) for n in mask.sum(axis=0)], int(resamples - solved.sum()),
+                           intervals(ratios.ratios, logRatios[solved], level),
+                           intervals(ratios.freqRatios, freqLogRatios[solved], level),
+                           intervals(ratios.conversion, chainLogs(logRatios[solved]), level),
+                           intervals(ratios.freqConversion, chainLogs(freqLogRatios[solved]), level))
+
+def saveBootstrap(path, mode, b):
+    data = {'mode': mode, 'benchTypes': b.benchTypes, 'resamples': b.resamples, 'level': b.level,
+            'seed': b.seed, 'sharedCPUs': b.sharedCPUs, 'degenerate': b.degenerate,
+            'fields': list(Interval._fields)}
+    for name in ['ratios', 'freqRatios', 'conversion', 'freqConversion']:
+        data[name] = [list(i) for i in getattr(b, name)]
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+def printBootstrap(mode, b):
+    print('%s: %d resamples, %g%% intervals%s' % (mode, b.resamples, 100 * b.level,
+          ', %d left out for missing a suite pair' % b.degenerate if b.degenerate else ''))
+    print('    %-10s %5s  %-28s %-28s' % ('suite', 'CPUs', 'ratio to previous suite', 'conversion to ' + b.benchTypes[-1]))
+    for i, suite in enumerate(b.benchTypes):
+        r, c = b.ratios[i], b.conversion[i]
+        print('    %-10s %5d  %8.4f [%8.4f, %8.4f]  %8.4f [%8.4f, %8.4f]' % (
+            suite, b.sharedCPUs[i], r.point, r.low, r.high, c.point, c.low, c.high))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bootstrap confidence intervals for the conversion ratios between SPEC suites.')
+    parser.add_argument('--summaries', default='summaries.txt')
+    parser.add_argument('--benchmarks', default='benchmarks.txt')
+    parser.add_argument('--modes', default='INT', help='comma-separated list of: ' + ', '.join(sorted(MODE_PREFIXES)))
+    parser.add_argument('--resamples', type=int, default=10000)
+    parser.add_argument('--level', type=float, default=0.95, help='confidence level (default 0.95)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--scores', action='store_true', help='also write <mode>_data_ci.csv, the converted scores with their intervals')
+    args = parser.parse_args(argv)
+    modes = [m for m in args.modes.split(',') if m]
+    unknown = set(modes) - set(MODE_PREFIXES)
+    if unknown:
+        parser.error('unknown modes: %s' % ', '.join(sorted(unknown)))
+    if args.resamples < 1 or not 0 < args.level < 1:
+        parser.error('--resamples must be positive and --level between 0 and 1')
+
+    for mode in modes:
+        benchTypes = suiteNames(mode)
+        results = load(args.summaries, args.benchmarks, benchTypes)
+        cpudb, cpus = identify(results)
+        modeResults = convert(results, cpus, mode)
+        b = bootstrapRatios(groupByCPU(results, cpus, benchTypes), benchTypes, modeResults.ratios,
+                            args.resamples, args.level, args.seed, args.jobs)
+        saveBootstrap('%s_ratio_ci.json' % mode.lower(), mode, b)
+        if args.scores:
+            emit.writeDataIntervals('%s_data_ci.csv' % mode.lower(), modeResults.resultsByBrand,
+                                    benchTypes, b.conversion, b.freqConversion)
+        printBootstrap(mode, b)
@@ -0,0 +1,53 @@
+import os
+import pickle
+
+
+#---------------------------------------------------------
+#  Append-only checkpoint log
+#
+#  Batches of (key, value) pairs are appended as consecutive pickles
+#  and fsync'ed, so saving costs only the size of the new batch. A
+#  batch cut short by a crash is ignored when loading.
+#---------------------------------------------------------
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, repair=True):
+        # With repair=False the file is only read, for a reader that
+        # runs alongside the process appending to it.
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, 'r+b' if repair else 'rb') as f:
+            good = 0
+            while True:
+                # A torn or corrupt pickle can fail in many ways
+                # (AttributeError, IndexError, KeyError, ...); whatever
+                # the error, the log ends at the last good batch.
+                try:
+                    batch = dict(pickle.load(f))
+                except Exception:
+                    break
+                entries.update(batch)
+                good = f.tell()
+            # Drop a torn write at the end, so later batches stay readable.
+            if repair:
+                f.truncate(good)
+        return entries
+
+    def append(self, batch):
+        # batch is a list of (key, value) pairs.
+        if not batch:
+            return
+        # A single write to a file opened for appending, so that batches
+        # from processes appending at the same time don't interleave.
+        data = pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+        with open(self.path, 'ab', buffering=0) as f:
+            f.write(data)
+            os.fsync(f.fileno())
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
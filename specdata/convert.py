@@ -0,0 +1,96 @@
+import collections
+from functools import reduce
+
+from specdata.instrument import span
+from specdata.results import geometricAverage
+
+
+#---------------------------------------------------------
+#  Normalize scores across suites
+#---------------------------------------------------------
+
+ResultInBrand = collections.namedtuple('ResultInBrand', 'hwDate convertedScore cpu result convertedScoreMhz benchType')
+
+# ratios[i] converts suite i-1 into suite i (ratios[0] is always 1);
+# conversion[i] converts suite i into the newest suite.
+Ratios = collections.namedtuple('Ratios', 'ratios freqRatios conversion freqConversion')
+
+# Modes and the benchType prefix of their suites: speed and rate
+# (throughput) results, integer and floating point.
+MODE_PREFIXES = {'INT': 'CINT', 'FP': 'CFP', 'RINT': 'RINT', 'RFP': 'RFP'}
+
+def suiteNames(mode):
+    return [MODE_PREFIXES[mode] + g for g in ['95', '2000', '2006', '2017']]
+
+def groupByCPU(results, cpus, benchTypes):
+    # resultsByCPU: Maps CPUInfo to a list of results using that cpu.
+    resultsByCPU = collections.defaultdict(list)
+    for r, cpu in zip(results, cpus):
+        if r.benchType in benchTypes:
+            resultsByCPU[cpu].append(r)
+    return resultsByCPU
+
+def cpuRatioPairs(cpu, results, benchTypes):
+    # Returns (i, ratio, freqRatio) for each pair of consecutive suites
+    # i-1 and i that this CPU has results in.
+    sliceByType = [[r.score for r in results if r.benchType == b] for b in benchTypes]
+    pairs = []
+    for i in range(1, len(benchTypes)):
+        if sliceByType[i - 1] and sliceByType[i]:
+            # We have a conversion ratio between these two suites for this CPU.
+            pairs.append((i, geometricAverage(sliceByType[i]) / geometricAverage(sliceByType[i - 1]),
+                          geometricAverage([s / cpu.mhz for s in sliceByType[i]]) /
+                          geometricAverage([s / cpu.mhz for s in sliceByType[i - 1]])))
+    return pairs
+
+def solveRatios(resultsByCPU, benchTypes):
+    # Find conversion ratios by taking the geometric average of all
+    # available conversion ratios between consecutive suites.
+    with span('ratios', len(resultsByCPU)):
+        pairs = [[] for b in benchTypes]
+        freqPairs = [[] for b in benchTypes]
+        for cpu, results in resultsByCPU.items():
+            for i, ratio, freqRatio in cpuRatioPairs(cpu, results, benchTypes):
+                pairs[i].append(ratio)
+                freqPairs[i].append(freqRatio)
+
+        ratios = [1] + [geometricAverage(p) for p in pairs[1:]]
+        freqRatios = [1] + [geometricAverage(p) for p in freqPairs[1:]]
+        conversion = chainRatios(ratios)
+        freqConversion = chainRatios(freqRatios)
+        return Ratios(ratios, freqRatios, conversion, freqConversion)
+
+def chainRatios(ratios):
+    # Multiplied oldest-first, matching how the ratios were always chained.
+    return [reduce(lambda x, y: x * y, ratios[i + 1:], 1) for i in range(len(ratios))]
+
+def affectsRatios(results, benchTypes, benchType):
+    # Whether adding a benchType result to a CPU with these results can
+    # change the ratios: only CPUs with results in two consecutive
+    # suites contribute to them.
+    i = benchTypes.index(benchType)
+    neighbours = benchTypes[max(0, i - 1):i] + benchTypes[i + 1:i + 2]
+    return any(r.benchType in neighbours for r in results)
+
+def hasScore(r):
+    # A score of zero comes from a broken page. Such results still count
+    # towards the ratios, but are left out of every output: the CSV, the
+    # report, the graphs and the cube alike.
+    return r.score > 0
+
+def convertResult(r, cpu, benchTypes, ratios):
+    i = benchTypes.index(r.benchType)
+    convertedScore = r.score * ratios.conversion[i]
+    convertedScoreMhz = (r.score / cpu.mhz) * ratios.freqConversion[i]
+    return ResultInBrand(r.hwDate, convertedScore, cpu, r, convertedScoreMhz, r.benchType)
+
+def convertResults(resultsByCPU, benchTypes, ratios):
+    # Group results by brand, convert scores and sort.
+    resultsByBrand = collections.defaultdict(list)
+    for cpu, results in resultsByCPU.items():
+        for r in results:
+            if hasScore(r):
+                resultsByBrand[cpu.brand].append(convertResult(r, cpu, benchTypes, ratios))
+    for rib in resultsByBrand.values():
+        rib.sort()
+    return resultsByBrand
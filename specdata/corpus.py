@@ -0,0 +1,497 @@
+import collections
+import functools
+import http.server
+import math
+import os
+import random
+import threading
+
+
+#---------------------------------------------------------
+#  Synthetic SPEC CPU result corpus
+#
+#  Writes result pages in the fixed-width layouts expected by
+#  parse95/parse2000/parse2006/parse2017 in analyze-pages.py, for
+#  the integer and floating point, speed and rate result classes,
+#  either as SPEC's website tree (index pages + result files, to be
+#  served to fetch-pages.py) or directly as the scraped/ folder.
+#---------------------------------------------------------
+
+Suite = collections.namedtuple('Suite', 'benchType scrapedDir indexPath resultsDir ext firstDate lastDate share scale benchmarks resultClass generation')
+
+# One generation of SPEC CPU each; the result classes of a generation
+# share its page layout and its date range.
+Generation = collections.namedtuple('Generation', 'name ext firstDate lastDate')
+
+GENERATIONS = [
+    Generation('95', '.asc', (1995, 1), (2000, 6)),
+    Generation('2000', '.asc', (1999, 6), (2007, 3)),
+    Generation('2006', '.txt', (2005, 6), (2017, 12)),
+    Generation('2017', '.txt', (2016, 6), (2024, 12)),
+]
+
+# Result classes: integer and floating point speed, and the rate
+# (throughput) variants of both. Only cint is generated by default,
+# which gives the same corpus as before the other classes existed.
+RESULT_CLASSES = ['cint', 'cfp', 'rint', 'rfp']
+
+# (class, generation) -> share, score scale, benchmarks
+SUITE_TABLE = {
+    ('cint', '95'): (0.05, 66.0,
+        ['099.go', '124.m88ksim', '126.gcc', '129.compress', '130.li', '132.ijpeg',
+         '134.perl', '147.vortex']),
+    ('cint', '2000'): (0.20, 660.0,
+        ['164.gzip', '175.vpr', '176.gcc', '181.mcf', '186.crafty', '197.parser',
+         '252.eon', '253.perlbmk', '254.gap', '255.vortex', '256.bzip2', '300.twolf']),
+    ('cint', '2006'): (0.50, 6.0,
+        ['400.perlbench', '401.bzip2', '403.gcc', '429.mcf', '445.gobmk', '456.hmmer',
+         '458.sjeng', '462.libquantum', '464.h264ref', '471.omnetpp', '473.astar',
+         '483.xalancbmk']),
+    ('cint', '2017'): (0.25, 1.0,
+        ['600.perlbench_s', '602.gcc_s', '605.mcf_s', '620.omnetpp_s', '623.xalancbmk_s',
+         '625.x264_s', '631.deepsjeng_s', '641.leela_s', '648.exchange2_s', '657.xz_s']),
+    ('cfp', '95'): (0.04, 80.0,
+        ['101.tomcatv', '102.swim', '103.su2cor', '104.hydro2d', '107.mgrid', '110.applu',
+         '125.turb3d', '141.apsi', '145.fpppp', '146.wave5']),
+    ('cfp', '2000'): (0.15, 700.0,
+        ['168.wupwise', '171.swim', '172.mgrid', '173.applu', '177.mesa', '178.galgel',
+         '179.art', '183.equake', '187.facerec', '188.ammp', '189.lucas', '191.fma3d',
+         '200.sixtrack', '301.apsi']),
+    ('cfp', '2006'): (0.35, 7.0,
+        ['410.bwaves', '416.gamess', '433.milc', '434.zeusmp', '435.gromacs', '436.cactusADM',
+         '437.leslie3d', '444.namd', '447.dealII', '450.soplex', '453.povray', '454.calculix',
+         '459.GemsFDTD', '465.tonto', '470.lbm', '481.wrf', '482.sphinx3']),
+    ('cfp', '2017'): (0.20, 1.2,
+        ['603.bwaves_s', '607.cactuBSSN_s', '619.lbm_s', '621.wrf_s', '627.cam4_s',
+         '628.pop2_s', '638.imagick_s', '644.nab_s', '649.fotonik3d_s', '654.roms_s']),
+    ('rint', '95'): (0.03, 600.0, None),
+    ('rint', '2000'): (0.15, 800.0, None),
+    ('rint', '2006'): (0.40, 60.0, None),
+    ('rint', '2017'): (0.30, 10.0,
+        ['500.perlbench_r', '502.gcc_r', '505.mcf_r', '520.omnetpp_r', '523.xalancbmk_r',
+         '525.x264_r', '531.deepsjeng_r', '541.leela_r', '548.exchange2_r', '557.xz_r']),
+    ('rfp', '95'): (0.03, 700.0, None),
+    ('rfp', '2000'): (0.12, 900.0, None),
+    ('rfp', '2006'): (0.30, 70.0, None),
+    ('rfp', '2017'): (0.25, 12.0,
+        ['503.bwaves_r', '507.cactuBSSN_r', '508.namd_r', '510.parest_r', '511.povray_r',
+         '519.lbm_r', '521.wrf_r', '526.blender_r', '527.cam4_r', '538.imagick_r',
+         '544.nab_r', '549.fotonik3d_r', '554.roms_r']),
+}
+
+def makeSuites():
+    # Before 2017, rate runs use the same benchmarks as speed runs.
+    suites = []
+    for resultClass in RESULT_CLASSES:
+        for g in GENERATIONS:
+            share, scale, benchmarks = SUITE_TABLE[resultClass, g.name]
+            if benchmarks is None:
+                benchmarks = SUITE_TABLE['c' + resultClass[1:], g.name][2]
+            resultsDir = 'cpu%s/results' % g.name
+            suites.append(Suite(resultClass.upper() + g.name, resultClass + g.name,
+                                '%s/%s%s.html' % (resultsDir, resultClass, g.name), resultsDir, g.ext,
+                                g.firstDate, g.lastDate, share, scale, benchmarks, resultClass, g.name))
+    return suites
+
+SUITES = makeSuites()
+
+# (CPU name, available MHz, first year, last year, CINT2017 score per MHz)
+# Names are written the way submitters tend to spell them, so that
+# identifyCPU() in make-graphs.py recognizes most of them.
+CPU_CATALOG = [
+    ('Pentium', [100, 133, 166], 1995, 1997, 0.00022),
+    ('Pentium Pro', [150, 180, 200], 1995, 1998, 0.00030),
+    ('Intel Pentium II', [233, 300, 400, 450], 1997, 1999, 0.00033),
+    ('Intel Pentium III', [450, 600, 800, 1000], 1999, 2002, 0.00035),
+    ('Alpha 21164', [300, 500, 600], 1995, 1999, 0.00028),
+    ('Alpha 21264', [500, 667, 833], 1998, 2001, 0.00040),
+    ('UltraSPARC II', [250, 300, 400], 1996, 2000, 0.00024),
+    ('PA-8600', [552], 2000, 2001, 0.00036),
+    ('POWER3', [200, 375, 450], 1998, 2001, 0.00034),
+    ('Intel Pentium 4', [1500, 2000, 2400, 3000, 3400, 3800], 2000, 2006, 0.00025),
+    ('AMD Athlon 64 3200+', [2000, 2200, 2400], 2003, 2006, 0.00045),
+    ('AMD Opteron 254', [2800], 2005, 2007, 0.00046),
+    ('Intel Core 2 Duo E6700', [2666, 2933], 2006, 2008, 0.00060),
+    ('Intel Xeon X5570', [2933], 2009, 2010, 0.00068),
+    ('Intel Core i7-2600K', [3400], 2011, 2012, 0.00075),
+    ('Intel Xeon E5-2690', [2900], 2012, 2013, 0.00074),
+    ('AMD FX-8350', [4000], 2012, 2014, 0.00050),
+    ('AMD A10-6800K', [4100], 2013, 2014, 0.00083),
+    ('Intel Core i7-4770', [3400], 2013, 2015, 0.00085),
+    ('IBM POWER8', [3500, 4000], 2014, 2017, 0.00070),
+    ('Intel Xeon Gold 6148', [2400], 2017, 2019, 0.00110),
+    ('Intel Core i9-9900K', [3600], 2018, 2020, 0.00160),
+    ('AMD EPYC 7601', [2200], 2017, 2019, 0.00120),
+    ('AMD EPYC 7763', [2450], 2021, 2023, 0.00160),
+    ('Intel Xeon Platinum 8380', [2300], 2021, 2023, 0.00150),
+    ('IBM POWER9', [3800], 2018, 2021, 0.00090),
+]
+
+VENDORS = ['Dell Inc.', 'Hewlett-Packard Company', 'IBM Corporation', 'Sun Microsystems',
+           'Fujitsu', 'Lenovo Global Technology', 'Supermicro', 'Cisco Systems', 'Intel Corporation']
+OPERATING_SYSTEMS = ['Windows NT 4.0', 'Solaris 2.6', 'HP-UX 11.0', 'AIX 4.3.3',
+                     'Red Hat Enterprise Linux 6.2', 'SUSE Linux Enterprise Server 12 SP3',
+                     'Windows Server 2008 R2', 'Ubuntu 20.04.1 LTS']
+COMPILERS = ['Intel C++ Compiler 6.0', 'Compaq C V6.3', 'Sun Forte Developer 6',
+             'IBM XL C/C++ Enterprise Edition V8.0', 'C/C++: Version 19.0.1.144 of Intel C/C++',
+             'GCC 7.3.0', 'AOCC 2.0.0']
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+TestPage = collections.namedtuple('TestPage', 'suite testID urlPath text')
+
+
+def monthIndex(year, month):
+    return year * 12 + month - 1
+
+def pickMonth(rng, lo, hi):
+    m = rng.randint(lo, hi)
+    return m // 12, m % 12 + 1
+
+def benchmarkRatios(rng, suite, score):
+    # Spread the summary score over the benchmarks with a geometric
+    # mean that matches it exactly.
+    logs = [rng.gauss(0, 0.25) for b in suite.benchmarks]
+    shift = sum(logs) / len(logs)
+    return [score * math.exp(x - shift) for x in logs]
+
+def fmtScore(value):
+    if value >= 100:
+        return '%d' % value
+    if value >= 10:
+        return '%.1f' % value
+    return '%.2f' % value
+
+
+#---------------------------------------------------------
+#  Page layouts
+#---------------------------------------------------------
+
+def summaryLabels(suite):
+    # (base, peak) labels of the summary lines, spelled the way the
+    # parsers in analyze-pages.py expect them.
+    kind = 'fp' if suite.resultClass.endswith('fp') else 'int'
+    rate = '_rate' if suite.resultClass.startswith('r') else ''
+    g = suite.generation
+    if g == '95':
+        return 'SPEC%s%s_base95 (Geom. Mean)' % (kind, rate), 'SPEC%s%s95 (Geom. Mean)' % (kind, rate)
+    if g == '2000':
+        return 'SPEC%s%s_base2000' % (kind, rate), 'SPEC%s%s2000' % (kind, rate)
+    if g == '2006':
+        return 'SPEC%s(R)%s_base2006' % (kind, rate), 'SPEC%s%s2006' % (kind, rate)
+    metric = 'SPEC%s2017_%s' % ('rate' if rate else 'speed', kind)
+    return metric + '_base', metric + '_peak'
+
+def layout95(t, suite):
+    baseLabel, peakLabel = summaryLabels(suite)
+    lines = [
+        '                              SPEC %s Summary' % suite.benchType,
+        '                 %s %s' % (t.vendor, t.machine),
+        '                 Tested: %s' % t.testDate,
+        '',
+        '%s = %s    %s = %s' % (baseLabel.split(' (')[0], fmtScore(t.base), peakLabel.split(' (')[0], fmtScore(t.peak)),
+        '',
+        '   Benchmark       Reference   Base      Base      Peak      Peak',
+        '   Name              Time     Runtime    Ratio    Runtime    Ratio',
+        '   ------------  --------  --------  --------  --------  --------  --------',
+    ]
+    for name, base, peak in t.benches:
+        lines.append('   %-12s%10d%10d%10s%10d%10d%10s' % (
+            name, 4000, 4000 / base, '%.1f' % base, 4000, 4000 / peak, '%.1f' % peak))
+    lines.append('   %-32s%10s' % (baseLabel, '%.1f' % t.base))
+    lines.append('   %-62s%10s' % (peakLabel, '%.1f' % t.peak))
+    lines += [
+        '',
+        '                                   HARDWARE',
+        '                                   --------',
+        '%19s: %s' % ('Model Name', t.machine),
+        '%19s: %s %dMHz' % ('CPU', t.cpu, t.mhz),
+        '%19s: %s' % ('FPU', 'Integrated'),
+        '%19s: %s' % ('Primary Cache', '16KBI+16KBD'),
+        '%19s: %s' % ('Memory', '128MB'),
+        '',
+        '                                   SOFTWARE',
+        '                                   --------',
+        '%19s: %s' % ('Operating System', t.os),
+        '%19s: %s' % ('Compiler', t.compiler),
+        '%19s: %s' % ('File System', 'UFS'),
+        '',
+        '                              TESTER INFORMATION',
+        '                              ------------------',
+        '%19s: %s' % ('Tested By', t.vendor),
+        '%19s: %s' % ('Test Date', t.testDate),
+        '%19s: %s' % ('Hardware Avail', '%s-%02d' % (MONTHS[t.month - 1], t.year % 100)),
+        '%19s: %s' % ('Software Avail', '%s-%02d' % (MONTHS[t.month - 1], t.year % 100)),
+        '',
+        '                                     NOTES',
+        '                                     -----',
+        '     Synthetic result generated for benchmarking.',
+    ]
+    return lines
+
+def layout2000(t, suite):
+    baseLabel, peakLabel = summaryLabels(suite)
+    hwAvail = '%s-%d' % (MONTHS[t.month - 1], t.year)
+    lines = [
+        '                                 SPEC %s Summary' % suite.benchType,
+        '   %-50sTest date: %s' % (t.vendor + ' ' + t.machine, t.testDate),
+        '   Hardware availability: %s' % hwAvail,
+        '   Tester: %-40s Software availability: %s' % (t.vendor, hwAvail),
+        '',
+        '                                  Reference   Base      Base      Peak      Peak',
+        '   Benchmark                         Time    Runtime    Ratio    Runtime    Ratio',
+        '   ' + '=' * 72,
+    ]
+    for name, base, peak in t.benches:
+        lines.append('   %-12s%10d%10.1f%10s%10d%10.1f%10s' % (
+            name, 1400, 140000.0 / base, '%d' % base, 1400, 140000.0 / peak, '%d' % peak))
+    lines.append('   %-32s%10s' % (baseLabel, '%d' % t.base))
+    lines.append('   %-62s%10s' % (peakLabel, '%d' % t.peak))
+    lines += [
+        '',
+        '                                   HARDWARE',
+        '                                   --------',
+        '%20s: %s' % ('CPU', t.cpu),
+        '%20s: %d' % ('CPU MHz', t.mhz),
+        '%20s: %s' % ('FPU', 'Integrated'),
+        '%20s: %s' % ('CPU(s) enabled', '1 core, 1 chip, 1 core/chip'),
+        '%20s: %s' % ('Memory', '2 GB'),
+        '%20s: %s' % ('Model Name', t.machine),
+        '',
+        '                                   SOFTWARE',
+        '                                   --------',
+        '%20s: %s' % ('Operating System', t.os),
+        '%20s: %s' % ('Compiler', t.compiler),
+        '%20s: %s' % ('File System', 'NTFS'),
+        '',
+        '                                     NOTES',
+        '                                     -----',
+        '     Synthetic result generated for benchmarking.',
+    ]
+    return lines
+
+def layout2006(t, suite):
+    baseLabel, peakLabel = summaryLabels(suite)
+    hwAvail = '%s-%d' % (MONTHS[t.month - 1], t.year)
+    lines = [
+        '                           SPEC(R) %s Summary' % suite.benchType,
+        '%s %s' % (t.vendor, t.machine),
+        '                                                           Test date: %s' % t.testDate,
+        'CPU2006 license: 55                                      Hardware availability: %s' % hwAvail,
+        'Tested by:    %-42s Software availability: %s' % (t.vendor, hwAvail),
+        '',
+        '                                  Base     Base       Base        Peak     Peak       Peak',
+        'Benchmarks          Ref.   Run Time     Ratio       Ref.   Run Time     Ratio',
+        '=' * 78,
+    ]
+    for name, base, peak in t.benches:
+        lines.append('%-15s%8d%10d%10s%22s%10s' % (
+            name, 9770, 9770 / base, '%.1f' % base, '', '%.1f' % peak))
+    lines.append(' %-32s%10s' % (baseLabel, '%.1f' % t.base))
+    lines.append(' %-64s%10s' % (peakLabel, '%.1f' % t.peak))
+    lines += [
+        '',
+        '                                   HARDWARE',
+        '                                   --------',
+        '%20s: %s' % ('CPU Name', t.cpu),
+        '%20s: %s' % ('CPU Characteristics', 'Turbo Boost Technology'),
+        '%20s: %d' % ('CPU MHz', t.mhz),
+        '%20s: %s' % ('FPU', 'Integrated'),
+        '%20s: %s' % ('CPU(s) enabled', '4 cores, 1 chip, 4 cores/chip'),
+        '%20s: %s' % ('Memory', '16 GB'),
+        '',
+        '                                   SOFTWARE',
+        '                                   --------',
+        '%20s: %s' % ('Operating System', t.os),
+        '%20s: %s' % ('Compiler', t.compiler),
+        '%20s: %s' % ('Auto Parallel', t.autoParallel),
+        '%20s: %s' % ('File System', 'ext4'),
+        '',
+        '                                 Submit Notes',
+        '                                 ------------',
+        '     Synthetic result generated for benchmarking.',
+    ]
+    return lines
+
+def layout2017(t, suite):
+    baseLabel, peakLabel = summaryLabels(suite)
+    hwAvail = '%s-%d' % (MONTHS[t.month - 1], t.year)
+    lines = [
+        '                     SPEC(R) CPU2017 %s %s Result' % (
+            'Floating Point' if suite.resultClass.endswith('fp') else 'Integer',
+            'Rate' if suite.resultClass.startswith('r') else 'Speed'),
+        '%s %s' % (t.vendor, t.machine),
+        '                                                           Test date: %s' % t.testDate,
+        'CPU2017 License: 55                                      Hardware availability: %s' % hwAvail,
+        'Tested by:    %-42s Software availability: %s' % (t.vendor, hwAvail),
+        '',
+        '                       Estimated                       Estimated',
+        '                Base     Base        Base        Peak     Peak        Peak',
+        'Benchmarks     Threads  Run Time     Ratio      Threads  Run Time     Ratio',
+        '=' * 78,
+    ]
+    for name, base, peak in t.benches:
+        line = '%-16s%3d%8d%8d%10s%11d%11d%11s   ' % (
+            name, 1, 1775, 1775 / base, '%.2f' % base, 1, 1775 / peak, '%.2f' % peak)
+        assert len(line) == 81
+        lines.append(line)
+    lines.append(' %-34s%10s' % (baseLabel, '%.2f' % t.base))
+    lines.append(' %-66s%11s' % (peakLabel, '%.2f' % t.peak))
+    lines += [
+        '',
+        '                                   HARDWARE',
+        '                                   --------',
+        '%20s: %s' % ('CPU Name', t.cpu),
+        '%20s: %d' % ('Max MHz.', t.mhz * 1.3),
+        '%20s: %d' % ('Nominal', t.mhz),
+        '%20s: %s' % ('Enabled', '20 cores, 1 chip'),
+        '%20s: %s' % ('Memory', '192 GB'),
+        '',
+        '                                   SOFTWARE',
+        '                                   --------',
+        '%20s: %s' % ('OS', t.os),
+        '%20s: %s' % ('Compiler', t.compiler),
+        '%20s: %s' % ('Parallel', t.autoParallel),
+        '%20s: %s' % ('File System', 'xfs'),
+        '',
+        '                                 Submit Notes',
+        '                                 ------------',
+        '     Synthetic result generated for benchmarking.',
+    ]
+    return lines
+
+LAYOUTS = {
+    '95': layout95,
+    '2000': layout2000,
+    '2006': layout2006,
+    '2017': layout2017,
+}
+
+NONCOMPLIANT_NOTE = {
+    '95': 'SPEC has determined that this result was not in compliance',
+    '2000': 'SPEC has determined that this result was not in compliance',
+    '2006': 'SPEC has determined that this result is not in compliance',
+    '2017': 'SPEC(R) has determined that this result does not comply',
+}
+
+PageFields = collections.namedtuple('PageFields', 'vendor machine cpu mhz year month testDate os compiler autoParallel base peak benches')
+
+
+#---------------------------------------------------------
+#  Corpus generation
+#---------------------------------------------------------
+
+def iterTestPages(count, seed=1, noncompliant=0.01, classes=('cint',)):
+    rng = random.Random(seed)
+    suites = [s for s in SUITES if s.resultClass in classes]
+    weights = [s.share for s in suites]
+    serial = collections.Counter()
+    for i in range(count):
+        suite = rng.choices(suites, weights)[0]
+        lo = monthIndex(*suite.firstDate)
+        hi = monthIndex(*suite.lastDate)
+        candidates = [c for c in CPU_CATALOG
+                      if monthIndex(c[2], 1) <= hi and monthIndex(c[3], 12) >= lo]
+        cpu, speeds, firstYear, lastYear, perMHz = rng.choice(candidates)
+        year, month = pickMonth(rng, max(lo, monthIndex(firstYear, 1)), min(hi, monthIndex(lastYear, 12)))
+        mhz = rng.choice(speeds)
+        score = perMHz * mhz * suite.scale * math.exp(rng.gauss(0, 0.05))
+        ratios = benchmarkRatios(rng, suite, score)
+        peakBoost = 1 + rng.random() * 0.1
+        vendor = rng.choice(VENDORS)
+        fields = PageFields(
+            vendor=vendor,
+            machine='%s Model %d' % (vendor.split()[0], rng.randint(100, 9999)),
+            cpu=cpu,
+            mhz=mhz,
+            year=year,
+            month=month,
+            testDate='%s-%d' % (MONTHS[month - 1], year),
+            os=rng.choice(OPERATING_SYSTEMS),
+            compiler=rng.choice(COMPILERS),
+            autoParallel='Yes' if rng.random() < 0.1 else 'No',
+            base=score,
+            peak=score * peakBoost,
+            benches=[(b, r, r * peakBoost) for b, r in zip(suite.benchmarks, ratios)])
+        # Test IDs are numbered per generation, as on SPEC's site.
+        prefix = suite.resultsDir.split('/')[0]
+        serial[prefix] += 1
+        if suite.generation == '95':
+            testID = '%s-%02d%02d%02d-%05d' % (prefix, year % 100, month, 1 + i % 28, serial[prefix])
+        else:
+            testID = '%s-%d%02d%02d-%05d' % (prefix, year, month, 1 + i % 28, serial[prefix])
+        urlPath = '%s/res%dq%d/%s%s' % (suite.resultsDir, year, (month - 1) // 3 + 1, testID, suite.ext)
+        lines = LAYOUTS[suite.generation](fields, suite)
+        if rng.random() < noncompliant:
+            # The parsers only look for the note between the header and
+            # the table separator.
+            separator = [l.lstrip()[:3] in ['---', '==='] for l in lines].index(True)
+            lines.insert(separator, NONCOMPLIANT_NOTE[suite.generation])
+        yield TestPage(suite, testID, urlPath, '\n'.join(lines) + '\n')
+
+def indexLink(suite, urlPath):
+    # Mirrors the link style of SPEC's own index pages, which is what
+    # iterateAllPageURLs() in fetch-pages.py expects.
+    if suite.generation == '95':
+        return '/' + urlPath
+    return urlPath[len(suite.resultsDir) + 1:]
+
+def writeIndexPage(path, suite, links):
+    with open(path, 'w') as f:
+        f.write('<html><head><title>%s results</title></head><body>\n' % suite.benchType)
+        f.write('<table>\n')
+        for link in links:
+            f.write('<tr><td><a href="%s">%s</a></td></tr>\n' % (link, os.path.basename(link)))
+        f.write('</table>\n</body></html>\n')
+
+def generateCorpus(outDir, count, seed=1, site=False, scraped=True, noncompliant=0.01, classes=('cint',)):
+    links = collections.defaultdict(list)
+    made = set()
+    written = 0
+    for page in iterTestPages(count, seed, noncompliant, classes):
+        targets = []
+        if scraped:
+            targets.append(os.path.join(outDir, 'scraped', page.suite.scrapedDir, page.testID + page.suite.ext))
+        if site:
+            targets.append(os.path.join(outDir, 'site', *page.urlPath.split('/')))
+            links[page.suite.benchType].append(indexLink(page.suite, page.urlPath))
+        for path in targets:
+            folder = os.path.dirname(path)
+            if folder not in made:
+                os.makedirs(folder, exist_ok=True)
+                made.add(folder)
+            with open(path, 'w') as f:
+                f.write(page.text)
+        written += 1
+    for suite in [s for s in SUITES if s.resultClass in classes]:
+        if site:
+            path = os.path.join(outDir, 'site', *suite.indexPath.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writeIndexPage(path, suite, links[suite.benchType])
+        if scraped:
+            # Some suites may not have drawn any results at small scales;
+            # analyze-pages.py still expects every folder to exist.
+            os.makedirs(os.path.join(outDir, 'scraped', suite.scrapedDir), exist_ok=True)
+    return written
+
+
+#---------------------------------------------------------
+#  Local stand-in for www.spec.org
+#---------------------------------------------------------
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def serveCorpus(siteDir, port=0):
+    # Serves siteDir on localhost from a background thread.
+    # Point fetch-pages.py at it with SPEC_SITE=http://127.0.0.1:<port>
+    handler = functools.partial(QuietHandler, directory=siteDir)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def siteURL(server):
+    return 'http://%s:%d' % server.server_address[:2]
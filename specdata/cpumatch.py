@@ -0,0 +1,194 @@
+import argparse
+import collections
+import math
+
+from specdata.cpus import cleanCPUName, identifyCPUName
+from specdata.instrument import span
+from specdata.results import SummaryRecord, iterCsvRecords
+
+
+#---------------------------------------------------------
+#  Fuzzy matching of CPU names
+#
+#  Names are compared by their character trigrams, scored with the
+#  Dice coefficient. An inverted index maps each trigram to the names
+#  containing it. A name can only reach a given similarity if it
+#  shares enough trigrams with the query, so it is bound to share one
+#  of the query's rarest few; only the postings of those are read
+#  (prefix filtering), and the candidates found are scored exactly.
+#  Common trigrams like 'int' are never scanned.
+#---------------------------------------------------------
+
+def trigrams(text):
+    padded = ' %s ' % ' '.join(text.lower().split())
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def dice(a, b):
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+class NgramIndex:
+    def __init__(self):
+        self.keys = []
+        self.grams = []
+        self.postings = collections.defaultdict(list)
+
+    def add(self, key, text):
+        i = len(self.keys)
+        grams = trigrams(text)
+        self.keys.append(key)
+        self.grams.append(grams)
+        for g in grams:
+            self.postings[g].append(i)
+        return i
+
+    def search(self, text, threshold=0.5, limit=5, exclude=None):
+        # Returns up to limit (score, key) pairs with a score of at
+        # least threshold, best first.
+        grams = trigrams(text)
+        if not grams:
+            return []
+        # A match shares at least need trigrams, so it contains one of
+        # the |A| - need + 1 rarest.
+        need = minOverlap(len(grams), threshold)
+        rarest = sorted(grams, key=lambda g: len(self.postings.get(g, ())))
+        candidates = set()
+        for g in rarest[:len(grams) - need + 1]:
+            candidates.update(self.postings.get(g, ()))
+        scored = []
+        for i in candidates:
+            if self.keys[i] == exclude:
+                continue
+            score = dice(grams, self.grams[i])
+            if score >= threshold:
+                scored.append((score, self.keys[i]))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return scored[:limit]
+
+def minOverlap(size, threshold):
+    # Dice >= t means sharing at least t*|A|/(2-t) trigrams with A.
+    return max(1, math.ceil(threshold * size / (2 - threshold) - 1e-9))
+
+def clusterNames(names, threshold=0.6):
+    # Groups names that are transitively at least threshold similar.
+    # Returns a list of lists of names. All similar pairs are found in
+    # one pass: trigrams are ranked rarest first across all names, and
+    # each name is only indexed under its first few, which two similar
+    # names are bound to have in common.
+    # Names already in the new name's cluster are dropped from its
+    # candidates as soon as it joins, so big clusters of near-identical
+    # names don't cost a comparison per pair.
+    grams = [trigrams(name) for name in names]
+    df = collections.Counter(g for gs in grams for g in gs)
+    postings = collections.defaultdict(list)
+    clusterOf = list(range(len(names)))
+    members = [set([i]) for i in range(len(names))]
+    with span('clusterNames', len(names)):
+        for i, gs in enumerate(grams):
+            ranked = sorted(gs, key=lambda g: (df[g], g))
+            candidates = set()
+            for g in ranked[:len(gs) - minOverlap(len(gs), threshold) + 1]:
+                candidates.update(postings[g])
+                postings[g].append(i)
+            # dice() inlined: this loop runs once per candidate pair.
+            size = len(gs)
+            while candidates:
+                j = candidates.pop()
+                other = grams[j]
+                if 2.0 * len(gs & other) < threshold * (size + len(other)):
+                    continue
+                a, b = clusterOf[i], clusterOf[j]
+                if len(members[a]) < len(members[b]):
+                    a, b = b, a
+                for k in members[b]:
+                    clusterOf[k] = a
+                members[a] |= members[b]
+                members[b] = None
+                candidates -= members[a]
+    return [[names[i] for i in sorted(m)] for m in members if m]
+
+
+#---------------------------------------------------------
+#  Proposals for the names identifyCPU() misses
+#---------------------------------------------------------
+
+NameInfo = collections.namedtuple('NameInfo', 'name count brand model')
+
+def isUnidentified(brand, model):
+    return brand == '???' or model.endswith('(unspecified model)')
+
+def collectNames(summariesPath='summaries.txt'):
+    # Streams summaries.txt and returns a NameInfo per cleaned CPU name,
+    # with the brand and model most of its results were identified as.
+    counts = collections.Counter()
+    with span('collectNames') as s:
+        for srec in iterCsvRecords(summariesPath, SummaryRecord):
+            counts[srec.cpu, srec.machine] += 1
+            s.add(1)
+    byName = collections.defaultdict(collections.Counter)
+    for (cpu, machine), n in counts.items():
+        byName[cleanCPUName(cpu)][identifyCPUName(cpu, machine)] += n
+    infos = []
+    for name, ids in sorted(byName.items()):
+        (brand, model), n = ids.most_common(1)[0]
+        infos.append(NameInfo(name, sum(ids.values()), brand, model))
+    return infos
+
+Proposal = collections.namedtuple('Proposal', 'names count brand model score via')
+
+def proposeIdentifications(infos, threshold=0.5, clusterThreshold=0.6):
+    # Clusters the unidentified names and proposes, for each cluster,
+    # the brand and model of the most similar identified name. Returns
+    # Proposals, most results first; brand is None when nothing is
+    # similar enough.
+    known = NgramIndex()
+    unknown = {}
+    for info in infos:
+        if isUnidentified(info.brand, info.model):
+            unknown[info.name] = info
+        else:
+            known.add(info, info.name)
+    proposals = []
+    with span('proposeIdentifications', len(unknown)):
+        for names in clusterNames(sorted(unknown), clusterThreshold):
+            names.sort(key=lambda n: (-unknown[n].count, n))
+            best = None
+            for name in names:
+                found = known.search(name, threshold, limit=1)
+                if found and (best is None or found[0][0] > best[0]):
+                    best = found[0]
+            count = sum(unknown[n].count for n in names)
+            if best:
+                score, via = best
+                proposals.append(Proposal(names, count, via.brand, via.model, score, via.name))
+            else:
+                proposals.append(Proposal(names, count, None, None, 0, None))
+    proposals.sort(key=lambda p: (-p.count, p.names[0]))
+    return proposals
+
+def writeProposals(path, proposals, infos):
+    unknown = dict((info.name, info) for info in infos)
+    with open(path, 'w') as f:
+        f.write('%d unidentified CPU names in %d clusters, %d results\n' % (
+            sum(len(p.names) for p in proposals), len(proposals), sum(p.count for p in proposals)))
+        for p in proposals:
+            f.write('\n')
+            if p.brand is None:
+                f.write('%d results, no similar identified name\n' % p.count)
+            else:
+                f.write('%d results, nearest: %s|%s (%.2f, like "%s")\n' % (p.count, p.brand, p.model, p.score, p.via))
+            for name in p.names:
+                info = unknown[name]
+                f.write('    %6d  "%s"  now %s|%s\n' % (info.count, name, info.brand, info.model))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cluster the CPU names identifyCPU() misses and propose the nearest identified brand and model.')
+    parser.add_argument('--summaries', default='summaries.txt')
+    parser.add_argument('--out', default='unidentified_cpus.txt')
+    parser.add_argument('--threshold', type=float, default=0.5, help='similarity needed for a proposal (0-1, default 0.5)')
+    parser.add_argument('--cluster-threshold', type=float, default=0.6, help='similarity needed to cluster two names (default 0.6)')
+    args = parser.parse_args(argv)
+    infos = collectNames(args.summaries)
+    proposals = proposeIdentifications(infos, args.threshold, args.cluster_threshold)
+    writeProposals(args.out, proposals, infos)
+    print('%d unidentified names in %d clusters written to %s' % (
+        sum(len(p.names) for p in proposals), len(proposals), args.out))
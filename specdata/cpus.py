@@ -0,0 +1,218 @@
+import collections
+import re
+
+from specdata.instrument import traced
+
+
+#---------------------------------------------------------
+#  Determine CPU family & speed from name
+#---------------------------------------------------------
+
+def extractMHzFromName(name):
+    m = re.search('(\\d+(?:\\.\\d+)?)a? ?([mg]hz)', name.lower())
+    value, units = m.groups()
+    value = float(value)
+    if units == 'ghz':
+        value *= 1000
+    return value
+    
+def identifyCPU(r):
+    return identifyCPUName(r.cpu, r.srec.machine)
+
+def cleanCPUName(rawName):
+    # Remove cruft
+    cpu = rawName
+    for cruft in ['(TM)', '(R)', 'processor', 'Processor', '\xae', '\x99',
+                  'supporting Hyper-Threading Technology',
+                  'with Hyper-Threading Technology',
+                  'with HT Technology',
+                  'dual-core',
+                  'Dual-Core',
+                  'Quad-Core',
+                  'Dual Core',
+                  'Single Chip',
+                  'w/ MMX technology',
+                  'with MMX technology',
+                  'with 2MB L2 Cache',
+                  '64-bit',
+                  'Model']:
+        cpu = cpu.replace(cruft, ' ')
+    cpu = re.sub('\\([^)]*\\)', ' ', cpu)
+    cpu = re.sub('/?\\d+(?:\\.\\d+)?[Aa]? ?[mMgG][hH][zZ]', ' ', cpu)
+    cpu = cpu.split(',')[0]
+    cpu = ' '.join(cpu.split())
+    return cpu
+
+def identifyCPUName(rawName, machine):
+    cpu = cleanCPUName(rawName)
+
+    # Identify brand and model
+    xeon = ' Xeon' if 'xeon' in cpu.lower() else ''
+    if 'Pentium III' in cpu or 'PentiumIII' in cpu:
+        return 'Intel Pentium', 'Pentium III' + xeon
+    if 'Pentium II' in cpu:
+        return 'Intel Pentium', 'Pentium II' + xeon
+    if xeon:
+        m = re.search('E7-[^\\s]+', cpu)
+        if m:
+            return 'Intel Xeon', 'Xeon ' + m.group()
+        m = re.search('E3-[^\\s]+', cpu)
+        if m:
+            return 'Intel Xeon', 'Xeon ' + m.group()
+        m = re.search('[A-Z]?(\\d)\\d{3}[A-Z]?', cpu)
+        if m:
+            return 'Intel Xeon', 'Xeon ' + m.group()
+        if cpu == 'Intel Xeon MP':
+            return 'Intel Xeon', 'Xeon MP'
+        if cpu in ['Intel Xeon', 'Xeon']:
+            return 'Intel Xeon', 'Xeon (unspecified model)'
+        if re.match('Intel Xeon (\\d\\.\\d|2M Cache)(Hz)?', cpu):
+            return 'Intel Xeon', 'Xeon (unspecified model)'
+        if cpu.startswith('Intel Xeon LV'):
+            return 'Intel Xeon', 'Xeon LV'
+        if cpu.startswith('Intel LV Xeon 400'):
+            return 'Intel Xeon', 'Xeon LV'
+    if cpu.startswith('Intel Core i'):
+        return 'Intel Core', cpu[6:]
+    if cpu.startswith('Intel Core 2 '):
+        return 'Intel Core', cpu[6:]
+    if cpu.startswith('Intel Core2 '):
+        return 'Intel Core', 'Core 2 ' + cpu[12:]
+    if cpu.startswith('Intel Core '):
+        return 'Intel Core', cpu[6:]
+    if cpu.startswith('Intel Pentium D'):
+        return 'Intel Pentium', cpu[6:]
+    if re.match('R1\\d000', cpu):
+        return 'MIPS', cpu
+    if re.match('MIPS R1\\d000', cpu):
+        return 'MIPS', cpu[5:11]
+    i = cpu.find('Pentium 4')
+    if i >= 0:
+        return 'Intel Pentium', cpu[i:]
+    if cpu == 'Intel P4':
+        return 'Intel Pentium', 'Pentium 4'
+    if cpu == 'Pentium':
+        return 'Intel Pentium', 'Pentium'
+    if cpu in ['Pentium Pro', 'Pentium-Pro']:
+        return 'Intel Pentium', 'Pentium Pro'
+    if cpu.startswith('Intel Pentium'):
+        m = re.match('Intel Pentium ((?:M )?[A-Z]?\\d{3,4}T?)', cpu)
+        if m:
+            return 'Intel Pentium', 'Pentium ' + m.group(1)
+        return 'Intel Pentium', cpu[6:]
+    if cpu == 'Celeron':
+        return 'Intel Celeron', 'Celeron'
+    if cpu.startswith('Intel Celeron'):
+        return 'Intel Celeron', cpu[6:]
+    m = re.search('21\\d64[A-Z]*', cpu)
+    if m:
+        return 'DEC Alpha', 'Alpha ' + m.group()    
+    if cpu.startswith('POWER'):
+        return 'IBM POWER', cpu
+    m = re.search('PowerPC.*', cpu)
+    if m:
+        return 'PowerPC', m.group()
+    if cpu in ['RS64 IV', 'RS64 II']:
+        return 'PowerPC', cpu
+    if cpu.startswith('Power'):
+        return 'IBM POWER', cpu.upper()
+    if cpu.startswith('IBM Power'):
+        return 'IBM POWER', cpu.upper()[4:]
+    if cpu.startswith('P2SC'):
+        return 'IBM POWER', 'P2SC'
+    if cpu.startswith('MIPS'):
+        return 'MIPS', cpu.split()[1]
+    if re.match('(100 )?R\\d{4}', cpu):
+        return 'MIPS', cpu
+    if cpu.startswith('SPARC64'):
+        return 'Fujitsu SPARC', cpu
+    if cpu.startswith('MicroSPARC'):
+        return 'Sun SPARC', cpu
+    if cpu.startswith('UltraSPARC'):
+        return 'Sun SPARC', cpu
+    if cpu.startswith('SuperSPARC'):
+        return 'Sun SPARC', cpu
+    if cpu == 'SPARC T3':
+        return 'Sun SPARC', cpu
+    if cpu == 'TurboSPARC':
+        return 'Fujitsu SPARC', 'TurboSPARC'
+    if cpu in ['512k HyperCACHE', 'HyperSPARC']:
+        return 'Fujitsu SPARC', 'HyperSPARC'
+    if cpu == 'ULV Intel Pentium M':
+        return 'Intel Pentium', 'Pentium M'
+    if cpu.startswith('AMD FX-'):
+        return 'AMD FX', cpu[4:]
+    if cpu.startswith('AMD A10'):
+        return 'AMD A10', cpu[4:]
+    if cpu.startswith('AMD A4'):
+        return 'AMD A4', cpu[4:]
+    if cpu.startswith('AMD A6'):
+        return 'AMD A6', cpu[4:]
+    if cpu.startswith('AMD A8'):
+        return 'AMD A8', cpu[4:]
+    if cpu.startswith('AMD'):
+        name = cpu.split()
+        return 'AMD ' + name[1], ' '.join(name[1:])
+    if cpu.startswith('Opteron'):
+        return 'AMD Opteron', cpu
+    i = cpu.find('Itanium')
+    if i >= 0:
+        name = cpu[i:]
+        name = name.replace('Itanium2', 'Itanium 2')
+        name = name.replace(' FSB', '')
+        return 'Intel Itanium', name
+    if cpu.startswith('PA-'):
+        cpu = cpu.replace('PA-RISC ', 'PA-')
+        cpu = cpu.replace('_', '')
+        return 'HP PA-RISC', cpu
+    if cpu == 'PA8600':
+        return 'HP PA-RISC', 'PA-8600'
+    if 'Xeon' in rawName:
+        return 'Intel Xeon', 'Xeon (unspecified model)'
+    if machine == 'AlphaServer 2100A 5/300':
+        return 'DEC Alpha', 'Alpha 21164'
+    return '???', cpu
+
+
+#---------------------------------------------------------
+#  Uniquely identify CPUs
+#---------------------------------------------------------
+
+CPUInfo = collections.namedtuple('CPUInfo', 'brand model mhz')
+
+def isWithinPercent(a, b, percent):
+    if a > b:
+        a, b = b, a     # Make sure a is the smaller one
+    return b < a * (1 + percent / 100.0)
+
+class CPUDatabase:
+    def __init__(self):
+        self.modelSpeeds = collections.defaultdict(list)
+
+    @traced('CPUDatabase.identify')
+    def identify(self, r, brandModel=None):
+        brand, model = brandModel or identifyCPU(r)
+        speeds = self.modelSpeeds[brand, model]
+        for other in speeds:
+            # if mhz is within 5% of an existing cpu, return that one
+            if isWithinPercent(r.mhz, other.mhz, 5):
+                return other
+        cpu = CPUInfo(brand, model, r.mhz)
+        speeds.append(cpu)
+        return cpu
+
+def identifyNames(keys):
+    return [identifyCPUName(cpu, machine) for cpu, machine in keys]
+
+def identifyAll(results, cpudb, pool=None, chunks=16):
+    # Name matching is pure and can be farmed out to a process pool;
+    # clustering by MHz depends on the order results are seen in, so it
+    # stays sequential.
+    keys = sorted(set((r.cpu, r.srec.machine) for r in results))
+    if pool is None:
+        names = identifyNames(keys)
+    else:
+        size = max(1, (len(keys) + chunks - 1) // chunks)
+        names = sum(pool.map(identifyNames, [keys[i:i + size] for i in range(0, len(keys), size)]), [])
+    byKey = dict(zip(keys, names))
+    return [cpudb.identify(r, byKey[r.cpu, r.srec.machine]) for r in results]
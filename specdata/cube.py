@@ -0,0 +1,116 @@
+import json
+import math
+import os
+
+from specdata.convert import hasScore
+from specdata.instrument import span
+
+
+#---------------------------------------------------------
+#  Aggregate cube: brand x model x month x suite
+#
+#  Each cell holds the count, sums, min and max of the results that
+#  fall into it. Cells store raw scores; a converted score is the raw
+#  score times the conversion factor of its suite, so converted
+#  aggregates are derived from the cells when they're read. That way
+#  new results only ever touch their own cell, even when they change
+#  the ratios, and the cube never has to be rebuilt.
+#---------------------------------------------------------
+
+KEY_FIELDS = ['brand', 'model', 'period', 'suite']
+CELL_FIELDS = ['count', 'sumLogScore', 'sumLogScoreMhz', 'minScore', 'maxScore',
+               'sumScore', 'sumScoreMhz', 'sumMHz']
+PERIODS = ['month', 'quarter', 'year']
+
+def periodOf(month, period):
+    # '1999-08' -> '1999-08', '1999-Q3' or '1999'
+    if period == 'month':
+        return month
+    if period == 'quarter':
+        return '%s-Q%d' % (month[:4], (int(month[5:7]) + 2) // 3)
+    if period == 'year':
+        return month[:4]
+    raise ValueError('unknown period: %r' % period)
+
+def mergeCells(a, b):
+    return [a[0] + b[0], a[1] + b[1], a[2] + b[2], min(a[3], b[3]), max(a[4], b[4]),
+            a[5] + b[5], a[6] + b[6], a[7] + b[7]]
+
+class Cube:
+    def __init__(self, mode, benchTypes, period='month'):
+        self.mode = mode
+        self.benchTypes = benchTypes
+        self.period = period
+        self.conversion = [1.0] * len(benchTypes)
+        self.freqConversion = [1.0] * len(benchTypes)
+        self.cells = {}
+
+    def setRatios(self, ratios):
+        self.conversion = list(ratios.conversion)
+        self.freqConversion = list(ratios.freqConversion)
+
+    def add(self, r, cpu):
+        # r is a Result, cpu the CPUInfo it was identified as. Results
+        # without a score are left out, as by convertResults().
+        if not hasScore(r):
+            return
+        key = (cpu.brand, cpu.model, periodOf(r.hwDate.strftime('%Y-%m'), self.period), r.benchType)
+        scoreMhz = r.score / cpu.mhz
+        cell = [1, math.log(r.score), math.log(scoreMhz), r.score, r.score, r.score, scoreMhz, cpu.mhz]
+        known = self.cells.get(key)
+        self.cells[key] = mergeCells(known, cell) if known else cell
+
+    def rollup(self, period):
+        # Returns a new cube with months merged into quarters or years.
+        if PERIODS.index(period) < PERIODS.index(self.period):
+            raise ValueError('cannot roll %s up to %s' % (self.period, period))
+        cube = Cube(self.mode, self.benchTypes, period)
+        cube.conversion = self.conversion
+        cube.freqConversion = self.freqConversion
+        for (brand, model, month, suite), cell in self.cells.items():
+            key = (brand, model, month if period == self.period else periodOf(month, period), suite)
+            known = cube.cells.get(key)
+            cube.cells[key] = mergeCells(known, cell) if known else list(cell)
+        return cube
+
+    def converted(self):
+        # Yields (key, cell) with scores converted to the newest suite,
+        # sorted by key.
+        for key in sorted(self.cells):
+            count, sumLog, sumLogMhz, lo, hi, total, totalMhz, totalMHz = self.cells[key]
+            i = self.benchTypes.index(key[3])
+            c, fc = self.conversion[i], self.freqConversion[i]
+            yield key, [count, sumLog + count * math.log(c), sumLogMhz + count * math.log(fc),
+                        lo * c, hi * c, total * c, totalMhz * fc, totalMHz]
+
+    def save(self, path):
+        with span('writeCube', len(self.cells)):
+            data = {'mode': self.mode, 'benchTypes': self.benchTypes, 'period': self.period,
+                    'conversion': self.conversion, 'freqConversion': self.freqConversion,
+                    'fields': KEY_FIELDS + CELL_FIELDS,
+                    'cells': [list(key) + cell for key, cell in sorted(self.cells.items())]}
+            tmp = path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, path)
+
+def loadCube(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data['fields'] != KEY_FIELDS + CELL_FIELDS:
+        raise ValueError('%s was written with different fields' % path)
+    cube = Cube(data['mode'], data['benchTypes'], data['period'])
+    cube.conversion = data['conversion']
+    cube.freqConversion = data['freqConversion']
+    n = len(KEY_FIELDS)
+    cube.cells = dict((tuple(row[:n]), row[n:]) for row in data['cells'])
+    return cube
+
+def buildCube(modeResults):
+    cube = Cube(modeResults.mode, modeResults.benchTypes)
+    cube.setRatios(modeResults.ratios)
+    with span('buildCube'):
+        for rib in modeResults.resultsByBrand.values():
+            for c in rib:
+                cube.add(c.result, c.cpu)
+    return cube
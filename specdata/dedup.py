@@ -0,0 +1,120 @@
+import hashlib
+import os
+
+from specdata.checkpoint import Checkpoint
+
+
+#---------------------------------------------------------
+#  Duplicate pages
+#
+#  SPEC links some results from more than one place, so the same page
+#  can turn up under several names. fetch-pages.py hashes every page as
+#  it's downloaded: a page whose content is already stored is
+#  hard-linked to the stored copy instead of being written again, and
+#  the digest of each page goes into scraped/content-index.pickle.
+#  analyze-pages.py and watch-pages.py parse only the first page with
+#  a given content, so a result is counted once. They reuse the
+#  fetch-time digest of a page that hasn't changed since, hash the
+#  others themselves and add those digests to the index, so the next
+#  run doesn't hash them again.
+#---------------------------------------------------------
+
+INDEX_PATH = os.path.join('scraped', 'content-index.pickle')
+
+# Suffix of a page still being downloaded.
+PARTIAL_SUFFIX = '.part'
+
+def contentHasher():
+    # For hashing a page as it streams in.
+    return hashlib.sha1()
+
+def contentDigest(data):
+    h = contentHasher()
+    h.update(data)
+    return h.hexdigest()
+
+def fileDigest(path):
+    with open(path, 'rb') as f:
+        return contentDigest(f.read())
+
+def fileStamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+class ContentIndex:
+    def __init__(self, path=INDEX_PATH, repair=True):
+        # Everyone but fetch-pages.py passes repair=False: fetch-pages.py
+        # may be appending to the index at the same time, so a batch cut
+        # short at the end may still be being written.
+        self.log = Checkpoint(path)
+        self.entries = self.log.load(repair=repair)    # path -> (size, mtime, digest)
+        self.stored = {}                                # digest -> first path stored with it
+        self.unsaved = []                               # (path, entry) hashed since save()
+        for path, (size, mtime, digest) in sorted(self.entries.items()):
+            self.stored.setdefault(digest, path)
+
+    def digest(self, path):
+        # The stamp is taken before hashing, so a page that changes
+        # meanwhile is hashed again next time.
+        stamp = fileStamp(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry[:2] == stamp:
+            return entry[2]
+        entry = stamp + (fileDigest(path),)
+        self.entries[path] = entry
+        self.stored.setdefault(entry[2], path)
+        self.unsaved.append((path, entry))
+        return entry[2]
+
+    def save(self):
+        # Appends the digests computed by digest() since the last save.
+        self.log.append(self.unsaved)
+        self.unsaved = []
+
+    def record(self, paths):
+        # Hashes the given pages that aren't in the index yet, e.g. ones
+        # fetched before there was an index.
+        batch = []
+        for path in paths:
+            if path not in self.entries:
+                entry = fileStamp(path) + (fileDigest(path),)
+                self.entries[path] = entry
+                self.stored.setdefault(entry[2], path)
+                batch.append((path, entry))
+        self.log.append(batch)
+        return len(batch)
+
+    def store(self, path, partPath, digest):
+        # Moves a downloaded page from partPath to path, or links path
+        # to a stored page with the same content. Returns the path of
+        # that page, or None if the content was new.
+        original = self.stored.get(digest)
+        if original is not None and os.path.exists(original):
+            try:
+                os.link(original, path)
+                os.remove(partPath)
+            except OSError:
+                # No hard links on this file system; keep the copy.
+                os.replace(partPath, path)
+        else:
+            os.replace(partPath, path)
+            self.stored[digest] = path
+            original = None
+        entry = fileStamp(path) + (digest,)
+        self.entries[path] = entry
+        self.log.append([(path, entry)])
+        return original
+
+def uniquePages(paths, index):
+    # Returns the paths to parse, which are the first of each set of
+    # pages with the same content, and (path, first path) for the rest.
+    firstOf = {}
+    unique = []
+    duplicates = []
+    for path in paths:
+        first = firstOf.setdefault(index.digest(path), path)
+        if first == path:
+            unique.append(path)
+        else:
+            duplicates.append((path, first))
+    return unique, duplicates
@@ -0,0 +1,101 @@
+import sys
+from contextlib import contextmanager
+
+from specdata.frontier import ALL, METRICS
+from specdata.instrument import span
+
+
+#---------------------------------------------------------
+#  Text & CSV outputs
+#---------------------------------------------------------
+
+@contextmanager
+def redirected_to_file(path):
+    save_stdout = sys.stdout
+    sys.stdout = open(path, 'w')
+    try:
+        yield None
+    finally:
+        sys.stdout.close()
+        sys.stdout = save_stdout
+
+def writeIdentifiedCPUs(path, results, cpudb):
+    # Dump table of identified CPU names.
+    # Good for tweaking identifyCPU.
+    with span('writeIdentifiedCPUs'), redirected_to_file(path):
+        # Number of CPUs in each brand:
+        brand = None
+        count = 0
+        for k, speeds in sorted(cpudb.modelSpeeds.items()) + [((None, ''), [])]:
+            if brand != k[0]:
+                if brand is not None:
+                    print('%s x %d' % (brand, count))
+                brand = k[0]
+                count = 0
+            count += 1
+        print()
+
+        # Individual models:
+        table = dict([(r.cpu, r) for r in results])
+        for dummy, r in sorted(table.items()):
+            cpu = cpudb.identify(r)
+            id = '%s|%s (%d Mhz)' % (cpu.brand, cpu.model, r.mhz)
+            print('%-60s "%s" %s#%s' % (id, r.cpu, r.benchType, r.srec.testID))
+            print('%-60s "%s" %s#%s' % (id, r.cpu, r.benchType, r.srec.testID))
+
+def writeData(path, resultsByBrand):
+    with span('writeData'), redirected_to_file(path):
+        print("CPU Name,Date,Score,MHz,Score/MHz,bench")
+        for brand, rib in sorted(resultsByBrand.items()):
+            for r in rib:
+                print("%s,%s,%s,%s,%s,%s" % (brand, r.hwDate, r.convertedScore, r.cpu.mhz, r.convertedScoreMhz,r.benchType))
+
+def writeDataIntervals(path, resultsByBrand, benchTypes, conversion, freqConversion):
+    # writeData() with the interval of each converted score, from the
+    # interval of its suite's conversion factor.
+    with span('writeDataIntervals'), redirected_to_file(path):
+        print("CPU Name,Date,Score,Score Low,Score High,MHz,Score/MHz,Score/MHz Low,Score/MHz High,bench")
+        for brand, rib in sorted(resultsByBrand.items()):
+            for r in rib:
+                i = benchTypes.index(r.benchType)
+                c, fc = conversion[i], freqConversion[i]
+                scoreMhz = r.result.score / r.cpu.mhz
+                print("%s,%s,%s,%s,%s,%s,%s,%s,%s,%s" % (brand, r.hwDate, r.convertedScore, r.result.score * c.low, r.result.score * c.high,
+                                                         r.cpu.mhz, r.convertedScoreMhz, scoreMhz * fc.low, scoreMhz * fc.high, r.benchType))
+
+def writeReport(path, benchTypes, ratios, resultsByBrand):
+    with span('writeReport'), redirected_to_file(path):
+        for i in range(1, len(benchTypes)):
+            print('%s = %f x %s' % (benchTypes[i], ratios.ratios[i], benchTypes[i - 1]))
+        print()
+        for brand, rib in sorted(resultsByBrand.items()):
+            print()
+            print()
+            print(brand)
+            print('=' * len(brand))
+            for r in rib:
+                print('    %s: %f by "%s" %d MHz (%s=%.1f, %s) %s' % (
+                    r.hwDate.strftime('%Y-%b'),
+                    r.convertedScore,
+                    r.cpu.model,
+                    r.cpu.mhz,
+                    r.result.benchType,
+                    r.result.score,
+                    r.result.srec.testID,
+                    ', '.join([str(brec.base) for brec in r.result.benches])))
+
+def writeFrontier(path, frontier):
+    # The periods in which the best converted score (or score per MHz)
+    # so far went up, for all brands and then each brand.
+    with span('writeFrontier'), redirected_to_file(path):
+        print("CPU Name,Metric,Period,Value,Model,MHz,TestID")
+        for brand in [ALL] + frontier.brands():
+            for metric in METRICS:
+                last = None
+                for row in frontier.rows(brand, metric):
+                    value, c = row.record
+                    if last is not None and not value > last:
+                        continue
+                    last = value
+                    print("%s,%s,%s,%s,%s,%s,%s" % ('All' if brand is ALL else brand, metric, row.period, value,
+                                                    c.cpu.model, c.cpu.mhz, c.result.srec.testID))
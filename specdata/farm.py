@@ -0,0 +1,211 @@
+import argparse
+import collections
+import datetime
+import importlib.util
+import multiprocessing
+import os
+import re
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from specdata.convert import MODE_PREFIXES, suiteNames
+from specdata.graphs import convert, identify, load
+from specdata.instrument import span, startWorker
+
+
+#---------------------------------------------------------
+#  Render farm
+#
+#  Renders a whole set of graphs for a mode: all results, and one graph
+#  per brand, per suite and per decade. The converted results are put
+#  into shared memory once, as flat arrays: month, converted score,
+#  brand code and suite code. Worker processes map those arrays when
+#  they start and pick each graph's points with vectorized masks, so
+#  the results are never pickled. A job is a small GraphSpec. Jobs
+#  don't depend on each other, so the set renders about N times as fast
+#  on N cores.
+#---------------------------------------------------------
+
+# Columns of the shared point table. month is year * 12 + month - 1.
+POINT_COLUMNS = [('month', np.int32), ('score', np.float64), ('brand', np.int16), ('suite', np.int8)]
+
+# What RenderGraph reads from a result.
+Point = collections.namedtuple('Point', 'hwDate convertedScore')
+
+# brand and suite select results (None for all); start and end are
+# years, end excluded.
+GraphSpec = collections.namedtuple('GraphSpec', 'name title brand suite start end')
+
+GROUPINGS = ['all', 'brand', 'suite', 'decade']
+
+def columnOffsets(count):
+    # Byte offset of each column, 8-byte aligned, and the total size.
+    offsets = []
+    size = 0
+    for name, dtype in POINT_COLUMNS:
+        offsets.append(size)
+        size += -(-count * np.dtype(dtype).itemsize // 8) * 8
+    return offsets, size
+
+class SharedPoints:
+    def __init__(self, shm, count, brands, suites):
+        self.shm = shm
+        self.count = count
+        self.brands = brands
+        self.suites = suites
+        offsets, size = columnOffsets(count)
+        self.columns = dict((name, np.ndarray(count, dtype, buffer=shm.buf, offset=offset))
+                            for (name, dtype), offset in zip(POINT_COLUMNS, offsets))
+
+    @classmethod
+    def create(cls, resultsByBrand, benchTypes):
+        brands = sorted(resultsByBrand)
+        count = sum(len(rib) for rib in resultsByBrand.values())
+        shm = shared_memory.SharedMemory(create=True, size=max(1, columnOffsets(count)[1]))
+        points = cls(shm, count, brands, benchTypes)
+        c = points.columns
+        i = 0
+        with span('sharePoints', count):
+            for code, brand in enumerate(brands):
+                for r in resultsByBrand[brand]:
+                    c['month'][i] = r.hwDate.year * 12 + r.hwDate.month - 1
+                    c['score'][i] = r.convertedScore
+                    c['brand'][i] = code
+                    c['suite'][i] = benchTypes.index(r.benchType)
+                    i += 1
+        return points
+
+    @classmethod
+    def attach(cls, name, count, brands, suites):
+        # Workers share the resource tracker of the process that made
+        # the block, so it is freed once, by that process.
+        return cls(shared_memory.SharedMemory(name=name), count, brands, suites)
+
+    def description(self):
+        # What a worker needs to attach.
+        return self.shm.name, self.count, self.brands, self.suites
+
+    def close(self, unlink=False):
+        self.columns = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+    def select(self, spec):
+        # Returns {brand: [Point]} for the spec, as RenderGraph takes it.
+        c = self.columns
+        mask = np.ones(self.count, dtype=bool)
+        if spec.brand is not None:
+            mask &= c['brand'] == self.brands.index(spec.brand)
+        if spec.suite is not None:
+            mask &= c['suite'] == self.suites.index(spec.suite)
+        if spec.start is not None:
+            mask &= c['month'] >= spec.start * 12
+        if spec.end is not None:
+            mask &= c['month'] < spec.end * 12
+        selected = collections.defaultdict(list)
+        for month, score, brand in zip(c['month'][mask].tolist(), c['score'][mask].tolist(), c['brand'][mask].tolist()):
+            selected[self.brands[brand]].append(Point(datetime.datetime(month // 12, month % 12 + 1, 1), score))
+        return selected
+
+def slug(text):
+    # 'Intel Xeon' -> 'intel_xeon'; '???' -> 'unknown'
+    return re.sub('[^a-z0-9]+', '_', text.lower()).strip('_') or 'unknown'
+
+def graphSpecs(mode, points, groupings):
+    specs = []
+    prefix = mode.lower()
+    if 'all' in groupings:
+        specs.append(GraphSpec('%s_graph' % prefix, None, None, None, None, None))
+    if 'brand' in groupings:
+        present = set(points.columns['brand'].tolist())
+        specs += [GraphSpec('%s_brand_%s' % (prefix, slug(brand)), brand, brand, None, None, None)
+                  for code, brand in enumerate(points.brands) if code in present]
+    if 'suite' in groupings:
+        present = set(points.columns['suite'].tolist())
+        specs += [GraphSpec('%s_suite_%s' % (prefix, slug(suite)), suite, None, suite, None, None)
+                  for code, suite in enumerate(points.suites) if code in present]
+    if 'decade' in groupings and points.count:
+        months = points.columns['month']
+        for start in range(int(months.min()) // 120 * 10, int(months.max()) // 12 + 1, 10):
+            specs.append(GraphSpec('%s_%ds' % (prefix, start), '%ds' % start, None, None, start, start + 10))
+    return specs
+
+
+#---------------------------------------------------------
+#  Workers
+#---------------------------------------------------------
+
+POINTS = None
+
+def attachWorker(description):
+    global POINTS
+    startWorker()
+    POINTS = SharedPoints.attach(*description)
+
+def renderJob(args):
+    # Returns (name, number of points).
+    from specdata.render import RenderGraph
+    mode, spec, outDir = args
+    selected = POINTS.select(spec)
+    count = sum(len(rib) for rib in selected.values())
+    if count:
+        minDate = None
+        if spec.start is not None:
+            # A decade graph starts at its first result, e.g. 1995 for
+            # the 1990s, rather than with years of empty axis.
+            first = min(p.hwDate for rib in selected.values() for p in rib)
+            minDate = datetime.datetime(max(spec.start, first.year), 1, 1)
+        RenderGraph(mode, selected, os.path.join(outDir, spec.name + '.png'), spec.title, minDate)
+    return spec.name, count
+
+def renderFarm(mode, points, specs, outDir, jobs=None):
+    # Renders the specs into outDir; returns [(name, points)].
+    global POINTS
+    os.makedirs(outDir, exist_ok=True)
+    args = [(mode, spec, outDir) for spec in specs]
+    with span('renderFarm', len(specs)):
+        if jobs == 1:
+            POINTS = points
+            return [renderJob(a) for a in args]
+        with multiprocessing.Pool(jobs, attachWorker, (points.description(),)) as pool:
+            rendered = list(pool.imap_unordered(renderJob, args))
+            # Closed and joined, not terminated, so workers write their spans.
+            pool.close()
+            pool.join()
+            return rendered
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render a graph per brand, suite and decade, in parallel, from results in shared memory.')
+    parser.add_argument('--summaries', default='summaries.txt')
+    parser.add_argument('--benchmarks', default='benchmarks.txt')
+    parser.add_argument('--modes', default='INT', help='comma-separated list of: ' + ', '.join(sorted(MODE_PREFIXES)))
+    parser.add_argument('--by', default=','.join(GROUPINGS), help='comma-separated subset of: ' + ', '.join(GROUPINGS))
+    parser.add_argument('--out', default='graphs', help='folder for the PNGs (default graphs)')
+    parser.add_argument('--jobs', type=int, help='worker processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+    modes = [m for m in args.modes.split(',') if m]
+    unknown = set(modes) - set(MODE_PREFIXES)
+    if unknown:
+        parser.error('unknown modes: %s' % ', '.join(sorted(unknown)))
+    groupings = set(g for g in args.by.split(',') if g)
+    unknown = groupings - set(GROUPINGS)
+    if unknown:
+        parser.error('unknown groupings: %s' % ', '.join(sorted(unknown)))
+    if importlib.util.find_spec('cairo') is None:
+        sys.stderr.write('Pycairo not installed; no graphs can be rendered.\n')
+        sys.exit(1)
+
+    for mode in modes:
+        benchTypes = suiteNames(mode)
+        results = load(args.summaries, args.benchmarks, benchTypes)
+        cpudb, cpus = identify(results)
+        points = SharedPoints.create(convert(results, cpus, mode).resultsByBrand, benchTypes)
+        try:
+            specs = graphSpecs(mode, points, groupings)
+            rendered = renderFarm(mode, points, specs, args.out, args.jobs)
+        finally:
+            points.close(unlink=True)
+        print('%s: %d graphs in %s' % (mode, sum(1 for name, count in rendered if count), args.out))
@@ -0,0 +1,189 @@
+import collections
+import datetime
+
+from specdata.cube import PERIODS
+from specdata.instrument import span
+
+
+#---------------------------------------------------------
+#  Performance frontier
+#
+#  The best converted score, and the best score per MHz, of each brand
+#  and of all brands together in every month, quarter or year. Each
+#  (brand, metric) has a segment tree over the periods: the leaves hold
+#  the best result of a period and every node the best of the periods
+#  below it. Adding a result updates one leaf and its ancestors, and
+#  the best result between any two dates is found from O(log n) nodes,
+#  so nothing is sorted again when results come in one by one.
+#
+#  The frontier line is the running best: the periods in which a
+#  brand's best so far went up.
+#---------------------------------------------------------
+
+METRICS = ['score', 'scoreMhz']
+
+# Frontier.best() and friends take brand=ALL for all brands together.
+ALL = None
+
+# A period with its best result, and the best result up to and
+# including that period, both as (value, result).
+FrontierRow = collections.namedtuple('FrontierRow', 'period best record')
+
+def periodIndex(d, period):
+    if period == 'month':
+        return d.year * 12 + d.month - 1
+    if period == 'quarter':
+        return d.year * 4 + (d.month - 1) // 3
+    if period == 'year':
+        return d.year
+    raise ValueError('unknown period: %r' % period)
+
+def periodName(index, period):
+    # As periodOf() in cube.py: '1999-08', '1999-Q3' or '1999'
+    if period == 'month':
+        return '%04d-%02d' % (index // 12, index % 12 + 1)
+    if period == 'quarter':
+        return '%04d-Q%d' % (index // 4, index % 4 + 1)
+    return '%04d' % index
+
+def periodStart(index, period):
+    if period == 'month':
+        return datetime.datetime(index // 12, index % 12 + 1, 1)
+    if period == 'quarter':
+        return datetime.datetime(index // 4, index % 4 * 3 + 1, 1)
+    return datetime.datetime(index, 1, 1)
+
+def better(a, b):
+    # The better of two (value, item) entries, or None; a wins a tie.
+    if a is None or (b is not None and b[0] > a[0]):
+        return b
+    return a
+
+class MaxTree:
+    # A segment tree of (value, item) over consecutive periods. It covers
+    # size periods from first and doubles when a period falls outside.
+    def __init__(self):
+        self.first = 0
+        self.size = 0
+        self.nodes = []
+
+    def leaves(self):
+        return [(self.first + i, leaf) for i, leaf in enumerate(self.nodes[self.size:]) if leaf is not None]
+
+    def grow(self, period):
+        leaves = self.leaves()
+        lo = min([period] + [p for p, leaf in leaves])
+        hi = max([period] + [p for p, leaf in leaves])
+        size = max(1, 2 * self.size)
+        while size < hi - lo + 1:
+            size *= 2
+        # Most new results are for the newest periods, so the room to
+        # spare goes on the right.
+        self.first, self.size, self.nodes = lo, size, [None] * (2 * size)
+        for p, leaf in leaves:
+            self.nodes[size + p - lo] = leaf
+        for n in range(size - 1, 0, -1):
+            self.nodes[n] = better(self.nodes[2 * n], self.nodes[2 * n + 1])
+
+    def update(self, period, value, item):
+        # Returns True if item became the best of its period.
+        if not self.first <= period < self.first + self.size:
+            self.grow(period)
+        n = self.size + period - self.first
+        leaf = self.nodes[n]
+        if leaf is not None and not value > leaf[0]:
+            return False
+        self.nodes[n] = (value, item)
+        n //= 2
+        while n:
+            self.nodes[n] = better(self.nodes[2 * n], self.nodes[2 * n + 1])
+            n //= 2
+        return True
+
+    def query(self, lo, hi):
+        # The best entry of periods lo (included) to hi (excluded).
+        lo = max(lo, self.first) - self.first + self.size
+        hi = min(hi, self.first + self.size) - self.first + self.size
+        left = right = None
+        while lo < hi:
+            if lo & 1:
+                left = better(left, self.nodes[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right = better(self.nodes[hi], right)
+            lo //= 2
+            hi //= 2
+        return better(left, right)
+
+    def periods(self, lo, hi):
+        # (period, value, item) of every period from lo to hi that has one.
+        for p in range(max(lo, self.first), min(hi, self.first + self.size)):
+            leaf = self.nodes[self.size + p - self.first]
+            if leaf is not None:
+                yield p, leaf[0], leaf[1]
+
+class Frontier:
+    def __init__(self, period='month'):
+        if period not in PERIODS:
+            raise ValueError('unknown period: %r' % period)
+        self.period = period
+        self.trees = collections.defaultdict(MaxTree)
+
+    def add(self, brand, hwDate, score, scoreMhz=None, item=None):
+        # item is what best() returns for the entry; scoreMhz may be
+        # None when it isn't known.
+        p = periodIndex(hwDate, self.period)
+        for key in [brand, ALL]:
+            self.trees[key, 'score'].update(p, score, item)
+            if scoreMhz is not None:
+                self.trees[key, 'scoreMhz'].update(p, scoreMhz, item)
+
+    def addResult(self, c):
+        # c is a ResultInBrand.
+        self.add(c.cpu.brand, c.hwDate, c.convertedScore, c.convertedScoreMhz, c)
+
+    def brands(self):
+        return sorted(set(brand for brand, metric in self.trees if brand is not ALL))
+
+    def bounds(self, start, end):
+        # Periods overlapping [start, end); either may be None.
+        lo = periodIndex(start, self.period) if start else -1 << 62
+        hi = periodIndex(end - datetime.timedelta(days=1), self.period) + 1 if end else 1 << 62
+        return lo, hi
+
+    def best(self, brand=ALL, metric='score', start=None, end=None):
+        # (value, item) of the best entry between the dates, or None.
+        tree = self.trees.get((brand, metric))
+        return tree.query(*self.bounds(start, end)) if tree else None
+
+    def rows(self, brand=ALL, metric='score', start=None, end=None):
+        # A FrontierRow for every period between the dates with an entry.
+        tree = self.trees.get((brand, metric))
+        if tree is None:
+            return []
+        rows = []
+        record = None
+        for p, value, item in tree.periods(*self.bounds(start, end)):
+            record = better(record, (value, item))
+            rows.append(FrontierRow(periodName(p, self.period), (value, item), record))
+        return rows
+
+    def line(self, brand=ALL, metric='score', start=None, end=None):
+        # [(date, value)] where the running best went up, dated at the
+        # start of the period; drawn as steps.
+        tree = self.trees.get((brand, metric))
+        points = []
+        if tree is not None:
+            for p, value, item in tree.periods(*self.bounds(start, end)):
+                if not points or value > points[-1][1]:
+                    points.append((periodStart(p, self.period), value))
+        return points
+
+def buildFrontier(resultsByBrand, period='month'):
+    frontier = Frontier(period)
+    with span('buildFrontier'):
+        for rib in resultsByBrand.values():
+            for c in rib:
+                frontier.addResult(c)
+    return frontier
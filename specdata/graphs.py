@@ -0,0 +1,210 @@
+import argparse
+import bisect
+import collections
+import sys
+
+from specdata import emit
+from specdata.convert import MODE_PREFIXES, affectsRatios, convertResult, convertResults, groupByCPU, hasScore, solveRatios, suiteNames
+from specdata.cpus import CPUDatabase, identifyAll, identifyCPUName
+from specdata.cube import Cube, buildCube
+from specdata.frontier import buildFrontier
+from specdata.instrument import span
+from specdata.results import SummaryRecord, iterCsvRecords, loadResults, makeResult
+from specdata.tiles import renderTiles
+
+
+#---------------------------------------------------------
+#  load -> identify -> convert -> emit
+#
+#  Each step is a plain function of its inputs, so it can be driven
+#  from a notebook or a worker process as well as from main(). main()
+#  handles one mode at a time and only loads that mode's results, so
+#  adding FP and rate results doesn't add to the memory INT needs.
+#---------------------------------------------------------
+
+ModeResults = collections.namedtuple('ModeResults', 'mode benchTypes ratios resultsByBrand')
+
+def load(summariesPath='summaries.txt', benchmarksPath='benchmarks.txt', benchTypes=None):
+    with span('iterResults') as s:
+        results = loadResults(summariesPath, benchmarksPath, benchTypes)
+        s.add(len(results))
+    return results
+
+def identify(results, cpudb=None, pool=None):
+    cpudb = cpudb or CPUDatabase()
+    with span('identifyAll', len(results)):
+        cpus = identifyAll(results, cpudb, pool)
+    return cpudb, cpus
+
+def identifySummaries(summariesPath='summaries.txt'):
+    # identified_cpus.txt covers every result but needs nothing from
+    # benchmarks.txt, so the summaries are streamed. Returns the
+    # database and the last result seen for each CPU name, which is
+    # what writeIdentifiedCPUs lists.
+    cpudb = CPUDatabase()
+    names = {}
+    byName = {}
+    with span('identifySummaries') as s:
+        for srec in iterCsvRecords(summariesPath, SummaryRecord):
+            r = makeResult(srec, {})
+            key = (r.cpu, srec.machine)
+            if key not in names:
+                names[key] = identifyCPUName(*key)
+            cpudb.identify(r, names[key])
+            byName[r.cpu] = r
+            s.add(1)
+    return cpudb, list(byName.values())
+
+def convert(results, cpus, mode):
+    benchTypes = suiteNames(mode)
+    resultsByCPU = groupByCPU(results, cpus, benchTypes)
+    ratios = solveRatios(resultsByCPU, benchTypes)
+    with span('convertResults'):
+        resultsByBrand = convertResults(resultsByCPU, benchTypes, ratios)
+    return ModeResults(mode, benchTypes, ratios, resultsByBrand)
+
+def render(modeResults, outPath, frontier=None):
+    # Imported here so that CSV-only runs never load pycairo. With a
+    # frontier, its line for all brands is drawn over the results.
+    try:
+        from specdata.render import RenderGraph
+    except ImportError:
+        sys.stderr.write('Pycairo not installed. Skipping %s.\n' % outPath)
+        return
+    if not any(modeResults.resultsByBrand.values()):
+        sys.stderr.write('No %s results. Skipping %s.\n' % (modeResults.mode, outPath))
+        return
+    RenderGraph(modeResults.mode, modeResults.resultsByBrand, outPath,
+                frontier=frontier.line() if frontier else None)
+
+def writeModeOutputs(modeResults, outputs, cube=None, frontier=None):
+    prefix = modeResults.mode.lower()
+    if 'frontier' in outputs:
+        frontier = frontier or buildFrontier(modeResults.resultsByBrand)
+        emit.writeFrontier('%s_frontier.csv' % prefix, frontier)
+    else:
+        frontier = None
+    if 'cube' in outputs:
+        (cube or buildCube(modeResults)).save('%s_cube.json' % prefix)
+    if 'data' in outputs:
+        emit.writeData('%s_data.csv' % prefix, modeResults.resultsByBrand)
+    if 'report' in outputs:
+        emit.writeReport('%s_report.txt' % prefix, modeResults.benchTypes,
+                         modeResults.ratios, modeResults.resultsByBrand)
+    if 'graph' in outputs:
+        render(modeResults, '%s_graph.png' % prefix, frontier)
+    if 'tiles' in outputs:
+        renderTiles(modeResults.mode, modeResults.resultsByBrand, '%s_tiles' % prefix)
+
+
+#---------------------------------------------------------
+#  Incremental updates
+#
+#  Used by watch-pages.py. New results are identified and converted on
+#  their own; the ratios, and with them every converted score, are only
+#  recomputed when a new result can change them. The outputs come out
+#  the same as running make-graphs.py on the updated files.
+#---------------------------------------------------------
+
+class LiveMode:
+    def __init__(self, mode):
+        self.mode = mode
+        self.benchTypes = suiteNames(mode)
+        self.cpudb = CPUDatabase()
+        self.resultsByCPU = collections.defaultdict(list)
+        self.ratios = None
+        self.resultsByBrand = None
+        self.cube = Cube(mode, self.benchTypes)
+        self.frontier = None
+
+    def add(self, results):
+        # Returns True if the ratios were recomputed. Each mode clusters
+        # its own results, as make-graphs.py does.
+        results = [r for r in results if r.benchType in self.benchTypes]
+        cpudb, cpus = identify(results, self.cpudb)
+        new = list(zip(results, cpus))
+        stale = self.ratios is None
+        for r, cpu in new:
+            stale = stale or affectsRatios(self.resultsByCPU.get(cpu, []), self.benchTypes, r.benchType)
+            self.resultsByCPU[cpu].append(r)
+            self.cube.add(r, cpu)
+        if stale:
+            self.ratios = solveRatios(self.resultsByCPU, self.benchTypes)
+            with span('convertResults'):
+                self.resultsByBrand = convertResults(self.resultsByCPU, self.benchTypes, self.ratios)
+            self.cube.setRatios(self.ratios)
+            self.frontier = buildFrontier(self.resultsByBrand)
+        else:
+            for r, cpu in new:
+                if not hasScore(r):
+                    continue
+                c = convertResult(r, cpu, self.benchTypes, self.ratios)
+                bisect.insort(self.resultsByBrand[cpu.brand], c)
+                self.frontier.addResult(c)
+        return stale
+
+    def modeResults(self):
+        return ModeResults(self.mode, self.benchTypes, self.ratios, self.resultsByBrand)
+
+class LiveGraphs:
+    def __init__(self, modes, outputs):
+        self.outputs = outputs
+        self.results = []
+        self.cpudb = CPUDatabase()
+        if not outputs & MODE_OUTPUTS:
+            modes = []
+        self.modes = [LiveMode(mode) for mode in modes]
+
+    def add(self, results):
+        # Returns the modes whose ratios were recomputed.
+        identify(results, self.cpudb)
+        self.results += results
+        return [m.mode for m in self.modes if m.add(results)]
+
+    def write(self):
+        if 'identified' in self.outputs:
+            emit.writeIdentifiedCPUs('identified_cpus.txt', self.results, self.cpudb)
+        for m in self.modes:
+            writeModeOutputs(m.modeResults(), self.outputs, m.cube, m.frontier)
+
+
+#---------------------------------------------------------
+#  Main
+#---------------------------------------------------------
+
+OUTPUTS = ['identified', 'data', 'report', 'graph', 'cube', 'tiles', 'frontier']
+MODE_OUTPUTS = set(['data', 'report', 'graph', 'cube', 'tiles', 'frontier'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Identify CPUs, normalize scores across SPEC suites and write reports.')
+    parser.add_argument('--summaries', default='summaries.txt')
+    parser.add_argument('--benchmarks', default='benchmarks.txt')
+    parser.add_argument('--modes', default='INT', help='comma-separated list of: ' + ', '.join(sorted(MODE_PREFIXES)))
+    parser.add_argument('--outputs', default='identified,data,cube',
+                        help='comma-separated subset of: ' + ', '.join(OUTPUTS))
+    parser.add_argument('--report', action='store_true', help='also write <mode>_report.txt')
+    parser.add_argument('--graph', action='store_true', help='also render <mode>_graph.png (needs pycairo)')
+    args = parser.parse_args(argv)
+    outputs = set(o for o in args.outputs.split(',') if o)
+    if args.report:
+        outputs.add('report')
+    if args.graph:
+        outputs.add('graph')
+    unknown = outputs - set(OUTPUTS)
+    if unknown:
+        parser.error('unknown outputs: %s' % ', '.join(sorted(unknown)))
+    modes = [m for m in args.modes.split(',') if m]
+    unknown = set(modes) - set(MODE_PREFIXES)
+    if unknown:
+        parser.error('unknown modes: %s' % ', '.join(sorted(unknown)))
+
+    if 'identified' in outputs:
+        cpudb, results = identifySummaries(args.summaries)
+        emit.writeIdentifiedCPUs('identified_cpus.txt', results, cpudb)
+
+    for mode in modes:
+        if not outputs & MODE_OUTPUTS:
+            break
+        results = load(args.summaries, args.benchmarks, suiteNames(mode))
+        cpudb, cpus = identify(results)
+        writeModeOutputs(convert(results, cpus, mode), outputs)
@@ -0,0 +1,179 @@
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+
+from specdata.cpus import CPUDatabase, identifyNames
+from specdata.instrument import span
+from specdata.results import SummaryRecord, iterCsvRecords
+
+
+#---------------------------------------------------------
+#  Identification snapshots
+#
+#  A structured alternative to diffing identified_cpus.txt by eye. A
+#  snapshot maps every raw CPU string to the brand, model and clustered
+#  MHz it was identified as, and the number of results using it. It
+#  also keeps the distinct (cpu, machine) pairs and the MHz of each
+#  result, so it can be identified again under changed identifyCPU()
+#  rules without reading summaries.txt. Only the strings whose brand or
+#  model changed, and the strings sharing a brand and model with them,
+#  are clustered again.
+#---------------------------------------------------------
+
+Entry = collections.namedtuple('Entry', 'brand model mhz count')
+MHzOnly = collections.namedtuple('MHzOnly', 'mhz')
+
+class Snapshot:
+    def __init__(self, keys, names, results, entries=None):
+        self.keys = keys          # distinct (cpu, machine) pairs
+        self.names = names        # (brand, model) of each key
+        self.results = results    # (key index, MHz) of each result, in file order
+        self.entries = entries if entries is not None else self.summarize(range(len(results)))
+
+    def summarize(self, resultIndexes):
+        # Clusters the given results by MHz within their brand and model
+        # as CPUDatabase does, and returns an Entry per raw CPU string.
+        # Results must cover whole brand/model groups.
+        cpudb = CPUDatabase()
+        seen = collections.defaultdict(lambda: [collections.Counter(), set(), 0])
+        for i in resultIndexes:
+            k, mhz = self.results[i]
+            brand, model = self.names[k]
+            cpu = cpudb.identify(MHzOnly(mhz), (brand, model))
+            s = seen[self.keys[k][0]]
+            s[0][brand, model] += 1
+            s[1].add(cpu.mhz)
+            s[2] += 1
+        entries = {}
+        for raw, (ids, speeds, count) in seen.items():
+            (brand, model), n = ids.most_common(1)[0]
+            entries[raw] = Entry(brand, model, sorted(speeds), count)
+        return entries
+
+    def reidentify(self):
+        # Returns the snapshot as the current identifyCPU() rules see it.
+        with span('reidentify', len(self.keys)):
+            names = identifyNames(self.keys)
+            touched = set()
+            for old, new in zip(self.names, names):
+                if old != new:
+                    touched.add(old)
+                    touched.add(new)
+            snapshot = Snapshot(self.keys, names, self.results, dict(self.entries))
+            if not touched:
+                return snapshot
+            # A string seen with several machines can fall into several
+            # groups; its entry needs all of them, clustered whole.
+            groupsOfRaw = collections.defaultdict(set)
+            for (raw, machine), name in zip(self.keys, names):
+                groupsOfRaw[raw].add(name)
+            affected = set()
+            while True:
+                more = set(raw for raw, groups in groupsOfRaw.items() if raw not in affected and groups & touched)
+                if not more:
+                    break
+                affected |= more
+                for raw in more:
+                    touched |= groupsOfRaw[raw]
+            indexes = [i for i, (k, mhz) in enumerate(self.results) if names[k] in touched]
+            for raw in affected:
+                del snapshot.entries[raw]
+            snapshot.entries.update(snapshot.summarize(indexes))
+            return snapshot
+
+    def save(self, path):
+        data = {'keys': [list(k) + list(n) for k, n in zip(self.keys, self.names)],
+                'results': self.results,
+                'entries': dict((raw, list(e)) for raw, e in self.entries.items())}
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp, path)
+
+def loadSnapshot(path):
+    with open(path) as f:
+        data = json.load(f)
+    keys = [(cpu, machine) for cpu, machine, brand, model in data['keys']]
+    names = [(brand, model) for cpu, machine, brand, model in data['keys']]
+    results = [tuple(r) for r in data['results']]
+    entries = dict((raw, Entry(*e)) for raw, e in data['entries'].items())
+    return Snapshot(keys, names, results, entries)
+
+def buildSnapshot(summariesPath='summaries.txt'):
+    keyIndex = {}
+    results = []
+    with span('buildSnapshot') as s:
+        for srec in iterCsvRecords(summariesPath, SummaryRecord):
+            key = (srec.cpu, srec.machine)
+            if key not in keyIndex:
+                keyIndex[key] = len(keyIndex)
+            results.append((keyIndex[key], srec.mhz))
+            s.add(1)
+    keys = sorted(keyIndex, key=keyIndex.get)
+    return Snapshot(keys, identifyNames(keys), results)
+
+
+#---------------------------------------------------------
+#  Diffing
+#---------------------------------------------------------
+
+Change = collections.namedtuple('Change', 'kind raw old new')
+
+def diffSnapshots(old, new):
+    # Returns the added, removed and reclassified CPU strings. A string
+    # whose result count changed but which is identified the same way
+    # isn't reported.
+    changes = []
+    for raw in sorted(set(old.entries) | set(new.entries)):
+        a, b = old.entries.get(raw), new.entries.get(raw)
+        if a is None:
+            changes.append(Change('+', raw, None, b))
+        elif b is None:
+            changes.append(Change('-', raw, a, None))
+        elif a[:3] != b[:3]:
+            changes.append(Change('~', raw, a, b))
+    return changes
+
+def describe(e):
+    return '%s|%s (%s Mhz) x%d' % (e.brand, e.model, ', '.join('%d' % m for m in e.mhz), e.count)
+
+def printChanges(changes, out=sys.stdout):
+    for c in changes:
+        if c.kind == '~':
+            out.write('~ "%s"\n      %s\n   -> %s\n' % (c.raw, describe(c.old), describe(c.new)))
+        else:
+            out.write('%s "%s"  %s\n' % (c.kind, c.raw, describe(c.new or c.old)))
+    counts = collections.Counter(c.kind for c in changes)
+    out.write('%d added, %d removed, %d reclassified\n' % (counts['+'], counts['-'], counts['~']))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare how CPU strings are identified between two data snapshots or two versions of the identifyCPU() rules.')
+    parser.add_argument('old', nargs='?', help='snapshot to compare against')
+    parser.add_argument('new', nargs='?', help='second snapshot; if left out, OLD is identified again with the current rules, or compared with --summaries')
+    parser.add_argument('--summaries', help='build the new snapshot from this summaries.txt')
+    parser.add_argument('--save', metavar='PATH', help='write the new snapshot to PATH')
+    args = parser.parse_args(argv)
+    if args.new and args.summaries:
+        parser.error('give either NEW or --summaries, not both')
+    if not args.old and not args.summaries:
+        args.summaries = 'summaries.txt'
+
+    start = time.time()
+    old = loadSnapshot(args.old) if args.old else None
+    if args.new:
+        new = loadSnapshot(args.new)
+    elif args.summaries:
+        new = buildSnapshot(args.summaries)
+    else:
+        new = old.reidentify()
+    if args.save:
+        new.save(args.save)
+    if old is not None:
+        changes = diffSnapshots(old, new)
+        printChanges(changes)
+    sys.stderr.write('%d CPU strings, %.2f s\n' % (len(new.entries), time.time() - start))
+    if old is not None and changes:
+        sys.exit(1)
@@ -0,0 +1,235 @@
+import atexit
+import functools
+import json
+import multiprocessing.util
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+
+#---------------------------------------------------------
+#  Lightweight spans
+#
+#  with span('ratios') as s:
+#      ...
+#      s.add(len(results))
+#
+#  @traced('parse2006')
+#  def parse2006(path): ...
+#
+#  Spans are free when tracing is off: span() hands back a shared
+#  do-nothing object and @traced costs one flag check per call.
+#  Set SPEC_TRACE=trace.json to turn tracing on for a whole run; the
+#  Chrome trace (chrome://tracing, Perfetto) is written at exit along
+#  with a summary table on stderr. SPEC_TRACE_MEMORY=1 additionally
+#  records tracemalloc peaks, which slows Python down noticeably.
+#---------------------------------------------------------
+
+MAX_EVENTS = 1000000
+
+class Stats:
+    __slots__ = ('calls', 'wall', 'cpu', 'items', 'peak')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.items = 0
+        self.peak = 0
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.path = None
+        self.pid = os.getpid()
+        self.worker = False
+        self.origin = time.perf_counter()
+        self.stats = {}
+        self.events = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def memoryStack(self):
+        stack = getattr(self.local, 'memoryStack', None)
+        if stack is None:
+            stack = self.local.memoryStack = []
+        return stack
+
+    def record(self, name, start, wall, cpu, items, peak):
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = Stats()
+            stats.calls += 1
+            stats.wall += wall
+            stats.cpu += cpu
+            stats.items += items
+            stats.peak = max(stats.peak, peak)
+            if len(self.events) < MAX_EVENTS:
+                self.events.append((name, start, wall, threading.get_ident(), items, cpu, peak))
+            else:
+                self.dropped += 1
+
+TRACER = Tracer()
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, n=1):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    __slots__ = ('name', 'items', 'start', 'cpuStart', 'memStart')
+
+    def __init__(self, name, items):
+        self.name = name
+        self.items = items
+
+    def add(self, n=1):
+        self.items += n
+
+    def __enter__(self):
+        if TRACER.memory:
+            # Peaks nest: remember what the enclosing span has seen so
+            # far, then measure this one from a fresh peak.
+            current, peak = tracemalloc.get_traced_memory()
+            stack = TRACER.memoryStack()
+            if stack:
+                stack[-1] = max(stack[-1], peak)
+            stack.append(0)
+            tracemalloc.reset_peak()
+            self.memStart = current
+        self.cpuStart = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        cpu = time.process_time() - self.cpuStart
+        peak = 0
+        if TRACER.memory:
+            stack = TRACER.memoryStack()
+            peak = max(stack.pop(), tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1] = max(stack[-1], peak)
+            peak -= self.memStart
+        TRACER.record(self.name, self.start, end - self.start, cpu, self.items, peak)
+        return False
+
+def span(name, items=0):
+    if not TRACER.enabled:
+        return NULL_SPAN
+    return Span(name, items)
+
+def traced(name=None, items=None):
+    # Decorator form of span(). items, if given, is called with the
+    # function's return value to count what it produced.
+    def decorate(func):
+        spanName = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            with Span(spanName, 0) as s:
+                value = func(*args, **kwargs)
+                if items is not None:
+                    s.add(items(value))
+                return value
+        return wrapper
+    return decorate
+
+
+#---------------------------------------------------------
+#  Enabling & export
+#---------------------------------------------------------
+
+def enable(path=None, memory=False):
+    TRACER.enabled = True
+    TRACER.path = path
+    TRACER.pid = os.getpid()
+    if memory and not TRACER.memory:
+        TRACER.memory = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+def disable():
+    TRACER.enabled = False
+
+def summaryRows():
+    with TRACER.lock:
+        rows = [(name, s.calls, s.wall, s.cpu, s.items, s.peak) for name, s in TRACER.stats.items()]
+    return sorted(rows, key=lambda r: -r[2])
+
+def formatSummary():
+    lines = ['%-28s %9s %10s %10s %10s %12s %10s' % (
+        'span', 'calls', 'wall s', 'cpu s', 'items', 'items/s', 'peak MB')]
+    for name, calls, wall, cpu, items, peak in summaryRows():
+        rate = items / wall if wall > 0 and items else 0
+        lines.append('%-28s %9d %10.3f %10.3f %10d %12.1f %10.1f' % (
+            name, calls, wall, cpu, items, rate, peak / 2.0**20))
+    return '\n'.join(lines)
+
+def writeTrace(path):
+    pid = os.getpid()
+    with TRACER.lock:
+        events = list(TRACER.events)
+        dropped = TRACER.dropped
+    traceEvents = []
+    for name, start, wall, tid, items, cpu, peak in events:
+        traceEvents.append({
+            'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+            'ts': round((start - TRACER.origin) * 1e6, 3),
+            'dur': round(wall * 1e6, 3),
+            'args': {'items': items, 'cpu_s': cpu, 'peak_bytes': peak},
+        })
+    summary = [dict(zip(['name', 'calls', 'wall', 'cpu', 'items', 'peak'], row)) for row in summaryRows()]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': traceEvents, 'displayTimeUnit': 'ms',
+                   'spanSummary': summary, 'droppedEvents': dropped}, f)
+
+def flush():
+    if not TRACER.stats:
+        return
+    if TRACER.worker or os.getpid() != TRACER.pid:
+        # A worker process; don't clobber the parent's trace, and leave
+        # the summary table to the parent.
+        if TRACER.path:
+            writeTrace('%s.%d' % (TRACER.path, os.getpid()))
+        return
+    if TRACER.path:
+        writeTrace(TRACER.path)
+    sys.stderr.write(formatSummary() + '\n')
+
+def startWorker():
+    # Pool initializer. Workers leave through os._exit, which skips
+    # atexit, so a worker's spans are written to <trace>.<pid> by a
+    # multiprocessing finalizer instead. That only runs when the pool is
+    # closed and joined; terminated workers lose their spans.
+    if not TRACER.enabled:
+        return
+    with TRACER.lock:
+        TRACER.worker = True
+        TRACER.stats = {}
+        TRACER.events = []
+        TRACER.dropped = 0
+    multiprocessing.util.Finalize(None, flush, exitpriority=10)
+
+def enableFromEnvironment():
+    path = os.environ.get('SPEC_TRACE')
+    if path:
+        enable(path, memory=os.environ.get('SPEC_TRACE_MEMORY', '') not in ['', '0'])
+        atexit.register(flush)
+
+enableFromEnvironment()
@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+
+
+#---------------------------------------------------------
+#  Level of detail for scatter plots
+#
+#  A scatter plot can't show more points than it has room for: once
+#  several markers fall on the same few pixels, only the one drawn last
+#  is visible. So before anything is drawn, the points are binned into
+#  square cells of a few pixels of the final image, and each cell keeps
+#  one point (or two, for KEEP 'extremes'). Points are only ever
+#  dropped, never moved, and the number drawn is bounded by the size of
+#  the image instead of the size of the data.
+#
+#    top        the point that would be on top: the one drawn last
+#    max        the highest point, so the upper frontier stays exact
+#    extremes   the highest and the lowest point, so the spread does
+#
+#  Each kept point comes with the number of points in its cell; the
+#  caller's own counts (for legend labels) are not affected.
+#---------------------------------------------------------
+
+KEEP = ['top', 'max', 'extremes']
+
+# Side of a cell in pixels. Markers are about 8 pixels wide at the
+# default size and resolution, so points in the same cell overlap
+# almost completely.
+CELL_PIXELS = 3
+
+def extent(values):
+    # (low, high) over arrays of values; NaNs are ignored.
+    finite = [v[np.isfinite(v)] for v in values]
+    finite = [v for v in finite if len(v)]
+    if not finite:
+        return 0.0, 1.0
+    return min(float(v.min()) for v in finite), max(float(v.max()) for v in finite)
+
+def cellIndex(x, y, xRange, yRange, pixels, cell=CELL_PIXELS):
+    # The cell of each point. x and y must be linear in screen space
+    # (take the log first for a log axis); the ranges are the data
+    # limits of the axes and pixels the (width, height) of the plot.
+    if cell < 1:
+        raise ValueError('cell must be at least 1 pixel, not %r' % cell)
+    cols = max(1, int(math.ceil(pixels[0] / cell)))
+    rows = max(1, int(math.ceil(pixels[1] / cell)))
+    cx = np.floor((x - xRange[0]) / ((xRange[1] - xRange[0]) or 1) * cols)
+    cy = np.floor((y - yRange[0]) / ((yRange[1] - yRange[0]) or 1) * rows)
+    return np.clip(cx, 0, cols - 1).astype(np.int64) * rows + np.clip(cy, 0, rows - 1).astype(np.int64)
+
+def decimate(x, y, xRange, yRange, pixels, cell=CELL_PIXELS, keep='top'):
+    # Returns (kept, counts): the indices of the points to draw, in
+    # their original order, and how many points fell into the cell of
+    # each. Points with a NaN coordinate are dropped.
+    if keep not in KEEP:
+        raise ValueError('unknown level of detail: %r' % keep)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    if not len(valid):
+        return valid, np.zeros(0, dtype=np.int64)
+    cells = cellIndex(x[valid], y[valid], xRange, yRange, pixels, cell)
+    # Sorted by cell, and within a cell so that the point to keep is
+    # last ('top' and 'max') or first and last ('extremes').
+    order = np.lexsort((np.arange(len(valid)), cells) if keep == 'top' else (y[valid], cells))
+    sortedCells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sortedCells[1:] != sortedCells[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    sizes = ends - starts + 1
+    if keep == 'extremes':
+        picks = np.unique(np.concatenate([order[starts], order[ends]]))
+        cellSize = dict(zip(sortedCells[starts].tolist(), sizes.tolist()))
+        counts = np.array([cellSize[c] for c in cells[picks].tolist()], dtype=np.int64)
+    else:
+        picks = order[ends]
+        byIndex = np.argsort(picks)
+        picks, counts = picks[byIndex], sizes[byIndex]
+    return valid[picks], counts
+
+def decimateSeries(series, xRange, yRange, pixels, cell=CELL_PIXELS, keep='top'):
+    # series is a list of (x, y) arrays, drawn in that order; returns
+    # [(kept, counts)] for each. Cells are shared by all series, so
+    # with 'top' a point hidden under a later series is dropped.
+    x = np.concatenate([np.asarray(sx, dtype=float) for sx, sy in series] or [np.zeros(0)])
+    y = np.concatenate([np.asarray(sy, dtype=float) for sx, sy in series] or [np.zeros(0)])
+    offsets = np.cumsum([0] + [len(sx) for sx, sy in series])
+    kept, counts = decimate(x, y, xRange, yRange, pixels, cell, keep)
+    which = np.searchsorted(offsets, kept, side='right') - 1
+    return [(kept[which == i] - offsets[i], counts[which == i]) for i in range(len(series))]
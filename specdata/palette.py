@@ -0,0 +1,33 @@
+#---------------------------------------------------------
+#  Brand colors, shared by the graph and the tile pyramid
+#---------------------------------------------------------
+
+# (color, brand, marker, position in the legend). Brands are drawn in
+# this order, as separate layers. That way, we can hide the busiest
+# brands (like Xeon) at the bottom.
+BRAND_STYLES = [
+    ('003471', 'Intel Xeon', 'square', 0),
+    ('0072bc', 'Intel Core', 'circle', 1),
+    ('ffa080', 'DEC Alpha', 'circle', 13),
+    ('007236', 'AMD Opteron', 'square', 6),
+    ('86dce3', 'Intel Pentium', 'circle', 2),
+    ('a0d49b', 'AMD Phenom', 'triangle', 7),
+    ('31d100', 'AMD Athlon', 'circle', 8),
+    ('377dfc', 'Intel Itanium', 'triangle', 3),
+    ('fdad4f', 'Fujitsu SPARC', 'triangle', 11),
+    ('f8e400', 'Sun SPARC', 'circle', 12),
+    ('c1d72f', 'AMD FX', 'square', 5),
+    ('d59d55', 'MIPS', 'square', 14),
+    ('03d3ff', 'Intel Celeron', 'square', 4),
+    ('f198dd', 'IBM POWER', 'triangle', 9),
+    ('e040de', 'PowerPC', 'circle', 10),
+    ('947b30', 'HP PA-RISC', 'circle', 15),
+    ('d56d55', 'AMD EPYC', 'circle', 16),
+]
+
+# Brands not listed above.
+OTHER_COLOR = '808080'
+
+def rgb(color):
+    # '0072bc' -> (0, 114, 188)
+    return tuple(int(color[i:i+2], 16) for i in range(0, 6, 2))
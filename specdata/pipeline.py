@@ -0,0 +1,281 @@
+import collections
+import concurrent.futures
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+
+#---------------------------------------------------------
+#  Make-style runner for the README workflow
+#
+#  Every stage declares the files it reads and writes. A stage is
+#  fingerprinted by hashing its command, its code and the content of
+#  its inputs; if the fingerprint matches the last successful run and
+#  the outputs are untouched, the stage is skipped. Outputs are also
+#  kept in a content-addressed cache, so going back to an earlier
+#  input restores the earlier outputs without rerunning anything.
+#  Since inputs are compared by content, a stage that reruns but
+#  produces identical outputs doesn't invalidate the stages after it.
+#---------------------------------------------------------
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_FILE = '.pipeline-state.json'
+CACHE_DIR = '.pipeline-cache'
+
+Stage = collections.namedtuple('Stage', 'name command inputs outputs code')
+
+GRAPHS_CODE = ['make-graphs.py', 'specdata']
+PLOT_CODE = ['plot.py', 'specdata']
+SCRAPED = ['scraped/%s%s' % (c, g) for c in ['cint', 'cfp', 'rint', 'rfp'] for g in ['95', '2000', '2006', '2017']]
+SUMMARIES = ['summaries.txt', 'benchmarks.txt']
+
+STAGES = [
+    # fetch-pages.py depends on the live website, so it only runs when
+    # asked for explicitly; it has its own page cache.
+    Stage('fetch', ['fetch-pages.py'], [], ['scraped'], ['fetch-pages.py']),
+    Stage('analyze', ['analyze-pages.py'], SCRAPED, SUMMARIES + ['quarantine.txt'], ['analyze-pages.py', 'specdata']),
+    Stage('validate', ['validate-results.py'], SUMMARIES, ['anomalies.txt'], ['validate-results.py', 'specdata']),
+    Stage('identify', ['make-graphs.py', '--modes=', '--outputs=identified'], SUMMARIES, ['identified_cpus.txt'], GRAPHS_CODE),
+    Stage('int-data', ['make-graphs.py', '--modes=INT', '--outputs=data'], SUMMARIES, ['int_data.csv'], GRAPHS_CODE),
+    Stage('fp-data', ['make-graphs.py', '--modes=FP', '--outputs=data'], SUMMARIES, ['fp_data.csv'], GRAPHS_CODE),
+    Stage('rint-data', ['make-graphs.py', '--modes=RINT', '--outputs=data'], SUMMARIES, ['rint_data.csv'], GRAPHS_CODE),
+    Stage('rfp-data', ['make-graphs.py', '--modes=RFP', '--outputs=data'], SUMMARIES, ['rfp_data.csv'], GRAPHS_CODE),
+    Stage('int-cube', ['make-graphs.py', '--modes=INT', '--outputs=cube'], SUMMARIES, ['int_cube.json'], GRAPHS_CODE),
+    Stage('int-frontier', ['make-graphs.py', '--modes=INT', '--outputs=frontier'], SUMMARIES, ['int_frontier.csv'], GRAPHS_CODE),
+    Stage('int-report', ['make-graphs.py', '--modes=INT', '--outputs=report'], SUMMARIES, ['int_report.txt'], GRAPHS_CODE),
+    Stage('int-graph', ['make-graphs.py', '--modes=INT', '--outputs=graph'], SUMMARIES, ['int_graph.png'], GRAPHS_CODE),
+    Stage('plot1', ['plot.py', '1'], ['int_cube.json'], ['plot1_score_over_time.png'], PLOT_CODE),
+    Stage('plot2', ['plot.py', '2'], ['int_cube.json'], ['plot2_score_per_mhz_cpu.png'], PLOT_CODE),
+    Stage('plot3', ['plot.py', '3'], ['int_cube.json'], ['plot3_score_per_mhz_bench.png'], PLOT_CODE),
+    Stage('plot4', ['plot.py', '4'], ['int_cube.json'], ['plot4_mhz_over_time.png'], PLOT_CODE),
+    Stage('plot5', ['plot.py', '5'], ['int_cube.json'], ['plot5_log10_mhz_over_time.png'], PLOT_CODE),
+]
+
+MANUAL_STAGES = ['fetch']
+
+# Pycairo is optional. Without it make-graphs.py skips the PNG and
+# exits cleanly, so these stages would fail for a missing output; they
+# are only run by default when it is installed.
+CAIRO_STAGES = ['int-graph']
+HAVE_CAIRO = importlib.util.find_spec('cairo') is not None
+
+DEFAULT_STAGES = [s.name for s in STAGES
+                  if s.name not in MANUAL_STAGES and (HAVE_CAIRO or s.name not in CAIRO_STAGES)]
+
+
+#---------------------------------------------------------
+#  Content hashing
+#---------------------------------------------------------
+
+class Hasher:
+    # Hashes files by content, remembering (size, mtime) so that an
+    # unchanged file is only read once across runs.
+    def __init__(self, memo):
+        self.memo = memo
+
+    def file(self, path):
+        st = os.stat(path)
+        key = [st.st_size, st.st_mtime_ns]
+        known = self.memo.get(path)
+        if known and known[:2] == key:
+            return known[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.memo[path] = key + [digest]
+        return digest
+
+    def path(self, path):
+        # Files hash by content; folders by the names and content of
+        # everything below them; missing paths hash to a marker.
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return 'missing'
+        h = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            for fn in sorted(files):
+                full = os.path.join(root, fn)
+                h.update(('%s\0%s\n' % (os.path.relpath(full, path), self.file(full))).encode())
+        return h.hexdigest()
+
+def fingerprint(stage, hasher, dataDir):
+    h = hashlib.sha256()
+    h.update(json.dumps(stage.command).encode())
+    for code in stage.code:
+        h.update(('code %s %s\n' % (code, hasher.path(os.path.join(REPO_DIR, code)))).encode())
+    for path in stage.inputs:
+        h.update(('input %s %s\n' % (path, hasher.path(os.path.join(dataDir, path)))).encode())
+    return h.hexdigest()
+
+
+#---------------------------------------------------------
+#  Scheduling
+#---------------------------------------------------------
+
+StageOutcome = collections.namedtuple('StageOutcome', 'name status seconds detail')
+
+def produces(output, path):
+    return path == output or path.startswith(output + '/')
+
+def dependencies(stages):
+    return dict((s.name, set(p.name for p in stages for o in p.outputs for i in s.inputs if produces(o, i)))
+                for s in stages)
+
+def selectStages(names):
+    # The requested stages plus everything they depend on, except for
+    # manual stages that weren't asked for.
+    byName = dict((s.name, s) for s in STAGES)
+    unknown = [n for n in names if n not in byName]
+    if unknown:
+        raise ValueError('unknown stages: %s' % ', '.join(unknown))
+    deps = dependencies(STAGES)
+    wanted = set()
+    pending = list(names)
+    while pending:
+        n = pending.pop()
+        if n not in wanted and (n in names or n not in MANUAL_STAGES):
+            wanted.add(n)
+            pending += deps[n]
+    return [s for s in STAGES if s.name in wanted]
+
+class Pipeline:
+    def __init__(self, dataDir='.', jobs=None, useCache=True, verbose=True):
+        self.dataDir = dataDir
+        self.jobs = jobs or os.cpu_count() or 1
+        self.useCache = useCache
+        self.verbose = verbose
+        self.statePath = os.path.join(dataDir, STATE_FILE)
+        self.state = {'files': {}, 'stages': {}}
+        if os.path.exists(self.statePath):
+            with open(self.statePath) as f:
+                self.state = json.load(f)
+        self.hasher = Hasher(self.state['files'])
+
+    def log(self, msg):
+        if self.verbose:
+            print(msg)
+            sys.stdout.flush()
+
+    def saveState(self):
+        tmp = self.statePath + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.statePath)
+
+    def outputHashes(self, stage):
+        return dict((o, self.hasher.path(os.path.join(self.dataDir, o))) for o in stage.outputs)
+
+    def isCurrent(self, stage, fp):
+        previous = self.state['stages'].get(stage.name)
+        return (previous is not None and previous['fingerprint'] == fp
+                and previous['outputs'] == self.outputHashes(stage))
+
+    def cachePath(self, fp, output):
+        return os.path.join(self.dataDir, CACHE_DIR, fp, output)
+
+    def restore(self, stage, fp):
+        if not self.useCache or not stage.outputs:
+            return False
+        if not all(os.path.isfile(self.cachePath(fp, o)) for o in stage.outputs):
+            return False
+        for o in stage.outputs:
+            shutil.copyfile(self.cachePath(fp, o), os.path.join(self.dataDir, o))
+        return True
+
+    def store(self, stage, fp):
+        if not self.useCache:
+            return
+        for o in stage.outputs:
+            src = os.path.join(self.dataDir, o)
+            if os.path.isfile(src):
+                dst = self.cachePath(fp, o)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copyfile(src, dst)
+
+    def execute(self, stage):
+        logPath = os.path.join(self.dataDir, CACHE_DIR, 'logs', stage.name + '.log')
+        os.makedirs(os.path.dirname(logPath), exist_ok=True)
+        script, args = stage.command[0], stage.command[1:]
+        with open(logPath, 'w') as log:
+            code = subprocess.call([sys.executable, os.path.join(REPO_DIR, script)] + args,
+                                   cwd=self.dataDir, stdout=log, stderr=subprocess.STDOUT)
+        missing = [o for o in stage.outputs if not os.path.exists(os.path.join(self.dataDir, o))]
+        if code != 0:
+            return 'exit code %d, see %s' % (code, logPath)
+        if missing:
+            return 'did not write %s, see %s' % (', '.join(missing), logPath)
+        return None
+
+    def check(self, stage, force=False):
+        # Returns (outcome, fingerprint), where outcome is None if the
+        # stage has to run. Hashing happens on the scheduling thread
+        # only, so the memo is never shared between threads.
+        fp = fingerprint(stage, self.hasher, self.dataDir)
+        if force or stage.name in MANUAL_STAGES:
+            return None, fp
+        if self.isCurrent(stage, fp):
+            return StageOutcome(stage.name, 'up to date', 0, ''), fp
+        if self.restore(stage, fp):
+            self.record(stage, fp)
+            return StageOutcome(stage.name, 'restored', 0, ''), fp
+        return None, fp
+
+    def record(self, stage, fp):
+        self.state['stages'][stage.name] = {'fingerprint': fp, 'outputs': self.outputHashes(stage)}
+        self.saveState()
+
+    def run(self, names=None, force=()):
+        stages = selectStages(names or DEFAULT_STAGES)
+        deps = dependencies(stages)
+        outcomes = {}
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(self.jobs) as pool:
+            while len(outcomes) < len(stages):
+                for stage in stages:
+                    if stage.name in outcomes or stage.name in running:
+                        continue
+                    if not deps[stage.name] <= set(outcomes):
+                        continue
+                    failed = [d for d in deps[stage.name] if outcomes[d].status in ['failed', 'skipped']]
+                    if failed:
+                        outcomes[stage.name] = StageOutcome(stage.name, 'skipped', 0, 'needs ' + ', '.join(failed))
+                        self.log('%-12s skipped (needs %s)' % (stage.name, ', '.join(failed)))
+                        continue
+                    outcome, fp = self.check(stage, stage.name in force)
+                    if outcome:
+                        outcomes[stage.name] = outcome
+                        self.log('%-12s %s' % (stage.name, outcome.status))
+                        continue
+                    self.log('%-12s running ...' % stage.name)
+                    running[stage.name] = (pool.submit(self.execute, stage), fp, time.time())
+                if not running:
+                    continue
+                done, notDone = concurrent.futures.wait([f for f, fp, t in running.values()],
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+                for name, (future, fp, started) in list(running.items()):
+                    if future not in done:
+                        continue
+                    del running[name]
+                    stage = [s for s in stages if s.name == name][0]
+                    error = future.result()
+                    seconds = time.time() - started
+                    if error:
+                        outcomes[name] = StageOutcome(name, 'failed', seconds, error)
+                        self.state['stages'].pop(name, None)
+                        self.saveState()
+                        self.log('%-12s failed: %s' % (name, error))
+                    else:
+                        self.record(stage, fp)
+                        self.store(stage, fp)
+                        outcomes[name] = StageOutcome(name, 'ran', seconds, '')
+                        self.log('%-12s ran in %.1f s' % (name, seconds))
+        return [outcomes[s.name] for s in stages]
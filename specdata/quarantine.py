@@ -0,0 +1,59 @@
+import collections
+import csv
+
+from specdata.shard import shardPath
+
+
+#---------------------------------------------------------
+#  Quarantined pages
+#
+#  A page that fails to parse is left out of the outputs and listed in
+#  quarantine.txt with a short reason and the error message, by
+#  analyze-pages.py and by watch-pages.py.
+#---------------------------------------------------------
+
+QUARANTINE_FIELDS = ('path', 'reason', 'detail')
+
+class ParseError(Exception):
+    # A page that can't be parsed. reason is a short code that ends up
+    # in the quarantine list.
+    def __init__(self, reason, message):
+        Exception.__init__(self, message)
+        self.reason = reason
+
+# How unexpected exceptions are reported in quarantine.txt. Checked in
+# order; UnicodeError comes before ValueError, which it derives from.
+ERROR_REASONS = [
+    (KeyError, 'missing-field'),
+    (UnicodeError, 'encoding'),
+    (ValueError, 'bad-value'),
+    (OSError, 'io-error'),
+]
+
+def classifyError(e):
+    if isinstance(e, ParseError):
+        return e.reason
+    for clazz, reason in ERROR_REASONS:
+        if isinstance(e, clazz):
+            return reason
+    return 'unexpected'
+
+def writeQuarantine(quarantine, shard=None):
+    # Always written, so that a clean run replaces an old list.
+    path = shardPath('quarantine.txt', shard)
+    with open(path, 'w') as f:
+        w = csv.writer(f)
+        w.writerow(QUARANTINE_FIELDS)
+        for row in sorted(quarantine):
+            w.writerow(row)
+    reportQuarantine(path)
+
+def reportQuarantine(path):
+    counts = collections.defaultdict(int)
+    with open(path, newline='') as f:
+        for row in list(csv.reader(f))[1:]:
+            counts[row[1]] += 1
+    if counts:
+        print('Quarantined %d pages, see %s:' % (sum(counts.values()), path))
+        for reason, count in sorted(counts.items()):
+            print('    %-14s %d' % (reason, count))
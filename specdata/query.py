@@ -0,0 +1,352 @@
+import argparse
+import bisect
+import collections
+import datetime
+import functools
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import urllib.parse
+
+from specdata.convert import MODE_PREFIXES, suiteNames
+from specdata.cube import PERIODS, periodOf
+from specdata.frontier import ALL, METRICS, buildFrontier
+from specdata.graphs import convert, identify, load
+from specdata.instrument import span
+
+
+#---------------------------------------------------------
+#  Query service
+#
+#  Loads summaries.txt and benchmarks.txt once, converts every mode the
+#  way make-graphs.py does, and answers JSON queries over HTTP:
+#
+#    /results?brand=Intel Xeon&model=Xeon 26&from=2012&to=2014
+#    /best?per=year&group=brand&mode=INT
+#    /frontier?brand=AMD Opteron&per=quarter&from=2004&to=2010&metric=scoreMhz
+#    /ratios?mode=FP
+#    /status
+#
+#  Each mode's results are kept sorted by date, with indexes on brand,
+#  model and suite, so a query only looks at results that can match.
+#  Answers go into an LRU cache that belongs to the loaded data: when
+#  the input files change, they are loaded again in the background and
+#  swapped in together with an empty cache.
+#---------------------------------------------------------
+
+class QueryError(Exception):
+    def __init__(self, message, status=400):
+        Exception.__init__(self, message)
+        self.status = status
+
+def parseDate(text, end=False):
+    # '2012' or '2012-03'. With end=True, returns the start of the
+    # following year or month, so the range includes the whole period.
+    # The end of 9999 is past what datetime can hold, and is rejected
+    # like any other bad date.
+    try:
+        if len(text) == 4:
+            year = int(text)
+            return datetime.datetime(year + 1 if end else year, 1, 1)
+        d = datetime.datetime.strptime(text, '%Y-%m')
+        if end:
+            d = datetime.datetime(d.year + d.month // 12, d.month % 12 + 1, 1)
+    except ValueError:
+        raise QueryError('dates look like 2012 or 2012-03, not %r' % text)
+    return d
+
+def resultJSON(c):
+    r = c.result
+    return {'testID': r.srec.testID, 'tester': r.srec.tester, 'machine': r.srec.machine,
+            'cpu': r.cpu, 'brand': c.cpu.brand, 'model': c.cpu.model, 'mhz': c.cpu.mhz,
+            'date': c.hwDate.strftime('%Y-%m'), 'suite': c.benchType, 'score': r.score,
+            'convertedScore': c.convertedScore, 'convertedScoreMhz': c.convertedScoreMhz}
+
+class ModeIndex:
+    def __init__(self, modeResults):
+        self.modeResults = modeResults
+        self.ribs = sorted((c for rib in modeResults.resultsByBrand.values() for c in rib),
+                           key=lambda c: (c.hwDate, c.result.srec.testID))
+        self.dates = [c.hwDate for c in self.ribs]
+        self.byBrand = collections.defaultdict(list)
+        self.bySuite = collections.defaultdict(list)
+        for i, c in enumerate(self.ribs):
+            self.byBrand[c.cpu.brand.lower()].append(i)
+            self.bySuite[c.benchType.lower()].append(i)
+        # Sorted by lowercase model, so a prefix is a contiguous slice.
+        self.models = sorted((c.cpu.model.lower(), i) for i, c in enumerate(self.ribs))
+        # Built the first time a period is asked for.
+        self.frontiers = {}
+
+    def frontier(self, period):
+        if period not in self.frontiers:
+            self.frontiers[period] = buildFrontier(self.modeResults.resultsByBrand, period)
+        return self.frontiers[period]
+
+    def select(self, brand=None, model=None, suite=None, start=None, end=None):
+        # Returns matching results in date order. The smallest index
+        # gives the candidates; the other conditions are checked on
+        # each of them.
+        lo = bisect.bisect_left(self.dates, start) if start else 0
+        hi = bisect.bisect_left(self.dates, end) if end else len(self.ribs)
+        candidates = [range(lo, hi)]
+        if brand:
+            candidates.append(self.byBrand.get(brand.lower(), []))
+        if suite:
+            candidates.append(self.bySuite.get(suite.lower(), []))
+        if model:
+            model = model.lower()
+            a = bisect.bisect_left(self.models, (model,))
+            b = bisect.bisect_left(self.models, (model + '\uffff',))
+            candidates.append(sorted(i for m, i in self.models[a:b]))
+        matches = []
+        for i in min(candidates, key=len):
+            c = self.ribs[i]
+            if not lo <= i < hi:
+                continue
+            if brand and c.cpu.brand.lower() != brand.lower():
+                continue
+            if suite and c.benchType.lower() != suite.lower():
+                continue
+            if model and not c.cpu.model.lower().startswith(model):
+                continue
+            matches.append(c)
+        return matches
+
+def fileStamps(paths):
+    stamps = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            stamps.append((st.st_size, st.st_mtime_ns))
+        except OSError:
+            stamps.append(None)
+    return stamps
+
+class Dataset:
+    def __init__(self, summariesPath, benchmarksPath, modes, cacheSize=256):
+        # The stamps are taken first, so a change made while loading
+        # causes another load.
+        self.paths = [summariesPath, benchmarksPath]
+        self.stamps = fileStamps(self.paths)
+        results = load(summariesPath, benchmarksPath)
+        self.resultCount = len(results)
+        self.modes = {}
+        for mode in modes:
+            benchTypes = suiteNames(mode)
+            modeResults = [r for r in results if r.benchType in benchTypes]
+            cpudb, cpus = identify(modeResults)
+            with span('indexResults', len(modeResults)):
+                self.modes[mode] = ModeIndex(convert(modeResults, cpus, mode))
+        self.loaded = time.time()
+        self.answer = functools.lru_cache(maxsize=cacheSize)(self.compute)
+
+    def query(self, path, params):
+        # Returns the answer as JSON text. Parameters are put in a fixed
+        # order so the same question always hits the same cache entry.
+        if path == '/status':
+            return self.status()
+        return self.answer(path, tuple(sorted(params.items())))
+
+    def status(self):
+        info = self.answer.cache_info()
+        return json.dumps({'results': self.resultCount, 'loaded': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.loaded)),
+                           'modes': dict((m, len(index.ribs)) for m, index in sorted(self.modes.items())),
+                           'cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}})
+
+    def compute(self, path, params):
+        params = dict(params)
+        handler = {'/results': self.results, '/best': self.best, '/frontier': self.frontier, '/ratios': self.ratios}.get(path)
+        if handler is None:
+            raise QueryError('unknown query %s; try /results, /best, /frontier, /ratios or /status' % path, 404)
+        with span('query ' + path):
+            return json.dumps(handler(params))
+
+    def modeIndex(self, params):
+        mode = params.pop('mode', 'INT')
+        if mode not in self.modes:
+            raise QueryError('mode %r is not loaded; loaded modes: %s' % (mode, ', '.join(sorted(self.modes))))
+        return self.modes[mode]
+
+    def select(self, params):
+        index = self.modeIndex(params)
+        start = parseDate(params.pop('from')) if 'from' in params else None
+        end = parseDate(params.pop('to'), end=True) if 'to' in params else None
+        return index.select(params.pop('brand', None), params.pop('model', None), params.pop('suite', None), start, end)
+
+    def checkEmpty(self, params):
+        if params:
+            raise QueryError('unknown parameters: %s' % ', '.join(sorted(params)))
+
+    def results(self, params):
+        matches = self.select(params)
+        try:
+            limit = int(params.pop('limit', 1000))
+        except ValueError:
+            raise QueryError('limit must be a number')
+        if limit < 0:
+            raise QueryError('limit must not be negative')
+        order = params.pop('sort', 'date')
+        if order == 'score':
+            matches = sorted(matches, key=lambda c: -c.convertedScore)
+        elif order != 'date':
+            raise QueryError('sort is date or score')
+        self.checkEmpty(params)
+        return {'count': len(matches), 'results': [resultJSON(c) for c in matches[:limit]]}
+
+    def best(self, params):
+        # The result with the highest converted score for each period
+        # and brand (or model).
+        matches = self.select(params)
+        per = params.pop('per', 'year')
+        group = params.pop('group', 'brand')
+        if per not in PERIODS:
+            raise QueryError('per is one of %s' % ', '.join(PERIODS))
+        if group not in ['brand', 'model']:
+            raise QueryError('group is brand or model')
+        self.checkEmpty(params)
+        table = {}
+        for c in matches:
+            key = (periodOf('%04d-%02d' % (c.hwDate.year, c.hwDate.month), per), c.cpu.brand if group == 'brand' else '%s|%s' % (c.cpu.brand, c.cpu.model))
+            if key not in table or c.convertedScore > table[key].convertedScore:
+                table[key] = c
+        return {'best': [dict(resultJSON(c), period=period, group=name) for (period, name), c in sorted(table.items())]}
+
+    def frontier(self, params):
+        # The best result of each period for a brand (or all brands),
+        # with the best up to that period, and the best of the range.
+        # Answered from the frontier's trees, without going through
+        # the results.
+        index = self.modeIndex(params)
+        start = parseDate(params.pop('from')) if 'from' in params else None
+        end = parseDate(params.pop('to'), end=True) if 'to' in params else None
+        per = params.pop('per', 'year')
+        metric = params.pop('metric', 'score')
+        brand = params.pop('brand', None)
+        if per not in PERIODS:
+            raise QueryError('per is one of %s' % ', '.join(PERIODS))
+        if metric not in METRICS:
+            raise QueryError('metric is one of %s' % ', '.join(METRICS))
+        self.checkEmpty(params)
+        f = index.frontier(per)
+        if brand is None:
+            brand = ALL
+        else:
+            brand = dict((b.lower(), b) for b in f.brands()).get(brand.lower(), brand)
+        best = f.best(brand, metric, start, end)
+        return {'best': dict(resultJSON(best[1]), value=best[0]) if best else None,
+                'periods': [dict(resultJSON(row.best[1]), period=row.period, value=row.best[0],
+                                 record=row.record[0], recordTestID=row.record[1].result.srec.testID)
+                            for row in f.rows(brand, metric, start, end)]}
+
+    def ratios(self, params):
+        index = self.modeIndex(params)
+        self.checkEmpty(params)
+        m = index.modeResults
+        return {'mode': m.mode, 'suites': m.benchTypes, 'ratios': m.ratios.ratios,
+                'freqRatios': m.ratios.freqRatios, 'conversion': m.ratios.conversion}
+
+
+#---------------------------------------------------------
+#  HTTP server
+#---------------------------------------------------------
+
+class QueryService:
+    def __init__(self, summariesPath, benchmarksPath, modes, cacheSize=256):
+        self.args = (summariesPath, benchmarksPath, modes, cacheSize)
+        self.dataset = Dataset(*self.args)
+        self.lastStamps = self.dataset.stamps
+
+    def query(self, path, params):
+        # The dataset is swapped as a whole, so a query sees either the
+        # old or the new data.
+        return self.dataset.query(path, params)
+
+    def reloadIfChanged(self):
+        # Reloads once the files have changed and then stayed the same
+        # for one interval, so a file still being written is left alone.
+        stamps = fileStamps(self.dataset.paths)
+        stable = stamps == self.lastStamps
+        self.lastStamps = stamps
+        if not stable or stamps == self.dataset.stamps:
+            return False
+        try:
+            self.dataset = Dataset(*self.args)
+        except Exception as e:
+            sys.stderr.write('Reload failed, still serving the old data: %s\n' % e)
+            return False
+        print('Reloaded %d results' % self.dataset.resultCount)
+        sys.stdout.flush()
+        return True
+
+    def watch(self, interval):
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.reloadIfChanged()
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+class QueryHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            status, body = 200, self.server.service.query(url.path, params)
+        except QueryError as e:
+            status, body = e.status, json.dumps({'error': str(e)})
+        except Exception as e:
+            # A bug shouldn't leave the client without an answer.
+            traceback.print_exc()
+            status, body = 500, json.dumps({'error': 'internal error: %s: %s' % (type(e).__name__, e)})
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def serveQueries(service, host='127.0.0.1', port=0):
+    # Serves from a background thread; returns the server.
+    server = http.server.ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Answer JSON queries about the SPEC results over HTTP.')
+    parser.add_argument('--summaries', default='summaries.txt')
+    parser.add_argument('--benchmarks', default='benchmarks.txt')
+    parser.add_argument('--modes', default=','.join(sorted(MODE_PREFIXES)),
+                        help='comma-separated list of: ' + ', '.join(sorted(MODE_PREFIXES)))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8642)
+    parser.add_argument('--cache-size', type=int, default=256, help='number of answers to keep (default 256)')
+    parser.add_argument('--reload-interval', type=float, default=2, metavar='SECONDS',
+                        help='how often to check the input files for changes (default 2)')
+    args = parser.parse_args(argv)
+    modes = [m for m in args.modes.split(',') if m]
+    unknown = set(modes) - set(MODE_PREFIXES)
+    if unknown:
+        parser.error('unknown modes: %s' % ', '.join(sorted(unknown)))
+
+    service = QueryService(args.summaries, args.benchmarks, modes, args.cache_size)
+    service.watch(args.reload_interval)
+    server = serveQueries(service, args.host, args.port)
+    print('Serving %d results on http://%s:%d/' % ((service.dataset.resultCount,) + server.server_address[:2]))
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,247 @@
+import datetime
+import math
+import sys
+from contextlib import contextmanager
+
+# Only imported when a graph is actually requested, so that the CSV
+# outputs don't depend on pycairo.
+import cairo
+try:
+    import PIL.Image
+except ImportError:
+    sys.stderr.write('PIL not installed. HQ antialiasing is disabled.\n')
+    PIL = None
+
+from specdata.instrument import traced
+from specdata.palette import BRAND_STYLES, OTHER_COLOR
+from specdata.results import monthDelta
+
+
+#---------------------------------------------------------
+#  Graph rendering
+#---------------------------------------------------------
+
+@contextmanager
+def saved(cr):
+    cr.save()
+    try:
+        yield cr
+    finally:
+        cr.restore()
+
+class HQSurface:
+    def __init__(self, width, height, zooms=2):
+        self.width, self.height = width, height
+        self.zooms = zooms
+        self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width * 2**zooms, height * 2**zooms)
+        cr = self.cr = cairo.Context(self.surface)
+        if zooms > 0:
+            cr.scale(2.0, 2.0)
+            cr.translate(0.5, 0.5)
+        for i in range(1, zooms):
+            cr.scale(2.0, 2.0)
+            
+    def write_to_png(self, path):
+        im = PIL.Image.frombuffer('RGBA', (self.surface.get_width(), self.surface.get_height()), self.surface.get_data(), 'raw', 'BGRA', 0, 1)
+        for i in range(self.zooms - 1, -1, -1):
+            im = im.resize((self.width * 2**i, self.height * 2**i), PIL.Image.BILINEAR)
+        im.save(path)
+        
+DEFAULT_FONT_OPTIONS = cairo.FontOptions()
+DEFAULT_FONT_OPTIONS.set_antialias(cairo.ANTIALIAS_SUBPIXEL)
+
+def createScaledFont(family, size, slant=cairo.FONT_SLANT_NORMAL, weight=cairo.FONT_WEIGHT_NORMAL):
+    face = cairo.ToyFontFace(family, slant, weight)
+    return cairo.ScaledFont(face, cairo.Matrix(xx=size, yy=size), cairo.Matrix(), DEFAULT_FONT_OPTIONS)
+
+def alignText(cr, scaledFont, align, text, x, y):
+    x_bearing, y_bearing, width, height = scaledFont.text_extents(text)[:4]
+    with saved(cr):
+        cr.set_font_options(DEFAULT_FONT_OPTIONS)
+        cr.set_scaled_font(scaledFont)
+        cr.move_to(x - width * align - x_bearing, y)
+        cr.show_text(text)
+    
+@traced()
+def RenderGraph(mode, resultsByBrand, outPath, title=None, minDate=None, maxDate=None, frontier=None):
+    # If 1 pixel travels M months horizontally,
+    # it should travel M*pixelAspect logScore points vertically,
+    # and we fix the whole thing inside maxGraphSize.
+    # The results only need hwDate and convertedScore. minDate must be
+    # in January; maxDate defaults to the newest result. frontier is an
+    # optional [(date, score)], as Frontier.line() returns it, drawn as
+    # steps over the results.
+    maxGraphSize = (800.0, 800.0)
+    pixelAspect = 0.06   
+    minLogScore = -6
+    minDate = minDate or datetime.datetime(1995, 1, 1)
+
+    # Calculate axis extents and actual graph size.
+    if maxDate is None:
+        allRibs = sum(list(resultsByBrand.values()), [])
+        maxDate = max([r.hwDate for r in allRibs])
+    months = monthDelta(minDate, maxDate)
+    maxLogScore = 5
+    logScoreRange = maxLogScore - minLogScore
+    pelsPerMonth = min(maxGraphSize[0] / months,
+                       maxGraphSize[1] / logScoreRange * pixelAspect)
+    graphSize = (months * pelsPerMonth, logScoreRange * pelsPerMonth / pixelAspect)
+    
+    # Different shapes that are used on the graph.
+    def circle(cr, x, y):
+        cr.arc(x, y, 2.5, 0, 2*math.pi)
+
+    def triangle(cr, x, y):
+        x, y = round(x)+.5, round(y)
+        cr.move_to(x-3, y+3)
+        cr.line_to(x, y-3)
+        cr.line_to(x+3, y+3)
+        cr.close_path()
+
+    def square(cr, x, y):
+        x, y = round(x), round(y)
+        cr.rectangle(x-2, y-2, 5, 5)
+        
+    shapes = {'circle': circle, 'triangle': triangle, 'square': square}
+    brandColors = [(color, brand, shapes[marker], listOrder) for color, brand, marker, listOrder in BRAND_STYLES]
+    recognized = set([b[1] for b in brandColors])
+
+    # Create surface and context.
+    w, h = int(graphSize[0] + 40), int(graphSize[1] + 75)
+    if PIL is not None:
+        surface = HQSurface(w, h)
+        cr = surface.cr
+    else:
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, w, h)
+        cr = cairo.Context(surface)
+    cr.set_line_width(1)
+    cr.translate(28, 37)
+    cr.set_source_rgb(1, 1, 1)
+    cr.paint()    
+
+    # Title.
+    mode = mode.lower()
+    if title is None:
+        # 'int', 'fp', and 'rint', 'rfp' for the rate runs.
+        fullType = 'Floating-Point' if mode.endswith('fp') else 'Integer'
+        if mode.startswith('r'):
+            title = '%s Rate Performance' % fullType
+        else:
+            title = 'Single-Threaded %s Performance' % fullType
+    with saved(cr):
+        titleFont = createScaledFont('Arial', 20, weight=cairo.FONT_WEIGHT_BOLD)
+        cr.set_source_rgb(0, 0, 0)
+        alignText(cr, titleFont, .5, title, graphSize[0] / 2 - 10, -19)
+        subTitleFont = createScaledFont('Arial', 11)
+        cr.set_source_rgb(.6, .6, .6)
+        alignText(cr, subTitleFont, .5, 'Based on adjusted SPEC%s\xae results' % mode, graphSize[0] / 2, -5)
+    
+    # Shaded area.
+    with saved(cr):
+        x = round(12 * 9 * pelsPerMonth)
+        cr.set_source_rgb(.98, .98, .98)
+        cr.rectangle(x, 0, round(graphSize[0]) - x, round(graphSize[1]))
+        cr.fill()
+        
+    # Render grid lines.
+    with saved(cr):
+        scoreFont = createScaledFont('Arial', 14)
+        fractionFont = createScaledFont('Arial', 16)
+        cr.set_source_rgb(.9, .9, .9)
+        # Horizontal
+        for rls in range(maxLogScore - minLogScore + 1):
+            y = round(graphSize[1] - rls * pelsPerMonth / pixelAspect)
+            with saved(cr):
+                cr.set_source_rgb(.6, .6, .6)
+                exp = minLogScore + rls
+                if exp >= 0:
+                    label = str(2 ** exp)
+                    f = scoreFont
+                else:
+                    label = { -1: chr(189), -2: chr(188) }.get(exp, '')
+                    f = fractionFont
+                alignText(cr, f, 1, label, -6, y + 6)
+            cr.move_to(0, y + .5)
+            cr.rel_line_to(graphSize[0], 0)
+            cr.stroke()
+        # Vertical
+        assert minDate.month == 1
+        for month in range(0, months, 12):
+            x = round(month * pelsPerMonth)
+            cr.move_to(x + .5, 0)
+            cr.rel_line_to(0, graphSize[1])
+            cr.stroke()
+        cr.move_to(round(months * pelsPerMonth) + .5, 0)
+        cr.rel_line_to(0, graphSize[1])
+        cr.stroke()
+        yearFont = createScaledFont('Arial', 13)
+        for month in range(6, months, 12):
+            x = month * pelsPerMonth
+            with saved(cr):
+                cr.set_source_rgb(.6, .6, .6)
+                cr.translate(x, graphSize[1])
+                cr.rotate(-math.pi / 4)
+                alignText(cr, yearFont, 1, str(minDate.year + month // 12), -4, 12)
+
+    # Render each brand as another layer.
+    totalPoints = 0
+    with saved(cr):
+        for color, brand, shape, listOrder in [(OTHER_COLOR, None, circle, -1)] + sorted(brandColors):
+            if brand:
+                rib = resultsByBrand[brand]
+            else:
+                rib = sum([rib for b, rib in resultsByBrand.items() if b not in recognized], [])
+            cr.set_source_rgb(*[int(color[i:i+2], 16)/255.0 for i in range(0, 6, 2)])
+            for r in rib:
+                logScore = math.log(r.convertedScore, 2)
+                x = (monthDelta(minDate, r.hwDate) - .5) * pelsPerMonth
+                y = (logScore - minLogScore) * pelsPerMonth / pixelAspect
+                if x >= 0 and y >= 0:
+                    totalPoints += 1
+                    shape(cr, x, graphSize[1] - y)
+                    cr.fill()
+    print('%d points plotted for SPEC%s' % (totalPoints, mode))
+
+    # Render the frontier line.
+    if frontier:
+        with saved(cr):
+            cr.rectangle(0, 0, graphSize[0], graphSize[1])
+            cr.clip()
+            cr.set_source_rgb(.2, .2, .2)
+            cr.set_line_width(1.5)
+            def toGraph(date, score):
+                return ((monthDelta(minDate, date) - .5) * pelsPerMonth,
+                        graphSize[1] - (math.log(score, 2) - minLogScore) * pelsPerMonth / pixelAspect)
+            x, y = toGraph(*frontier[0])
+            cr.move_to(x, y)
+            for date, score in frontier[1:]:
+                x, y2 = toGraph(date, score)
+                cr.line_to(x, y)
+                cr.line_to(x, y2)
+                y = y2
+            cr.line_to(months * pelsPerMonth, y)
+            cr.stroke()
+    
+    # Render legend.
+    with saved(cr):
+        legendFont = createScaledFont('Arial', 11)
+        spacing = 11
+        w, h = 90, spacing * len(brandColors) + 4
+        cr.translate(int(graphSize[0]) - w - 23, int(graphSize[1]) - h - 23)
+        cr.set_source_rgb(1, 1, .98)
+        cr.rectangle(0, 0, w, h)
+        cr.fill()
+        cr.set_source_rgb(.7, .7, .7)
+        cr.rectangle(.5, .5, w, h)
+        cr.stroke()
+        cr.translate(7, 9)
+        for color, brand, shape, listOrder in brandColors:
+            # Icon
+            cr.set_source_rgb(*[int(color[i:i+2], 16)/255.0 for i in range(0, 6, 2)])
+            shape(cr, 0, listOrder * spacing - 1)
+            cr.fill()
+            # Text
+            cr.set_source_rgb(0, 0, 0)
+            alignText(cr, legendFont, 0, brand, 6, listOrder * spacing + 3)
+    
+    surface.write_to_png(outPath)
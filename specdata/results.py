@@ -0,0 +1,161 @@
+import collections
+import csv
+import datetime
+import itertools
+import math
+import sys
+from functools import lru_cache, partial, reduce
+
+
+#---------------------------------------------------------
+#  Helper functions
+#---------------------------------------------------------
+
+def geometricAverage(values):
+    if len(values) == 0:
+        return 1
+    prod = reduce(lambda x, y: x * y, values)
+    if prod == 0 or math.isinf(prod):
+        # Long lists can under- or overflow; averaging logs can't. Only
+        # used as a fallback, so other results stay bit-for-bit the same.
+        if min(values) <= 0:
+            return prod ** (1.0 / len(values))
+        return math.exp(math.fsum(math.log(v) for v in values) / len(values))
+    return prod ** (1.0 / len(values))
+
+def monthDelta(loDate, hiDate):
+    return (hiDate.year * 12 + hiDate.month) - (loDate.year * 12 - loDate.month)
+
+
+#---------------------------------------------------------
+#  Iterate through CPU95, CPU2000, CPU2006, CPU2017 .csv files
+#---------------------------------------------------------
+
+# Columns written by analyze-pages.py. These are declared up front
+# (rather than built from each file's header) so that records can be
+# pickled and sent to worker processes.
+SummaryRecord = collections.namedtuple('SummaryRecord', 'testID tester machine cpu mhz hwAvail os compiler autoParallel benchType base peak')
+BenchmarkRecord = collections.namedtuple('BenchmarkRecord', 'testID benchName base peak')
+
+# Text columns repeat a lot (a few dozen CPU names and benchmark
+# names, each testID once per benchmark), so they are interned and
+# every distinct value is stored once. Numeric columns are parsed once,
+# when the file is read; scores repeat too, so equal ones share a float.
+class Score(float):
+    # Prints the way it was written on the result page (49, 21.0, ...).
+    __slots__ = ('text',)
+
+    def __new__(cls, text):
+        self = float.__new__(cls, text)
+        self.text = text
+        return self
+
+    def __str__(self):
+        return self.text
+
+@lru_cache(maxsize=None)
+def parseScore(text):
+    # Some pages have no peak (or base) result.
+    try:
+        return Score(sys.intern(text))
+    except ValueError:
+        return None
+
+parseMHz = lru_cache(maxsize=None)(float)
+
+NUMERIC_COLUMNS = {'mhz': parseMHz, 'base': parseScore, 'peak': parseScore}
+
+def columnParsers(clazz):
+    return [NUMERIC_COLUMNS.get(field, sys.intern) for field in clazz._fields]
+
+def internStrings(values):
+    return [sys.intern(v) if type(v) is str else v for v in values]
+
+Result = collections.namedtuple('Result', 'benchType cpu mhz hwDate score srec benches')
+
+DISQUALIFIED_BENCHMARKS = [
+    '483.xalancbmk',
+    '445.gobmk',
+    '456.hmmer',
+    '464.h264ref',
+    '429.mcf',
+    '462.libquantum'
+    '434.zeusmp',
+    '459.GemsFDTD',
+    '437.leslie3d',
+    '436.cactusADM',
+    '470.lbm',
+    '410.bwaves',
+]
+
+def iterCsvRecords(path, clazz):
+    with open(path, 'rt') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is not None and tuple(header) != clazz._fields:
+            raise ValueError('%s: expected columns %s, found %s' % (path, ','.join(clazz._fields), ','.join(header)))
+        # Rows are converted a column at a time, which keeps the per-value
+        # work inside map(). The width check stands in for _make's.
+        parsers = columnParsers(clazz)
+        width = len(parsers)
+        make = partial(tuple.__new__, clazz)
+        while True:
+            rows = list(itertools.islice(reader, 4096))
+            if not rows:
+                break
+            if any(len(row) != width for row in rows):
+                raise ValueError('%s: expected %d columns on every line' % (path, width))
+            columns = [map(parse, column) for parse, column in zip(parsers, zip(*rows))]
+            for record in map(make, zip(*columns)):
+                yield record
+
+def makeRecord(clazz, row):
+    # Builds a record from values as they'd be read back from the CSV.
+    return clazz._make([parse(value) for parse, value in zip(columnParsers(clazz), row)])
+
+def loadBenchTable(path='benchmarks.txt', testIDs=None):
+    # testIDs limits the table to those tests.
+    brecs = iterCsvRecords(path, BenchmarkRecord)
+    if testIDs is not None:
+        brecs = (brec for brec in brecs if brec.testID in testIDs)
+    return makeBenchTable(brecs)
+
+def makeBenchTable(brecs):
+    # Maps testID to a tuple of its benchmarks. A later row for the same
+    # benchmark replaces an earlier one.
+    benchTable = collections.defaultdict(dict)
+    for brec in brecs:
+        benchTable[brec.testID][brec.benchName] = brec
+    for testID, benches in benchTable.items():
+        benchTable[testID] = tuple(benches.values())
+    return benchTable
+
+@lru_cache(maxsize=None)
+def parseMonth(text):
+    return datetime.datetime.strptime(text, '%b-%Y')
+
+def makeResult(srec, benchTable):
+    benches = tuple(brec for brec in benchTable.get(srec.testID, ())
+                    if brec.benchName not in DISQUALIFIED_BENCHMARKS)
+    return Result(benchType=srec.benchType,
+                  cpu=srec.cpu,
+                  mhz=srec.mhz,
+                  hwDate=parseMonth(srec.hwAvail),
+                  score=geometricAverage([brec.base for brec in benches]),
+                  srec=srec,
+                  benches=benches)
+
+def iterResults(summariesPath='summaries.txt', benchmarksPath='benchmarks.txt', benchTypes=None):
+    # With benchTypes, only those suites are read into memory; the
+    # summaries are streamed twice to find their tests.
+    testIDs = None
+    if benchTypes is not None:
+        testIDs = set(srec.testID for srec in iterCsvRecords(summariesPath, SummaryRecord)
+                      if srec.benchType in benchTypes)
+    benchTable = loadBenchTable(benchmarksPath, testIDs)
+    for srec in iterCsvRecords(summariesPath, SummaryRecord):
+        if benchTypes is None or srec.benchType in benchTypes:
+            yield makeResult(srec, benchTable)
+
+def loadResults(summariesPath='summaries.txt', benchmarksPath='benchmarks.txt', benchTypes=None):
+    return list(iterResults(summariesPath, benchmarksPath, benchTypes))
@@ -0,0 +1,103 @@
+import csv
+import glob
+import hashlib
+import heapq
+import os
+import re
+
+
+#---------------------------------------------------------
+#  Splitting the work across machines
+#
+#  A result page belongs to shard i of N according to a stable hash
+#  of its testID (the page's file name without extension). Both
+#  fetch-pages.py and analyze-pages.py use the same rule, so a machine
+#  parses exactly the pages it fetched.
+#---------------------------------------------------------
+
+def parseShard(text):
+    # '2/4' -> (2, 4). Shards are numbered from 1.
+    m = re.match('^(\\d+)/(\\d+)$', text or '')
+    if not m:
+        raise ValueError('shard must look like i/N, e.g. 1/4: %r' % text)
+    i, n = int(m.group(1)), int(m.group(2))
+    if not 1 <= i <= n:
+        raise ValueError('shard %d/%d is out of range' % (i, n))
+    return i, n
+
+def testIDFromPath(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def shardOf(testID, count):
+    digest = hashlib.sha1(testID.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+def inShard(testID, shard):
+    if shard is None:
+        return True
+    i, n = shard
+    return shardOf(testID, n) == i
+
+def shardPath(path, shard):
+    # summaries.txt -> summaries.2of4.txt
+    if shard is None:
+        return path
+    base, ext = os.path.splitext(path)
+    return '%s.%dof%d%s' % (base, shard[0], shard[1], ext)
+
+def findShards(path):
+    # Returns the shard files of path, checking that a complete set of
+    # shards is present.
+    base, ext = os.path.splitext(path)
+    found = {}
+    for p in glob.glob('%s.*of*%s' % (base, ext)):
+        m = re.match(re.escape(base) + '\\.(\\d+)of(\\d+)' + re.escape(ext) + '$', p)
+        if m:
+            found[int(m.group(1)), int(m.group(2))] = p
+    counts = set(n for i, n in found)
+    if len(counts) != 1:
+        raise ValueError('expected one complete set of shards for %s, found %s' % (path, sorted(found) or 'none'))
+    n = counts.pop()
+    missing = [i for i in range(1, n + 1) if (i, n) not in found]
+    if missing:
+        raise ValueError('%s: missing shards %s of %d' % (path, ', '.join(map(str, missing)), n))
+    return [found[i, n] for i in range(1, n + 1)]
+
+
+#---------------------------------------------------------
+#  Merging
+#
+#  Outputs are written sorted by testID (rows of one test keep their
+#  page order), so shard files can be merged by a streaming k-way
+#  merge into exactly what a single unsharded run would have written.
+#---------------------------------------------------------
+
+def iterCsvRows(path):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        yield header
+        for row in reader:
+            yield row
+
+def mergeCSV(paths, outPath, keyColumn='testID'):
+    readers = [iterCsvRows(p) for p in paths]
+    headers = [next(r) for r in readers]
+    if any(h != headers[0] for h in headers):
+        raise ValueError('shards of %s have different columns' % outPath)
+    key = headers[0].index(keyColumn)
+    rows = 0
+    tmp = outPath + '.tmp'
+    with open(tmp, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(headers[0])
+        # heapq.merge is stable, and a testID only ever occurs in one
+        # shard, so rows of a test keep their order.
+        for row in heapq.merge(*readers, key=lambda row: row[key]):
+            w.writerow(row)
+            rows += 1
+    os.replace(tmp, outPath)
+    return rows
+
+def mergeShards(path, keyColumn='testID'):
+    return mergeCSV(findShards(path), path, keyColumn)
@@ -0,0 +1,224 @@
+import bisect
+import collections
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+
+
+#---------------------------------------------------------
+#  Crawler telemetry
+#
+#  fetch-pages.py reports each page here instead of printing a line
+#  for it. A background thread redraws one progress line (pages/s,
+#  MB/s, retries, ETA) every second on a terminal, or prints it every
+#  ten seconds into a log, and rewrites a JSON snapshot of all the
+#  metrics for a dashboard to scrape:
+#
+#    counters       pages found, done, fetched, cached and duplicate;
+#                   bytes; retries and errors by kind
+#    rates          over the last WINDOW seconds and since the start
+#    eta            seconds left, once the index pages are scanned
+#    hosts          a latency histogram per host, with p50/p90/p99
+#
+#  Workers time their own requests and send a PageStats back with the
+#  page, so nothing is shared between processes.
+#---------------------------------------------------------
+
+# Upper bounds, in seconds, of the latency histogram buckets. A last
+# bucket catches everything slower.
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+# Rates are measured over this many seconds.
+WINDOW = 10.0
+
+# What a worker measured while fetching one page. errors holds the kind
+# of each failed attempt before the one that succeeded.
+PageStats = collections.namedtuple('PageStats', 'host size seconds errors')
+
+def errorKind(e):
+    if isinstance(e, urllib.error.HTTPError):
+        return 'http-%d' % e.code
+    if isinstance(e, urllib.error.URLError):
+        e = e.reason if isinstance(e.reason, Exception) else e
+    if isinstance(e, TimeoutError):
+        return 'timeout'
+    return type(e).__name__
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        # The upper bound of the bucket the quantile falls in; None if
+        # it is past the last bound.
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS + [None], self.counts):
+            seen += n
+            if seen >= q * self.count:
+                return bound
+        return None
+
+    def snapshot(self):
+        return {'count': self.count, 'meanSeconds': self.total / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+                'buckets': [[bound, n] for bound, n in zip(LATENCY_BUCKETS + ['inf'], self.counts)]}
+
+class FetchTelemetry:
+    def __init__(self, metricsPath=None, interval=None, out=sys.stdout):
+        self.metricsPath = metricsPath
+        self.out = out
+        self.tty = out.isatty()
+        self.interval = interval or (1.0 if self.tty else 10.0)
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.found = 0
+        self.scanning = True
+        self.counts = collections.Counter()     # done fetched cached duplicates bytes retries
+        self.errors = collections.Counter()
+        self.hosts = collections.defaultdict(LatencyHistogram)
+        self.recent = collections.deque()       # (time, bytes) of each recent page
+        self.shown = 0                          # length of the progress line on screen
+        self.stopped = threading.Event()
+        self.thread = None
+
+    #-----------------------------------------------------
+    #  Reporting
+    #-----------------------------------------------------
+
+    def pageFound(self):
+        with self.lock:
+            self.found += 1
+
+    def scanFinished(self):
+        with self.lock:
+            self.scanning = False
+
+    def pageDone(self, stats=None, duplicate=False):
+        # stats is None for a page that was already on disk.
+        now = time.time()
+        with self.lock:
+            self.counts['done'] += 1
+            if stats is None:
+                self.counts['cached'] += 1
+                return
+            self.counts['fetched'] += 1
+            self.counts['bytes'] += stats.size
+            self.counts['retries'] += len(stats.errors)
+            self.errors.update(stats.errors)
+            if duplicate:
+                self.counts['duplicates'] += 1
+            self.hosts[stats.host].add(stats.seconds)
+            self.recent.append((now, stats.size))
+
+    def note(self, message):
+        # Prints a message without tearing the progress line.
+        with self.lock:
+            self.clearLine()
+            self.out.write(message + '\n')
+            self.out.flush()
+
+    #-----------------------------------------------------
+    #  Metrics
+    #-----------------------------------------------------
+
+    def rates(self, now):
+        # (pages/s, bytes/s) over the last WINDOW seconds. Cached pages
+        # take no time and are left out.
+        while self.recent and self.recent[0][0] < now - WINDOW:
+            self.recent.popleft()
+        span = min(WINDOW, now - self.start) or 1e-9
+        return len(self.recent) / span, sum(size for t, size in self.recent) / span
+
+    def eta(self, now):
+        pagesPerSecond = self.rates(now)[0]
+        if self.scanning or not pagesPerSecond:
+            return None
+        return (self.found - self.counts['done']) / pagesPerSecond
+
+    def snapshot(self):
+        with self.lock:
+            now = time.time()
+            elapsed = now - self.start
+            pagesPerSecond, bytesPerSecond = self.rates(now)
+            return {'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now)),
+                    'elapsedSeconds': elapsed,
+                    'scanning': self.scanning,
+                    'pages': {'found': self.found, 'done': self.counts['done'], 'fetched': self.counts['fetched'],
+                              'cached': self.counts['cached'], 'duplicates': self.counts['duplicates']},
+                    'bytes': self.counts['bytes'],
+                    'rates': {'pagesPerSecond': pagesPerSecond, 'megabytesPerSecond': bytesPerSecond / 1e6,
+                              'averagePagesPerSecond': self.counts['fetched'] / elapsed if elapsed else 0,
+                              'averageMegabytesPerSecond': self.counts['bytes'] / 1e6 / elapsed if elapsed else 0},
+                    'etaSeconds': self.eta(now),
+                    'retries': self.counts['retries'],
+                    'errors': dict(self.errors),
+                    'hosts': dict((host, h.snapshot()) for host, h in sorted(self.hosts.items()))}
+
+    def writeSnapshot(self):
+        if not self.metricsPath:
+            return
+        tmp = self.metricsPath + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(tmp, self.metricsPath)
+
+    #-----------------------------------------------------
+    #  Progress line
+    #-----------------------------------------------------
+
+    def progressLine(self):
+        s = self.snapshot()
+        pages, rates = s['pages'], s['rates']
+        if s['scanning']:
+            eta = 'scanning'
+        elif s['etaSeconds'] is None:
+            eta = 'ETA ?'
+        else:
+            eta = 'ETA %d:%02d' % divmod(int(s['etaSeconds']), 60)
+        return '%d/%d pages  %.1f pages/s  %.2f MB/s  %d cached  %d retries  %s' % (
+            pages['done'], pages['found'], rates['pagesPerSecond'], rates['megabytesPerSecond'],
+            pages['cached'], s['retries'], eta)
+
+    def clearLine(self):
+        if self.shown:
+            self.out.write('\r%s\r' % (' ' * self.shown))
+            self.shown = 0
+
+    def showProgress(self, final=False):
+        line = self.progressLine()
+        with self.lock:
+            if self.tty and not final:
+                self.clearLine()
+                self.out.write(line)
+                self.shown = len(line)
+            else:
+                self.clearLine()
+                self.out.write(line + '\n')
+            self.out.flush()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.showProgress()
+            self.writeSnapshot()
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.showProgress(final=True)
+        self.writeSnapshot()
+        return False
@@ -0,0 +1,194 @@
+import datetime
+import hashlib
+import json
+import math
+import os
+import struct
+import zlib
+
+from specdata.instrument import span, traced
+from specdata.palette import BRAND_STYLES, OTHER_COLOR, rgb
+
+
+#---------------------------------------------------------
+#  Tile pyramid
+#
+#  A zoomable version of the graph: the date x log2(score) plane is cut
+#  into 256x256 PNG tiles at every zoom level, <mode>_tiles/z/x/y.png,
+#  the way web maps are. index.html in the same folder pans and zooms
+#  over them, also when opened straight from disk.
+#
+#  Each pixel of the deepest level counts the results per brand that
+#  fall into it. Every level above is built by adding up 2x2 blocks of
+#  the level below, so the results are only placed once. A pixel is
+#  drawn in the count-weighted mix of its brands' colors, more opaque
+#  the more results it holds.
+#
+#  The plane has a fixed extent, so a tile always covers the same dates
+#  and scores, however much data comes in. tiles.json keeps a digest of
+#  the counts behind each tile; a tile is only rendered again when its
+#  digest changes, and tiles that became empty are deleted.
+#---------------------------------------------------------
+
+TILE_SIZE = 256
+MIN_DATE = datetime.datetime(1995, 1, 1)
+
+# The plane spans WORLD_MONTHS months from MIN_DATE and, as in
+# RenderGraph, each month horizontally is as long as PIXEL_ASPECT
+# powers of two vertically. It is square, starting at MIN_LOG_SCORE.
+WORLD_MONTHS = 768
+PIXEL_ASPECT = 0.06
+MIN_LOG_SCORE = -6
+MAX_LOG_SCORE = MIN_LOG_SCORE + WORLD_MONTHS * PIXEL_ASPECT
+
+DEFAULT_LEVELS = 6
+
+# Opacity of a pixel with one result, and the count at which a pixel is
+# fully opaque.
+MIN_ALPHA = 0.35
+FULL_COUNT = 64
+
+BRANDS = [brand for color, brand, marker, listOrder in BRAND_STYLES]
+COLORS = [rgb(color) for color, brand, marker, listOrder in BRAND_STYLES] + [rgb(OTHER_COLOR)]
+
+# Anything that changes how a tile looks for the same counts; tiles
+# drawn with another style are all rendered again.
+STYLE = repr((TILE_SIZE, MIN_ALPHA, FULL_COUNT, COLORS))
+
+def monthIndex(d):
+    return d.year * 12 + d.month - 1
+
+def worldPixel(hwDate, logScore, level):
+    # Pixel coordinates of a point at a zoom level, y downwards. The
+    # m-th month from MIN_DATE spans m to m + 1 on the x axis.
+    pixels = TILE_SIZE << level
+    x = (monthIndex(hwDate) - monthIndex(MIN_DATE)) / WORLD_MONTHS * pixels
+    y = (MAX_LOG_SCORE - logScore) / (MAX_LOG_SCORE - MIN_LOG_SCORE) * pixels
+    return int(math.floor(x)), int(math.floor(y))
+
+def densityGrid(resultsByBrand, level):
+    # {(x, y): {brand index: count}} at the given level. Brands without
+    # a color of their own share the last index.
+    brandIndex = dict((brand, i) for i, brand in enumerate(BRANDS))
+    other = len(BRANDS)
+    pixels = TILE_SIZE << level
+    grid = {}
+    for brand, rib in resultsByBrand.items():
+        b = brandIndex.get(brand, other)
+        for r in rib:
+            if r.convertedScore <= 0:
+                continue
+            x, y = worldPixel(r.hwDate, math.log(r.convertedScore, 2), level)
+            if 0 <= x < pixels and 0 <= y < pixels:
+                counts = grid.setdefault((x, y), {})
+                counts[b] = counts.get(b, 0) + 1
+    return grid
+
+def coarser(grid):
+    # The grid of the level above: each pixel adds up a 2x2 block.
+    parent = {}
+    for (x, y), counts in grid.items():
+        merged = parent.setdefault((x >> 1, y >> 1), {})
+        for b, n in counts.items():
+            merged[b] = merged.get(b, 0) + n
+    return parent
+
+def splitTiles(grid):
+    # {(tx, ty): {(x, y) within the tile: counts}}
+    tiles = {}
+    for (x, y), counts in grid.items():
+        tiles.setdefault((x // TILE_SIZE, y // TILE_SIZE), {})[x % TILE_SIZE, y % TILE_SIZE] = counts
+    return tiles
+
+def tileDigest(cells):
+    h = hashlib.sha1(STYLE.encode())
+    for xy, counts in sorted(cells.items()):
+        h.update(repr((xy, sorted(counts.items()))).encode())
+    return h.hexdigest()
+
+def pixelColor(counts):
+    total = sum(counts.values())
+    r = g = b = 0
+    for i, n in counts.items():
+        cr, cg, cb = COLORS[i]
+        r += cr * n
+        g += cg * n
+        b += cb * n
+    alpha = min(1.0, MIN_ALPHA + (1 - MIN_ALPHA) * math.log(total) / math.log(FULL_COUNT))
+    return bytes((r // total, g // total, b // total, int(round(alpha * 255))))
+
+def pngChunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+def writePNG(path, width, height, rgba):
+    # rgba holds width * height * 4 bytes, row by row.
+    stride = width * 4
+    raw = b''.join(b'\x00' + bytes(rgba[y * stride:(y + 1) * stride]) for y in range(height))
+    data = (b'\x89PNG\r\n\x1a\n' +
+            pngChunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)) +
+            pngChunk(b'IDAT', zlib.compress(raw, 6)) +
+            pngChunk(b'IEND', b''))
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def renderTile(path, cells):
+    rgba = bytearray(TILE_SIZE * TILE_SIZE * 4)
+    for (x, y), counts in cells.items():
+        i = (y * TILE_SIZE + x) * 4
+        rgba[i:i + 4] = pixelColor(counts)
+    writePNG(path, TILE_SIZE, TILE_SIZE, rgba)
+
+@traced()
+def renderTiles(mode, resultsByBrand, outDir, levels=DEFAULT_LEVELS):
+    # Brings outDir up to date; returns the number of tiles rendered.
+    manifestPath = os.path.join(outDir, 'tiles.json')
+    try:
+        with open(manifestPath) as f:
+            known = json.load(f)['digests']
+    except (OSError, ValueError, KeyError):
+        known = {}
+    os.makedirs(outDir, exist_ok=True)
+
+    grid = densityGrid(resultsByBrand, levels - 1)
+    # Where the results are, in level 0 pixels, for the viewer to start
+    # out showing.
+    scale = 1.0 / (1 << (levels - 1))
+    bounds = [min(x for x, y in grid) * scale, min(y for x, y in grid) * scale,
+              (max(x for x, y in grid) + 1) * scale, (max(y for x, y in grid) + 1) * scale] if grid else None
+    digests = {}
+    rendered = 0
+    with span('renderTiles') as s:
+        for level in range(levels - 1, -1, -1):
+            for (tx, ty), cells in splitTiles(grid).items():
+                name = '%d/%d/%d' % (level, tx, ty)
+                digests[name] = tileDigest(cells)
+                path = os.path.join(outDir, name + '.png')
+                if known.get(name) != digests[name] or not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    renderTile(path, cells)
+                    rendered += 1
+                    s.add(1)
+            if level:
+                grid = coarser(grid)
+    for name in set(known) - set(digests):
+        path = os.path.join(outDir, name + '.png')
+        if os.path.exists(path):
+            os.remove(path)
+
+    manifest = {'mode': mode, 'tileSize': TILE_SIZE, 'levels': levels,
+                'minDate': MIN_DATE.strftime('%Y-%m'), 'worldMonths': WORLD_MONTHS,
+                'minLogScore': MIN_LOG_SCORE, 'maxLogScore': MAX_LOG_SCORE,
+                'bounds': bounds,
+                'brands': [[color, brand] for color, brand, marker, listOrder in BRAND_STYLES] + [[OTHER_COLOR, 'Other']],
+                'digests': digests}
+    tmp = manifestPath + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp, manifestPath)
+    with open(os.path.join(os.path.dirname(__file__), 'tiles.html')) as f:
+        page = f.read().replace('/*TILES*/null', json.dumps(manifest, sort_keys=True))
+    with open(os.path.join(outDir, 'index.html'), 'w') as f:
+        f.write(page)
+    return rendered
@@ -0,0 +1,233 @@
+import argparse
+import collections
+import csv
+import datetime
+import math
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+from specdata.instrument import span, traced
+from specdata.results import SummaryRecord, iterCsvRecords, loadBenchTable, parseMonth
+
+
+#---------------------------------------------------------
+#  Consistency checks on summaries.txt and benchmarks.txt
+#
+#  Every result page lists its own base and peak summary next to the
+#  benchmark rows, and make-graphs.py only ever uses the rows. When a
+#  parser reads a column at the wrong offset, the rows go wrong
+#  quietly; the summary on the same page then no longer matches them.
+#  So for every result this recomputes the geometric mean of its rows
+#  and compares it with the summary, within the rounding of the printed
+#  numbers, and checks that the suite has all its benchmarks, that the
+#  MHz is plausible and that the hardware date falls within the years
+#  the suite was in use.
+#
+#  The files are read once into flat arrays, a row per result and a row
+#  per benchmark; the checks are array operations over all results at
+#  once, with the geometric means summed per result by np.bincount.
+#---------------------------------------------------------
+
+ANOMALY_FIELDS = ('testID', 'benchType', 'check', 'detail')
+
+CHECKS = ['no-base', 'base-mismatch', 'peak-mismatch', 'benchmark-score', 'benchmark-count', 'mhz', 'date']
+
+# Benchmarks in each suite, as printed on its result pages. Rate runs
+# use the speed benchmarks, except in CPU2017.
+BENCHMARK_COUNTS = {
+    'CINT95': 8, 'CFP95': 10, 'RINT95': 8, 'RFP95': 10,
+    'CINT2000': 12, 'CFP2000': 14, 'RINT2000': 12, 'RFP2000': 14,
+    'CINT2006': 12, 'CFP2006': 17, 'RINT2006': 12, 'RFP2006': 17,
+    'CINT2017': 10, 'CFP2017': 10, 'RINT2017': 10, 'RFP2017': 13,
+}
+
+# (release, retirement) of each generation. Hardware may be available
+# up to EARLY_YEARS before a suite is released (results for existing
+# machines come in with it) and up to LATE_YEARS after it is retired.
+# The current suite is open-ended, up to LATE_YEARS from now.
+SUITE_YEARS = {
+    '95': ((1995, 8), (2000, 6)),
+    '2000': ((1999, 12), (2007, 2)),
+    '2006': ((2006, 8), (2018, 1)),
+    '2017': ((2017, 6), None),
+}
+EARLY_YEARS = 5
+LATE_YEARS = 2
+
+MIN_MHZ = 10
+MAX_MHZ = 10000
+
+# Summaries are printed to three or four digits and so are the rows
+# they're computed from; on top of that rounding, a summary may differ
+# from the recomputed mean by this much (relative).
+TOLERANCE = 0.005
+
+def monthNumber(year, month):
+    return year * 12 + month - 1
+
+def formatMonth(number):
+    return datetime.date(number // 12, number % 12 + 1, 1).strftime('%b-%Y')
+
+def suiteMonths(benchType, today=None):
+    # (first, last) month number a result of the suite may be dated.
+    today = today or datetime.date.today()
+    generation = benchType.lstrip('CRINTFP')
+    released, retired = SUITE_YEARS[generation]
+    last = monthNumber(*retired) if retired else monthNumber(today.year, today.month)
+    return monthNumber(*released) - 12 * EARLY_YEARS, last + 12 * LATE_YEARS
+
+@lru_cache(maxsize=None)
+def roundingError(text):
+    # Relative error of a printed number: half a unit in its last
+    # digit, divided by the number. NaN when it isn't positive.
+    value = float(text)
+    if not value > 0:
+        return math.nan
+    return 0.5 * 10.0 ** -len(text.partition('.')[2]) / value
+
+def scoreColumns(scores):
+    # (log, rounding error) of each score; NaN for a missing one.
+    logs = np.full(len(scores), np.nan)
+    errors = np.full(len(scores), np.nan)
+    for i, s in enumerate(scores):
+        if s is not None and s > 0:
+            logs[i] = math.log(s)
+            errors[i] = roundingError(s.text)
+    return logs, errors
+
+ResultTable = collections.namedtuple('ResultTable', 'srecs mhz month benchCounts base peak benchRow benchBase benchPeak')
+
+@traced()
+def loadTable(summariesPath='summaries.txt', benchmarksPath='benchmarks.txt'):
+    # The two files as arrays. benchRow gives the result each benchmark
+    # row belongs to; benchmarks without a summary are left out.
+    benchTable = loadBenchTable(benchmarksPath)
+    srecs = list(iterCsvRecords(summariesPath, SummaryRecord))
+    month = np.full(len(srecs), -1, dtype=np.int64)
+    benchRow = []
+    benches = []
+    for row, srec in enumerate(srecs):
+        try:
+            d = parseMonth(srec.hwAvail)
+            month[row] = monthNumber(d.year, d.month)
+        except ValueError:
+            pass
+        b = benchTable.get(srec.testID, ())
+        benchRow += [row] * len(b)
+        benches += b
+    return ResultTable(srecs,
+                       np.array([srec.mhz for srec in srecs], dtype=float),
+                       month,
+                       np.bincount(np.array(benchRow, dtype=np.int64), minlength=len(srecs)),
+                       scoreColumns([srec.base for srec in srecs]),
+                       scoreColumns([srec.peak for srec in srecs]),
+                       np.array(benchRow, dtype=np.int64),
+                       scoreColumns([brec.base for brec in benches]),
+                       scoreColumns([brec.peak for brec in benches]))
+
+def recomputedMeans(table, benchScores):
+    # Per result: (log of the geometric mean of its benchmark scores,
+    # mean rounding error of those scores, number of missing scores).
+    logs, errors = benchScores
+    n = len(table.srecs)
+    missing = np.isnan(logs)
+    counts = np.bincount(table.benchRow, weights=~missing, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        meanLog = np.bincount(table.benchRow, weights=np.where(missing, 0, logs), minlength=n) / counts
+        meanError = np.bincount(table.benchRow, weights=np.where(missing, 0, errors), minlength=n) / counts
+    return meanLog, meanError, np.bincount(table.benchRow, weights=missing, minlength=n).astype(int)
+
+def mismatches(table, reported, benchScores):
+    # Results whose summary is off from the mean of their rows, with the
+    # recomputed mean. Only results with every score present are checked.
+    logs, errors = reported
+    meanLog, meanError, missing = recomputedMeans(table, benchScores)
+    checked = ~np.isnan(logs) & ~np.isnan(meanLog) & (missing == 0)
+    off = np.zeros(len(logs), dtype=bool)
+    off[checked] = np.abs(meanLog - logs)[checked] > (errors + meanError)[checked] + TOLERANCE
+    return off, np.exp(meanLog)
+
+@traced()
+def findAnomalies(table, today=None):
+    # Returns [(testID, benchType, check, detail)], sorted by testID.
+    srecs = table.srecs
+    benchTypes = sorted(set(srec.benchType for srec in srecs))
+    suite = np.array([benchTypes.index(srec.benchType) for srec in srecs], dtype=np.int64)
+    expectedCounts = np.array([BENCHMARK_COUNTS.get(b, 0) for b in benchTypes], dtype=np.int64)[suite]
+    months = np.array([suiteMonths(b, today) if b in BENCHMARK_COUNTS else (0, 1 << 40) for b in benchTypes],
+                      dtype=np.int64).reshape(-1, 2)[suite]
+
+    found = collections.OrderedDict()
+    found['no-base'] = (np.isnan(table.base[0]), None)
+    baseOff, baseMean = mismatches(table, table.base, table.benchBase)
+    found['base-mismatch'] = (baseOff, baseMean)
+    peakOff, peakMean = mismatches(table, table.peak, table.benchPeak)
+    found['peak-mismatch'] = (peakOff, peakMean)
+    missingBase = recomputedMeans(table, table.benchBase)[2]
+    found['benchmark-score'] = (missingBase > 0, missingBase)
+    found['benchmark-count'] = ((expectedCounts > 0) & (table.benchCounts != expectedCounts), expectedCounts)
+    found['mhz'] = (~((table.mhz >= MIN_MHZ) & (table.mhz <= MAX_MHZ)), None)
+    found['date'] = ((table.month < 0) | (table.month < months[:, 0]) | (table.month > months[:, 1]), months)
+
+    anomalies = []
+    for check, (mask, extra) in found.items():
+        for row in np.flatnonzero(mask).tolist():
+            srec = srecs[row]
+            if check == 'no-base':
+                detail = 'no base summary'
+            elif check in ['base-mismatch', 'peak-mismatch']:
+                reported = srec.base if check == 'base-mismatch' else srec.peak
+                detail = 'reported %s, benchmarks give %.4g (%+.1f%%)' % (reported, extra[row], 100 * (extra[row] / reported - 1))
+            elif check == 'benchmark-score':
+                detail = '%d benchmarks without a base score' % extra[row]
+            elif check == 'benchmark-count':
+                detail = '%d of %d benchmarks' % (table.benchCounts[row], extra[row])
+            elif check == 'mhz':
+                detail = '%g MHz' % srec.mhz
+            elif table.month[row] < 0:
+                detail = 'unreadable date %r' % srec.hwAvail
+            else:
+                detail = '%s outside %s..%s' % (srec.hwAvail, formatMonth(extra[row, 0]), formatMonth(extra[row, 1]))
+            anomalies.append((srec.testID, srec.benchType, check, detail))
+    anomalies.sort(key=lambda a: (a[0], CHECKS.index(a[2])))
+    return anomalies
+
+def writeAnomalies(path, anomalies):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        w = csv.writer(f)
+        w.writerow(ANOMALY_FIELDS)
+        for a in anomalies:
+            w.writerow(a)
+    os.replace(tmp, path)
+
+def printSummary(table, anomalies, out=sys.stdout):
+    # A line per suite: results, then the number of results failing
+    # each check.
+    results = collections.Counter(srec.benchType for srec in table.srecs)
+    counts = collections.Counter((benchType, check) for testID, benchType, check, detail in anomalies)
+    out.write('%-10s %8s' % ('suite', 'results') + ''.join(' %15s' % c for c in CHECKS) + '\n')
+    for benchType in sorted(results):
+        out.write('%-10s %8d' % (benchType, results[benchType]) +
+                  ''.join(' %15d' % counts[benchType, c] for c in CHECKS) + '\n')
+    flagged = len(set(a[0] for a in anomalies))
+    out.write('%d of %d results flagged\n' % (flagged, len(table.srecs)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check every result in summaries.txt and benchmarks.txt for parse errors and implausible values.')
+    parser.add_argument('--summaries', default='summaries.txt')
+    parser.add_argument('--benchmarks', default='benchmarks.txt')
+    parser.add_argument('--out', default='anomalies.txt', help='anomaly report (default anomalies.txt)')
+    parser.add_argument('--strict', action='store_true', help='exit with status 1 if anything is flagged')
+    args = parser.parse_args(argv)
+
+    table = loadTable(args.summaries, args.benchmarks)
+    with span('validate', len(table.srecs)):
+        anomalies = findAnomalies(table)
+    writeAnomalies(args.out, anomalies)
+    printSummary(table, anomalies)
+    if args.strict and anomalies:
+        sys.exit(1)
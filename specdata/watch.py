@@ -0,0 +1,101 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+
+#---------------------------------------------------------
+#  Noticing new files
+#
+#  Both watchers have the same interface: wait(timeout) returns the
+#  paths of files that were completely written since the last call
+#  (possibly none). inotify is used where the C library has it;
+#  elsewhere, the folders are listed every few seconds.
+#---------------------------------------------------------
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyWatcher:
+    def __init__(self, dirs):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}
+        for d in dirs:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(d), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                err = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(err, 'cannot watch %s: %s' % (d, os.strerror(err)))
+            self.dirs[wd] = d
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 1 << 16)
+        paths = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, cookie, size = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = data[pos:pos + size].rstrip(b'\0')
+            pos += size
+            if name and wd in self.dirs:
+                paths.append(os.path.join(self.dirs[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    # A file is reported once its size and mtime stay the same between
+    # two scans, so pages still being downloaded are left alone. A file
+    # that changes is reported again, as with IN_CLOSE_WRITE.
+    def __init__(self, dirs, interval=5):
+        self.dirs = dirs
+        self.interval = interval
+        self.stamps = self.scan()
+        self.reported = dict(self.stamps)
+
+    def scan(self):
+        stamps = {}
+        for d in self.dirs:
+            for fn in os.listdir(d):
+                path = os.path.join(d, fn)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                stamps[path] = (st.st_size, st.st_mtime_ns)
+        return stamps
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        stamps = self.scan()
+        stable = [p for p, stamp in stamps.items()
+                  if self.reported.get(p) != stamp and self.stamps.get(p) == stamp]
+        for p in stable:
+            self.reported[p] = stamps[p]
+        self.stamps = stamps
+        return sorted(stable)
+
+    def close(self):
+        pass
+
+def makeWatcher(dirs, pollInterval=None):
+    # Polls if asked to, or if inotify can't be used. The folders must
+    # exist.
+    if pollInterval is None:
+        try:
+            return InotifyWatcher(dirs)
+        except OSError:
+            pollInterval = 5
+    return PollingWatcher(dirs, pollInterval)
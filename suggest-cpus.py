@@ -0,0 +1,4 @@
+from specdata.cpumatch import main
+
+if __name__ == '__main__':
+    main()
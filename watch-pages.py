@@ -0,0 +1,176 @@
+import argparse
+import csv
+import importlib
+import os
+import sys
+
+from specdata.convert import MODE_PREFIXES, suiteNames
+from specdata.dedup import ContentIndex
+from specdata.graphs import OUTPUTS, LiveGraphs
+from specdata.instrument import span
+from specdata.quarantine import writeQuarantine
+from specdata.results import BenchmarkRecord, SummaryRecord, loadResults, makeBenchTable, makeRecord, makeResult
+from specdata.shard import testIDFromPath
+from specdata.watch import makeWatcher
+
+# The parsers live in analyze-pages.py, whose name can't be imported
+# with an import statement.
+analyze = importlib.import_module('analyze-pages')
+
+
+#---------------------------------------------------------
+#  Keep the outputs up to date as pages arrive in scraped/
+#
+#  New pages are parsed on their own and their rows are appended to
+#  summaries.txt and benchmarks.txt, so a full analyze-pages.py run
+#  isn't needed. Pages whose testID is already in summaries.txt are
+#  skipped, and so are pages with the same content as one seen before;
+#  a page that was quarantined is retried when it changes. A CPU95
+#  .asc page that arrived before the .html page with its hardware date
+#  is retried when the .html lands, and at startup.
+#---------------------------------------------------------
+
+def csvText(value):
+    # What csv.writer turns a value into.
+    return '' if value is None else str(value)
+
+def appendRows(path, fields, rows):
+    header = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a') as f:
+        w = csv.writer(f)
+        if header:
+            w.writerow(fields)
+        for row in rows:
+            w.writerow(row)
+
+class Watch:
+    def __init__(self, graphs):
+        self.graphs = graphs
+        self.folders = dict((os.path.join('scraped', folder), (func, ext))
+                            for folder, func, ext in analyze.SCRAPED_FOLDERS)
+        self.seen = set()
+        self.quarantine = {}
+        self.contents = {}     # digest -> first page with that content
+
+    def start(self):
+        if os.path.exists('summaries.txt'):
+            results = loadResults()
+            self.seen.update(r.srec.testID for r in results)
+            self.graphs.add(results)
+        if os.path.exists('quarantine.txt'):
+            with open('quarantine.txt') as f:
+                for row in list(csv.reader(f))[1:]:
+                    self.quarantine[row[0]] = tuple(row)
+        # Pages already present are parsed now, except for those that
+        # were quarantined before for anything but a missing file.
+        # listTests() has left out duplicates, and saved the digests it
+        # computed.
+        pages = [path for func, path in analyze.listTests()]
+        self.index = ContentIndex(repair=False)
+        for path in pages:
+            self.contents.setdefault(self.index.digest(path), path)
+        backlog = [path for path in pages if self.quarantine.get(path, ('', 'io-error'))[1] == 'io-error']
+        print('Loaded %d results; %d pages to check ...' % (len(self.seen), len(backlog)))
+        self.process(backlog, force=True)
+
+    def process(self, paths, force=False):
+        # Parses the new pages among paths and updates every output.
+        tests = []
+        benches = []
+        pages = 0
+        quarantineChanged = False
+        for path in paths:
+            folder = os.path.dirname(path)
+            if folder not in self.folders:
+                continue
+            func, ext = self.folders[folder]
+            if path.lower().endswith('.html') and path[:-5] + '.asc' in self.quarantine:
+                # The hardware date of the .asc page that was waiting
+                # for it.
+                path = path[:-5] + '.asc'
+            testID = testIDFromPath(path)
+            if (ext is not None and not path.lower().endswith(ext)) or testID in self.seen:
+                continue
+            if not os.path.isfile(path):
+                # Renamed or removed since the event, e.g. a temp file.
+                continue
+            if self.contents.setdefault(self.index.digest(path), path) != path:
+                continue
+            t, b, q = analyze.parseOne(func, path)
+            if q or path in self.quarantine:
+                quarantineChanged = True
+            if q:
+                self.quarantine[path] = q
+                continue
+            self.quarantine.pop(path, None)
+            self.seen.add(testID)
+            tests += t
+            benches += b
+            pages += 1
+        self.index.save()
+        if quarantineChanged:
+            writeQuarantine(list(self.quarantine.values()))
+        if not tests and not force:
+            return
+
+        appendRows('summaries.txt', SummaryRecord._fields, tests)
+        appendRows('benchmarks.txt', BenchmarkRecord._fields, benches)
+        srecs = [makeRecord(SummaryRecord, [csvText(v) for v in t]) for t in tests]
+        benchTable = makeBenchTable(makeRecord(BenchmarkRecord, [csvText(v) for v in b]) for b in benches)
+        results = [makeResult(srec, benchTable) for srec in srecs]
+        with span('update', len(results)):
+            recomputed = self.graphs.add(results)
+            self.graphs.write()
+        print('Added %d results from %d pages%s' % (len(results), pages,
+              ' (ratios recomputed for %s)' % ', '.join(recomputed) if recomputed else ''))
+        sys.stdout.flush()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Watch scraped/ and keep summaries.txt, benchmarks.txt and the make-graphs.py outputs up to date.')
+    parser.add_argument('--modes', default='INT', help='comma-separated list of: ' + ', '.join(sorted(MODE_PREFIXES)))
+    parser.add_argument('--outputs', default='identified,data',
+                        help='comma-separated subset of: ' + ', '.join(OUTPUTS))
+    parser.add_argument('--poll', type=float, metavar='SECONDS', help='list the folders every SECONDS instead of using inotify')
+    parser.add_argument('--once', action='store_true', help='process the pages already there, then exit')
+    args = parser.parse_args()
+    outputs = set(o for o in args.outputs.split(',') if o)
+    unknown = outputs - set(OUTPUTS)
+    if unknown:
+        parser.error('unknown outputs: %s' % ', '.join(sorted(unknown)))
+    modes = [m for m in args.modes.split(',') if m]
+    unknown = set(modes) - set(MODE_PREFIXES)
+    if unknown:
+        parser.error('unknown modes: %s' % ', '.join(sorted(unknown)))
+
+    w = Watch(LiveGraphs(modes, outputs))
+    # Folders that are there are watched, whatever their mode, since
+    # their pages go into summaries.txt; those of the chosen modes are
+    # created if need be.
+    suites = set(suite for mode in modes for suite in suiteNames(mode))
+    folders = [folder for folder in sorted(w.folders)
+               if os.path.isdir(folder) or os.path.basename(folder).upper() in suites]
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+    # The watcher is set up first, so no page slips in between the
+    # initial scan and watching.
+    watcher = makeWatcher(folders, args.poll)
+    w.start()
+    if args.once:
+        sys.exit(0)
+    print('Watching %s (%s) ...' % (', '.join(folders), type(watcher).__name__))
+    sys.stdout.flush()
+    try:
+        while True:
+            paths = watcher.wait(60)
+            # Let a burst of downloads settle into one update.
+            while paths and len(paths) < 10000:
+                more = watcher.wait(1)
+                if not more:
+                    break
+                paths += more
+            if paths:
+                w.process(paths)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()